@@ -1,18 +1,33 @@
+import tempfile
+import altair as alt
 import streamlit as st
-import requests
 import pandas as pd
+from nzpi.analysis import get_analyser
+from nzpi.batch import CsvSink, run as run_batch
+from nzpi.geocode import PlacesError
+from nzpi.maps import boundaries_map_html
+from nzpi.outbound import OutboundBusy
+from nzpi.screening import SCREEN_METRICS, get_screening_index
+from nzpi.similar import get_similar_index
+from nzpi.telemetry import counters
+from nzpi.trends import YEARS, get_trend_cube
 # Use Streamlit secrets for keys
 LINZ_API_KEY = st.secrets["LINZ_API_KEY"]
 GOOGLE_PLACES_KEY = st.secrets["GOOGLE_PLACES_KEY"]
-# Load real data CSVs
-pop_df = pd.read_csv('data/2023_Census_population_change_by_SA2_5545354433051253430.csv')
-income_df = pd.read_csv('data/2023_Census_totals_by_topic_for_households_by_SA2_-132143055565075773.csv')
-# Load individuals data (clean wide version)
-individuals_df = pd.read_csv('data/individuals_clean_wide.csv')
-# Normalize main suburb name (column index 3 is the ASCII name)
-pop_df['main_suburb'] = pop_df.iloc[:,3].astype(str).str.strip().str.title()
-income_df['main_suburb'] = income_df.iloc[:,3].astype(str).str.strip().str.title()
-individuals_df['main_suburb'] = individuals_df.iloc[:,3].astype(str).str.strip().str.title()
+# Public URL of the tile proxy (python -m nzpi.tiles serve); keeps the LINZ key out of the page.
+# Without it the LINZ key is embedded in the map HTML, so it must be a referrer-restricted key.
+TILE_PROXY_URL = st.secrets.get("TILE_PROXY_URL")
+# Set NZPI_DEBUG = true in secrets to show the per-request timing waterfall
+DEBUG = st.secrets.get("NZPI_DEBUG", False)
+# Process-wide analyser: census tables, SA2 indexes, geocode cache and elevation
+# backend are built once and shared read-only by every session (see nzpi/)
+analyser = get_analyser(GOOGLE_PLACES_KEY, LINZ_API_KEY, TILE_PROXY_URL)
+# Nearest-neighbour index over normalized SA2 profile vectors
+similar_index = get_similar_index(analyser.census)
+# Sorted per-metric indexes over all SA2s for the screening panel
+screening_index = get_screening_index(analyser.census)
+# SA2 x variable x year array of every 2013/2018/2023 census variable
+trend_cube = get_trend_cube(analyser.census)
 # Session state
 if "map_data" not in st.session_state:
     st.session_state.map_data = pd.DataFrame()
@@ -28,276 +43,68 @@ if st.button("🔍 Analyse Property", type="primary"):
     st.session_state.map_data = pd.DataFrame()
     st.session_state.insights = None
     with st.spinner("Searching location with Google Places..."):
-        places_url = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
-        params = {
-            "input": address,
-            "inputtype": "textquery",
-            "fields": "formatted_address,geometry",
-            "key": GOOGLE_PLACES_KEY,
-            "locationbias": "country:nz"
-        }
-        response = requests.get(places_url, params=params)
-        data = response.json()
-        if data["status"] != "OK" or not data["candidates"]:
+        # Elevation, demographics and map run concurrently; late stages show as N/A
+        try:
+            insights = analyser.analyse(address)
+        except OutboundBusy:
+            st.warning("Lots of people are searching right now – please try again in a few seconds")
+            st.stop()
+        except PlacesError:
+            st.error("Address lookup is unavailable right now – please try again later")
+            st.stop()
+        if insights is None:
             st.error("Location not found – try more specific")
             st.stop()
-        candidate = data["candidates"][0]
-        full_address = candidate["formatted_address"]
-        short_address = full_address.split(',')[0]
-        lat = candidate["geometry"]["location"]["lat"]
-        lon = candidate["geometry"]["location"]["lng"]
-        # --- Robust suburb extraction ---
-        address_parts = [part.strip() for part in full_address.split(',')]
-        main_suburb = "Unknown"
-        city_postcode = "Unknown"
-        
-        # Find the part before the one containing digits (postcode) – that's usually the suburb
-        for i, part in enumerate(address_parts):
-            if i + 1 < len(address_parts):
-                next_part = address_parts[i + 1]
-                if any(c.isdigit() for c in next_part):  # next part has postcode
-                    main_suburb = part.title()
-                    city_postcode = next_part.title()
-                    break
-        # Fallback: if no postcode found, use second part (common for schools/landmarks)
-        if main_suburb == "Unknown" and len(address_parts) > 1:
-            main_suburb = address_parts[1].title()
-            if len(address_parts) > 2:
-                city_postcode = address_parts[2].title()
-        
-        # Final cleanup: remove any trailing digits/postcode from suburb name
-        main_suburb = ' '.join([word for word in main_suburb.split() if not word.isdigit() and not word.startswith('5')])
-        
-        # For display: use city/postcode if available
-        display_context = city_postcode if city_postcode != "Unknown" else ""
-        suburb_display = f"{main_suburb} ({display_context})" if display_context != "Unknown" else main_suburb
-        
-        suburb = main_suburb  # This is what we use for data matching
-        # Demographics
-        income = "N/A"
-        pop_2023 = "N/A"
-        growth = "N/A"
-        lower_bachelor = "N/A"
-        bachelor_higher = "N/A"
-        age_le20 = "N/A"
-        age_le40 = "N/A"
-        age_le60 = "N/A"
-        age_le65 = "N/A"
-        age_65plus = "N/A"
-        european_pct = "N/A"
-        maori_pct = "N/A"
-        pacific_pct = "N/A"
-        asian_pct = "N/A"
-        occupation_profile = {}
-        wages_salary_pct = "N/A"
-        self_employed_pct = "N/A"
-        superannuation_pct = "N/A"
-        benefits_pct = "N/A"
-        if main_suburb != "Unknown":
-            # Matches
-            pop_matches = pop_df[pop_df['main_suburb'].str.contains(main_suburb, case=False, na=False)]
-            income_matches = income_df[income_df['main_suburb'].str.contains(main_suburb, case=False, na=False)]
-            ind_matches = individuals_df[individuals_df['main_suburb'].str.contains(main_suburb, case=False, na=False)]
-            if not pop_matches.empty:
-                pop_cols = [col for col in pop_matches.columns if '2023' in col and 'population' in col.lower()]
-                if pop_cols:
-                    pop_total = pop_matches[pop_cols[0]].sum()
-                    pop_2023 = int(pop_total) if pd.notna(pop_total) else "N/A"
-                growth_cols = [col for col in pop_matches.columns if 'change' in col.lower() or 'growth' in col.lower()]
-                if growth_cols:
-                    growth_avg = pop_matches[growth_cols[0]].mean()
-                    growth = f"{growth_avg:+.1f}" if pd.notna(growth_avg) else "N/A"
-            if not income_matches.empty:
-                income_cols = [col for col in income_matches.columns if 'median' in col.lower() and 'income' in col.lower()]
-                if income_cols:
-                    income_avg = income_matches[income_cols[0]].mean()
-                    income = int(income_avg) if pd.notna(income_avg) else "N/A"
-            if not ind_matches.empty:
-                # Clean suppressed values
-                ind_matches = ind_matches.copy()
-                numeric_cols = ind_matches.select_dtypes(include='number').columns
-                ind_matches[numeric_cols] = ind_matches[numeric_cols].clip(lower=0).fillna(0)
-                # --- Education ---
-                lower_keys = ['no qualification', 'level 1', 'level 2', 'level 3', 'level 4', 'level 5', 'level 6', 'overseas secondary']
-                lower_cols = [col for col in ind_matches.columns if any(k in col.lower() for k in lower_keys) and '2023' in col]
-                higher_keys = ['bachelor', 'post-graduate', 'honours', 'masters', 'doctorate']
-                higher_cols = [col for col in ind_matches.columns if any(k in col.lower() for k in higher_keys) and '2023' in col]
-                if lower_cols and higher_cols:
-                    lower_total = ind_matches[lower_cols].sum().sum()
-                    higher_total = ind_matches[higher_cols].sum().sum()
-                    total_stated = lower_total + higher_total
-                    if total_stated > 0:
-                        lower_bachelor = f"{(lower_total / total_stated * 100):.1f}%"
-                        bachelor_higher = f"{(higher_total / total_stated * 100):.1f}%"
-                # --- Age groups ---
-                age_bin_patterns = ['0-4 years', '5-9 years', '10-14 years', '15-19 years', '20-24 years', '25-29 years', '30-34 years', '35-39 years', '40-44 years', '45-49 years', '50-54 years', '55-59 years', '60-64 years', '65-69 years', '70-74 years', '75-79 years', '80-84 years', '85 years and over']
-                age_cols = [col for col in ind_matches.columns if any(p in col.lower() for p in age_bin_patterns) and '2023' in col]
-                if age_cols:
-                    total_age = ind_matches[age_cols].sum().sum()
-                    if total_age > 0:
-                        cum = 0.0
-                        for p in ['0-4 years', '5-9 years', '10-14 years', '15-19 years']:
-                            cols = [col for col in age_cols if p in col.lower()]
-                            if cols:
-                                cum += ind_matches[cols].sum().sum()
-                        age_le20 = f"{(cum / total_age * 100):.1f}%"
-                        for p in ['20-24 years', '25-29 years', '30-34 years', '35-39 years']:
-                            cols = [col for col in age_cols if p in col.lower()]
-                            if cols:
-                                cum += ind_matches[cols].sum().sum()
-                        age_le40 = f"{(cum / total_age * 100):.1f}%"
-                        for p in ['40-44 years', '45-49 years', '50-54 years', '55-59 years']:
-                            cols = [col for col in age_cols if p in col.lower()]
-                            if cols:
-                                cum += ind_matches[cols].sum().sum()
-                        age_le60 = f"{(cum / total_age * 100):.1f}%"
-                        for p in ['60-64 years']:
-                            cols = [col for col in age_cols if p in col.lower()]
-                            if cols:
-                                cum += ind_matches[cols].sum().sum()
-                        age_le65 = f"{(cum / total_age * 100):.1f}%"
-                        age_65plus = f"{(100 - (cum / total_age * 100)):.1f}%"
-                # --- Ethnic Diversity ---
-                ethnic_total_cols = [col for col in ind_matches.columns if 'total stated' in col.lower() and 'ethnic' in col.lower() and '2023' in col]
-                if ethnic_total_cols:
-                    ethnic_total = ind_matches[ethnic_total_cols[0]].sum()
-                    if ethnic_total > 0:
-                        european_cols = [col for col in ind_matches.columns if 'european' in col.lower() and '2023' in col and 'ethnicity' in col.lower() and 'total' not in col.lower()]
-                        maori_cols = [col for col in ind_matches.columns if 'māori' in col.lower() and '2023' in col and 'ethnicity' in col.lower() and 'descent' not in col.lower() and 'total' not in col.lower()]
-                        pacific_cols = [col for col in ind_matches.columns if 'pacific peoples' in col.lower() and '2023' in col and 'ethnicity' in col.lower() and 'total' not in col.lower()]
-                        asian_cols = [col for col in ind_matches.columns if 'asian' in col.lower() and '2023' in col and 'ethnicity' in col.lower() and 'total' not in col.lower()]
-                        if european_cols:
-                            european_pct = f"{(ind_matches[european_cols].sum().sum() / ethnic_total * 100):.1f}%"
-                        if maori_cols:
-                            maori_pct = f"{(ind_matches[maori_cols].sum().sum() / ethnic_total * 100):.1f}%"
-                        if pacific_cols:
-                            pacific_pct = f"{(ind_matches[pacific_cols].sum().sum() / ethnic_total * 100):.1f}%"
-                        if asian_cols:
-                            asian_pct = f"{(ind_matches[asian_cols].sum().sum() / ethnic_total * 100):.1f}%"
-                # --- Occupation Profile ---
-                occ_total_cols = [col for col in ind_matches.columns if 'total stated' in col.lower() and 'occupation' in col.lower() and 'usual residence' in col.lower() and '2023' in col]
-                if occ_total_cols:
-                    occ_total = ind_matches[occ_total_cols[0]].sum()
-                    if occ_total > 0:
-                        occ_categories = {
-                            'Managers': 'managers',
-                            'Professionals': 'professionals',
-                            'Technicians and Trades Workers': 'technicians and trades workers',
-                            'Community and Personal Service Workers': 'community and personal service workers',
-                            'Clerical and Administrative Workers': 'clerical and administrative workers',
-                            'Sales Workers': 'sales workers',
-                            'Machinery Operators and Drivers': 'machinery operators and drivers',
-                            'Labourers': 'labourers'
-                        }
-                        occupation_profile = {}
-                        for label, key in occ_categories.items():
-                            occ_cols = [col for col in ind_matches.columns if key in col.lower() and '2023' in col and 'usual residence' in col.lower() and 'total' not in col.lower()]
-                            if occ_cols:
-                                occ_sum = ind_matches[occ_cols].sum().sum()
-                                occupation_profile[label] = f"{(occ_sum / occ_total * 100):.1f}%"
-                # --- Income Sources (Personal Income Sources 2023) ---
-                income_source_total_cols = [col for col in ind_matches.columns if 'total stated' in col.lower() and 'sources of personal income' in col.lower() and '2023' in col]
-                if income_source_total_cols:
-                    income_total = ind_matches[income_source_total_cols[0]].sum()
-                    if income_total > 0:
-                        wages_cols = [col for col in ind_matches.columns if 'wages' in col.lower() and 'salary' in col.lower() and 'commissions' in col.lower() and '2023' in col]
-                        self_emp_cols = [col for col in ind_matches.columns if 'self-employment' in col.lower() and 'business' in col.lower() and '2023' in col]
-                        super_cols = [col for col in ind_matches.columns if 'superannuation' in col.lower() and '2023' in col]
-                        benefits_cols = [col for col in ind_matches.columns if 'other government benefits' in col.lower() and '2023' in col]
-                        if wages_cols:
-                            wages_salary_pct = f"{(ind_matches[wages_cols].sum().sum() / income_total * 100):.1f}%"
-                        if self_emp_cols:
-                            self_employed_pct = f"{(ind_matches[self_emp_cols].sum().sum() / income_total * 100):.1f}%"
-                        if super_cols:
-                            superannuation_pct = f"{(ind_matches[super_cols].sum().sum() / income_total * 100):.1f}%"
-                        if benefits_cols:
-                            benefits_pct = f"{(ind_matches[benefits_cols].sum().sum() / income_total * 100):.1f}%"
-        # Elevation
-        elev_url = f"https://api.opentopodata.org/v1/nzdem8m?locations={lat},{lon}"
-        elev_response = requests.get(elev_url)
-        elev_data = elev_response.json()
-        elev_value = elev_data["results"][0]["elevation"] if elev_data.get("status") == "OK" and "elevation" in elev_data["results"][0] else None
-        elevation = round(elev_value, 1) if elev_value is not None else "N/A"
-        # Flood/Coastal Risk
-        if isinstance(elevation, float):
-            if elevation > 30:
-                risk = "Low"
-                risk_color = "green"
-                risk_desc = "Well elevated – minimal flood/coastal risk"
-            elif elevation > 10:
-                risk = "Moderate"
-                risk_color = "orange"
-                risk_desc = "Some elevation – check local flood maps"
+        st.session_state.insights = insights
+        st.session_state.map_data = pd.DataFrame({"lat": [insights["lat"]], "lon": [insights["lon"]]})
+with st.expander("📄 Bulk portfolio analysis (CSV upload)"):
+    uploaded = st.file_uploader("CSV with one address per row", type="csv")
+    if uploaded is not None:
+        portfolio = pd.read_csv(uploaded, dtype=str, keep_default_na=False)
+        address_col = st.selectbox("Address column", list(portfolio.columns),
+                                   index=list(portfolio.columns).index("address") if "address" in portfolio.columns else 0)
+        if st.button("Score portfolio"):
+            addresses = [a.strip() for a in portfolio[address_col] if a.strip()]
+            if not addresses:
+                st.warning(f"No addresses found in the “{address_col}” column.")
             else:
-                risk = "High"
-                risk_color = "red"
-                risk_desc = "Low-lying – higher potential flood/coastal exposure"
-        else:
-            risk = "Unknown"
-            risk_color = "gray"
-            risk_desc = "Elevation data unavailable"
-        # Resilience Score
-        resilience_score = 0
-        if isinstance(elevation, float):
-            if elevation > 50: resilience_score += 60
-            elif elevation > 30: resilience_score += 50
-            elif elevation > 10: resilience_score += 30
-            elif elevation > 5: resilience_score += 15
-        if growth != "N/A":
-            growth_float = float(growth.replace('+', '')) if isinstance(growth, str) else 0
-            resilience_score += min(max(growth_float, 0) * 2, 20)
-        if income != "N/A":
-            resilience_score += min((income / 200000) * 20, 20)
-        resilience_score = min(max(int(resilience_score), 0), 100)
-        if resilience_score >= 80:
-            resilience = "★★★★★ Excellent"
-        elif resilience_score >= 60:
-            resilience = "★★★★ Very Good"
-        elif resilience_score >= 40:
-            resilience = "★★★ Good"
-        elif resilience_score >= 20:
-            resilience = "★★ Fair"
-        else:
-            resilience = "★ Poor"
-        # Save insights
-        st.session_state.insights = {
-            "short_address": short_address,
-            "suburb": suburb,
-            "main_suburb": main_suburb,
-            "display_suburb": suburb_display,  # For display with context
-            "elevation": elevation,
-            "risk": risk,
-            "risk_color": risk_color,
-            "risk_desc": risk_desc,
-            "income": income,
-            "pop": pop_2023,
-            "growth": growth,
-            "resilience_score": resilience_score,
-            "resilience": resilience,
-            "lower_bachelor": lower_bachelor,
-            "bachelor_higher": bachelor_higher,
-            "age_le20": age_le20,
-            "age_le40": age_le40,
-            "age_le60": age_le60,
-            "age_le65": age_le65,
-            "age_65plus": age_65plus,
-            "european_pct": european_pct,
-            "maori_pct": maori_pct,
-            "pacific_pct": pacific_pct,
-            "asian_pct": asian_pct,
-            "occupation_profile": occupation_profile,
-            "wages_salary_pct": wages_salary_pct,
-            "self_employed_pct": self_employed_pct,
-            "superannuation_pct": superannuation_pct,
-            "benefits_pct": benefits_pct,
-            "lat": lat,
-            "lon": lon
-        }
-        st.session_state.map_data = pd.DataFrame({"lat": [lat], "lon": [lon]})
+                bar = st.progress(0.0, text=f"Scoring {len(addresses)} addresses...")
+                with tempfile.TemporaryDirectory() as tmp:
+                    results_path = f"{tmp}/results.csv"
+                    run_batch(addresses, CsvSink(results_path), analyser,
+                              progress=lambda done, total: bar.progress(done / max(total, 1), text=f"{done}/{total} scored"))
+                    results = pd.read_csv(results_path)
+                st.dataframe(results, use_container_width=True)
+                st.download_button("Download results CSV", results.to_csv(index=False), "portfolio_insights.csv", "text/csv")
+with st.expander("📊 Suburb screening (all SA2s)"):
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        min_income = st.number_input("Median income ≥ ($)", min_value=0, value=None, step=5000)
+    with col2:
+        min_growth = st.number_input("Growth 2018–2023 ≥ (%)", value=None, step=1.0)
+    with col3:
+        min_bachelor = st.number_input("Bachelor's or higher ≥ (%)", min_value=0.0, max_value=100.0, value=None, step=5.0)
+    with col4:
+        min_resilience = st.number_input("Resilience score ≥", min_value=0, max_value=100, value=None, step=5)
+    col1, col2 = st.columns(2)
+    with col1:
+        rank_by = st.selectbox("Rank by", list(SCREEN_METRICS), format_func=SCREEN_METRICS.get,
+                               index=list(SCREEN_METRICS).index("resilience_score"))
+    with col2:
+        screen_limit = st.slider("Show top", 10, 200, 50, step=10)
+    criteria = {metric: (low, None) for metric, low in (("income", min_income), ("growth_2018_2023", min_growth),
+                                                        ("bachelor_higher", min_bachelor),
+                                                        ("resilience_score", min_resilience)) if low is not None}
+    screened = screening_index.screen(criteria, rank_by=rank_by, limit=screen_limit)
+    st.dataframe(screened[["name", *SCREEN_METRICS]].rename(columns={"name": "Suburb (SA2)", **SCREEN_METRICS}),
+                 hide_index=True, use_container_width=True)
+    st.caption("Resilience here is scored per SA2; it includes elevation only when a local DEM and SA2 boundaries are installed.")
 # Display results
 if not st.session_state.map_data.empty and st.session_state.insights:
     i = st.session_state.insights
     st.success(f"**Found:** {i['short_address']} ({i.get('display_suburb', i['suburb'])})")
+    if i.get("degraded"):
+        st.caption(f"Some data was unavailable in time and is shown as N/A: {', '.join(i['degraded'])}")
     st.markdown(f"### Resilience Score: **{i['resilience_score']}/100**")
     st.progress(i['resilience_score'] / 100)
     with st.expander("How is Resilience Score calculated?"):
@@ -315,7 +122,7 @@ if not st.session_state.map_data.empty and st.session_state.insights:
     st.metric("Population (2023)", pop_display)
     st.info(f"**Insight**: {i['risk_desc']} in {i.get('display_suburb', i['suburb'])} (stats for main {i['main_suburb']})")
     st.markdown("### Suburb Profile")
-    tab_edu, tab_age, tab_ethnic, tab_occ, tab_income = st.tabs(["📚 Education", "👥 Age", "🌍 Ethnic Diversity", "💼 Occupation", "💰 Income Sources"])
+    tab_edu, tab_age, tab_ethnic, tab_occ, tab_income, tab_trends, tab_similar = st.tabs(["📚 Education", "👥 Age", "🌍 Ethnic Diversity", "💼 Occupation", "💰 Income Sources", "📈 Trends", "🔎 Similar Suburbs"])
     with tab_edu:
         col1, col2 = st.columns(2)
         with col1:
@@ -376,6 +183,52 @@ if not st.session_state.map_data.empty and st.session_state.insights:
             st.metric("% Superannuation / Pensions", i.get("superannuation_pct", "N/A"))
             st.metric("% Government Benefits", i.get("benefits_pct", "N/A"))
         st.caption("Main source of personal income – shows economic stability and lifestyle. Note: Percentages may exceed 100% because people can have multiple income sources in the NZ Census.")
+    with tab_trends:
+        if i.get("sa2_codes"):
+            trends = trend_cube.trends(i["sa2_codes"])
+            variable = st.selectbox("Census variable", trends.index, format_func=lambda k: trends.at[k, "label"])
+            row = trends.loc[variable]
+            cols = st.columns(len(YEARS))
+            for col, year, previous in zip(cols, YEARS, (None, *YEARS[:-1])):
+                change = row[f"change {previous}-{year} %"] if previous else None
+                with col:
+                    st.metric(year, f"{row[year]:,.0f}" if pd.notna(row[year]) else "N/A",
+                              f"{change:+.1f}% since {previous}" if previous and pd.notna(change) else None)
+            st.line_chart(pd.DataFrame({row["label"]: [row[year] for year in YEARS]}, index=list(YEARS)))
+            group = st.selectbox("Sparklines for", list(dict.fromkeys(trends["variable"])))
+            rows = trends[trends["variable"] == group]
+            st.dataframe(pd.DataFrame({
+                "Category": rows["label"],
+                "Trend": [[None if pd.isna(v) else float(v) for v in values] for values in rows[list(YEARS)].to_numpy()],
+                "2023": rows["2023"],
+                "Change 2018–2023 (%)": rows["change 2018-2023 %"].round(1),
+                "Change 2013–2023 (%)": rows["change 2013-2023 %"].round(1),
+            }), column_config={"Trend": st.column_config.LineChartColumn("2013 → 2023")},
+                hide_index=True, use_container_width=True)
+            st.caption("2013, 2018 and 2023 Census counts for the matched SA2s (summed across SA2s; medians averaged).")
+        else:
+            st.write("N/A")
+    with tab_similar:
+        if i.get("sa2_codes"):
+            col1, col2 = st.columns(2)
+            with col1:
+                cheaper = st.checkbox("Only suburbs with lower 2023 median household income", value=False, disabled=i["income"] == "N/A")
+            with col2:
+                growing = st.checkbox("Only growing suburbs", value=False)
+            similar = similar_index.search(i["sa2_codes"], k=10,
+                                           max_income=i["income"] if cheaper and i["income"] != "N/A" else None,
+                                           min_growth=0 if growing else None)
+            if similar.empty:
+                st.write("No similar suburbs match these filters.")
+            else:
+                st.dataframe(
+                    similar.rename(columns={"name": "Suburb (SA2)", "similarity": "Similarity", "income": "Median Income",
+                                            "growth": "Growth %", "pop": "Population"})
+                    [["Suburb (SA2)", "Similarity", "Median Income", "Growth %", "Population"]],
+                    hide_index=True, use_container_width=True)
+            st.caption("Nearest SA2s by education, age, ethnicity, occupation, income sources, median income and growth (2023 Census).")
+        else:
+            st.write("N/A")
     # AI Summary – BEFORE the map
     st.markdown("### 🤖 AI Summary")
     st.write(f"Property in {i['short_address']} ({i.get('display_suburb', i['suburb'])}) at {i['elevation']}m – {i['risk']} flood/coastal risk.")
@@ -490,20 +343,24 @@ if not st.session_state.map_data.empty and st.session_state.insights:
         for insight in insights:
             st.write(insight)
     # Map with boundaries (after AI Summary)
-    boundaries_url = f"https://tiles.linz.govt.nz/services;key={LINZ_API_KEY}/tiles/v4/layer=50767/EPSG:3857/{{z}}/{{x}}/{{y}}.png"
-    boundaries_html = f"""
-    <div id="boundaries-map" style="width:100%; height:600px;"></div>
-    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
-    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
-    <script>
-        var boundaries_map = L.map('boundaries-map').setView([{i['lat']}, {i['lon']}], 18);
-        L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{attribution: '© OpenStreetMap'}}).addTo(boundaries_map);
-        L.tileLayer('{boundaries_url}', {{attribution: '© LINZ', opacity: 0.6}}).addTo(boundaries_map);
-        L.marker([{i['lat']}, {i['lon']}]).addTo(boundaries_map).bindPopup('{i['short_address']}').openPopup();
-    </script>
-    """
+    # Prepared concurrently with the analysis; rebuilt here if that stage ran late
+    boundaries_html = i.get("map_html") or boundaries_map_html(i['lat'], i['lon'], i['short_address'], LINZ_API_KEY, TILE_PROXY_URL)
     st.components.v1.html(boundaries_html, height=600)
     st.warning("Disclaimer: Public data – check official LIM/survey for accuracy.")
+    if DEBUG and i.get("trace"):
+        with st.expander("⏱️ Request timings (debug)"):
+            spans = pd.DataFrame(i["trace"])
+            spans["end_ms"] = spans["start_ms"] + spans["duration_ms"]
+            st.altair_chart(alt.Chart(spans).mark_bar().encode(
+                x=alt.X("start_ms", title="ms since request start"), x2="end_ms",
+                y=alt.Y("span", sort=None, title=None), color="ok",
+                tooltip=["span", "start_ms", "duration_ms", "thread"]), use_container_width=True)
+            st.dataframe(spans[["span", "start_ms", "duration_ms", "ok", "thread"]], hide_index=True,
+                         use_container_width=True)
+            st.markdown("**Process counters**")
+            st.dataframe(pd.DataFrame([{"counter": name, "labels": ", ".join(f"{k}={v}" for k, v in labels),
+                                        "total": total} for (name, labels), total in sorted(counters().items())]),
+                         hide_index=True, use_container_width=True)
 else:
     st.info("Enter any NZ address or place and click Analyse – results stay!")
 st.caption("Free open data: LINZ + Open Topo | Built in NZ 🇳🇿") ## prod ready
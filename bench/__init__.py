@@ -0,0 +1 @@
+"""Benchmark harness; run with ``python -m bench.run`` (see :mod:`bench.run`)."""
@@ -0,0 +1,152 @@
+"""Local stand-ins for Google Places, OpenTopoData and map tiles with configurable latency.
+
+Places answers come from the recorded candidates in ``fixtures/places.json``.
+A query not in the fixtures gets a synthetic candidate derived from it by
+hashing: one of the recorded places, nudged by up to ~1 km. Every address in
+a batch run therefore geocodes, and nearby addresses fall in distinct
+elevation cells. Elevations are a deterministic function of the coordinates,
+and every map tile is the same 1x1 PNG. The endpoints mimic the responses of
+the real services, so the production clients are exercised unchanged.
+"""
+import hashlib
+import json
+import math
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from nzpi.geocode import normalize_query
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "places.json"
+
+
+def load_places(path=FIXTURES):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _png():
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(b"\x00\x00\x00\x00\x00")) + chunk(b"IEND", b""))
+
+
+TILE_PNG = _png()
+
+
+def fake_elevation(lat, lon):
+    return round(abs(math.sin(lat * 37.0) * math.cos(lon * 11.0)) * 120.0, 1)
+
+
+class FakeServices:
+    """Serve fake Places, OpenTopoData and tile endpoints on a local port.
+
+    ``places_latency``, ``elevation_latency`` and ``tile_latency`` (seconds)
+    are added to every response. Use as a context manager, or call :meth:`start` and :meth:`stop`.
+    """
+
+    def __init__(self, places_latency=0.05, elevation_latency=0.05, places=None, tile_latency=0.05):
+        self.places_latency = places_latency
+        self.elevation_latency = elevation_latency
+        self.tile_latency = tile_latency
+        self.recorded = {normalize_query(p["query"]): p for p in (places or load_places())}
+        self.fallback = list(self.recorded.values())
+        self.requests = {"places": 0, "elevation": 0, "tiles": 0}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def candidate(self, query):
+        key = normalize_query(query)
+        recorded = self.recorded.get(key)
+        if recorded is not None:
+            return recorded
+        digest = hashlib.sha1(key.encode()).digest()
+        base = self.fallback[digest[0] % len(self.fallback)]
+        dlat = (int.from_bytes(digest[1:3], "big") / 65535 - 0.5) * 0.02
+        dlon = (int.from_bytes(digest[3:5], "big") / 65535 - 0.5) * 0.02
+        suburb_and_city = base["formatted_address"].split(",", 1)[1]
+        return {"formatted_address": f"{query.split(',')[0].strip().title()},{suburb_and_city}",
+                "lat": base["lat"] + dlat, "lon": base["lon"] + dlon}
+
+    def _places(self, query):
+        place = self.candidate(query.get("input", [""])[0])
+        return {"status": "OK", "candidates": [{
+            "formatted_address": place["formatted_address"],
+            "geometry": {"location": {"lat": place["lat"], "lng": place["lon"]}},
+        }]}
+
+    def _elevation(self, query):
+        results = []
+        for location in query.get("locations", [""])[0].split("|"):
+            lat, lon = (float(v) for v in location.split(","))
+            results.append({"elevation": fake_elevation(lat, lon), "location": {"lat": lat, "lng": lon}})
+        return {"status": "OK", "results": results}
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                if url.path.endswith("/findplacefromtext/json"):
+                    kind, latency, payload = "places", services.places_latency, services._places
+                elif url.path.startswith("/v1/"):
+                    kind, latency, payload = "elevation", services.elevation_latency, services._elevation
+                elif url.path.startswith("/tiles/") and url.path.endswith(".png"):
+                    kind, latency, payload = "tiles", services.tile_latency, None
+                else:
+                    self.send_error(404)
+                    return
+                with services._lock:
+                    services.requests[kind] += 1
+                time.sleep(latency)
+                body = TILE_PNG if payload is None else json.dumps(payload(query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png" if payload is None else "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def places_url(self):
+        return f"{self.base_url}/maps/api/place/findplacefromtext/json"
+
+    @property
+    def opentopodata_url(self):
+        return f"{self.base_url}/v1"
+
+    @property
+    def tile_url(self):
+        return self.base_url + "/tiles/{z}/{x}/{y}.png"
@@ -0,0 +1,240 @@
+"""Benchmark the property analysis pipeline against local service stand-ins.
+
+Measures cold start (import plus the three census loads, from CSV and from
+the snapshot), suburb matching, demographic aggregation, single-address
+latency (uncached and with warm caches) and batch throughput. Google Places
+and OpenTopoData are replaced by :class:`bench.fakes.FakeServices`, so runs
+are reproducible offline and the network latency is whatever you configure.
+
+Results are written as JSON. With ``--baseline`` a previous run is compared
+metric by metric, and the exit status is 1 if any metric is worse than the
+baseline by more than ``--tolerance``:
+
+    python -m bench.run --output base.json
+    python -m bench.run --baseline base.json --tolerance 0.2
+"""
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from bench.fakes import FakeServices, load_places
+from nzpi.analysis import Analyser
+from nzpi.batch import score_addresses
+from nzpi.census import DATA_DIR, INCOME_CSV, INDIVIDUALS_CSV, POP_CSV, load_census
+from nzpi.elevation import ElevationClient
+from nzpi.geocode import GeocodeCache
+from nzpi.outbound import Provider
+from nzpi.suburbs import SuburbIndex
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCHMARKS = ("cold_start_csv", "cold_start_snapshot", "suburb_match", "demographic_aggregation",
+              "single_address", "single_address_cached", "batch_throughput")
+# Every other metric is a latency, where larger is worse
+HIGHER_IS_BETTER = {"batch_throughput"}
+
+COLD_START = (
+    "import time; start = time.perf_counter(); "
+    "from nzpi.analysis import Analyser; from nzpi.census import load_census; "
+    "load_census({data_dir!r}); print(time.perf_counter() - start)"
+)
+
+
+def summarize(samples, unit="ms"):
+    """Headline ``value`` is the median; samples are in seconds, reported in ``unit``."""
+    scale = {"ms": 1e3, "us": 1e6, "s": 1.0}[unit]
+    values = sorted(s * scale for s in samples)
+    return {
+        "value": round(statistics.median(values), 4),
+        "unit": unit,
+        "n": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "p95": round(values[min(len(values) - 1, int(0.95 * len(values)))], 4),
+        "min": round(values[0], 4),
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def bench_cold_start(data_dir, repeats, snapshot):
+    """Fresh interpreter: import the pipeline and load the census from a copy of ``data_dir``."""
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in (POP_CSV, INCOME_CSV, INDIVIDUALS_CSV):
+            shutil.copy2(Path(data_dir) / name, tmp)
+        code = COLD_START.format(data_dir=tmp)
+        if snapshot:
+            subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True)
+        for _ in range(repeats):
+            if not snapshot:
+                shutil.rmtree(Path(tmp) / ".snapshot", ignore_errors=True)
+            out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+            samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return summarize(samples, "s")
+
+
+def suburb_queries(census, limit, rng):
+    """Distinct free-text suburb names: exact, lower-cased, first word only and one-letter typos."""
+    names = sorted(set(census.pop["main_suburb"]))
+    queries = set()
+    for name in names:
+        queries.add(name)
+        queries.add(name.split()[0])
+        if len(name) > 5:
+            k = rng.randrange(1, len(name) - 1)
+            queries.add((name[:k] + name[k + 1:]).lower())
+    queries = sorted(queries)
+    rng.shuffle(queries)
+    return queries[:limit]
+
+
+def bench_suburb_match(census, iterations, rng):
+    # A fresh index, and each query once, so every call misses the resolve memo
+    index = SuburbIndex(census)
+    return summarize([timed(index.resolve, q) for q in suburb_queries(census, iterations, rng)], "us")
+
+
+def bench_demographics(analyser, iterations, rng):
+    codes = list(analyser.suburbs.names)
+    code_sets = [tuple(sorted(rng.sample(codes, rng.choice((1, 1, 2, 3))))) for _ in range(iterations)]
+    return summarize([timed(analyser.suburb_stats, c) for c in code_sets])
+
+
+def make_analyser(census, services, cached):
+    # Unpaced providers: the stand-ins have no quota, and pacing would swamp the measurement
+    return Analyser(
+        census,
+        "bench",
+        geocode_cache=GeocodeCache(":memory:") if cached else None,
+        elevation_client=ElevationClient(services.opentopodata_url, retries=0,
+                                         cache_size=100_000 if cached else 0,
+                                         provider=Provider("bench-opentopodata")),
+        places_url=services.places_url,
+        places_provider=Provider("bench-places"),
+    )
+
+
+def bench_single_address(census, services, iterations, cached):
+    analyser = make_analyser(census, services, cached)
+    queries = [p["query"] for p in load_places()]
+    if cached:
+        for query in queries:
+            analyser.analyse(query)
+    samples = []
+    for k in range(iterations):
+        samples.append(timed(analyser.analyse, queries[k % len(queries)]))
+    return summarize(samples)
+
+
+def bench_batch(census, services, size, workers):
+    analyser = make_analyser(census, services, cached=False)
+    streets = [p["formatted_address"].split(",")[0].split(" ", 1)[1] for p in load_places()]
+    addresses = [f"{100 + n} {streets[n % len(streets)]}" for n in range(size)]
+    start = time.perf_counter()
+    rows = list(score_addresses(addresses, analyser, workers=workers, rate=None))
+    elapsed = time.perf_counter() - start
+    return {"value": round(len(rows) / elapsed, 2), "unit": "addresses/s", "n": len(rows),
+            "elapsed_s": round(elapsed, 3), "ok": sum(r["status"] == "ok" for r in rows)}
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    selected = args.only or BENCHMARKS
+    results = {}
+    if "cold_start_csv" in selected:
+        results["cold_start_csv"] = bench_cold_start(args.data_dir, args.repeats, snapshot=False)
+    if "cold_start_snapshot" in selected:
+        results["cold_start_snapshot"] = bench_cold_start(args.data_dir, args.repeats, snapshot=True)
+    census = load_census(args.data_dir)
+    with FakeServices(args.places_latency, args.elevation_latency) as services:
+        if "suburb_match" in selected:
+            results["suburb_match"] = bench_suburb_match(census, args.iterations * 10, rng)
+        if "demographic_aggregation" in selected:
+            analyser = make_analyser(census, services, cached=False)
+            results["demographic_aggregation"] = bench_demographics(analyser, args.iterations * 10, rng)
+        if "single_address" in selected:
+            results["single_address"] = bench_single_address(census, services, args.iterations, cached=False)
+        if "single_address_cached" in selected:
+            results["single_address_cached"] = bench_single_address(census, services, args.iterations, cached=True)
+        if "batch_throughput" in selected:
+            results["batch_throughput"] = bench_batch(census, services, args.batch_size, args.workers)
+        requests_served = dict(services.requests)
+    return {"meta": _meta(args, requests_served), "results": results}
+
+
+def _meta(args, requests_served):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "fake_requests": requests_served,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Human-readable regressions of ``results`` against ``baseline`` beyond ``tolerance``."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous["value"]:
+            continue
+        change = current["value"] / previous["value"] - 1
+        worse = -change if name in HIGHER_IS_BETTER else change
+        if worse > tolerance:
+            regressions.append(f"{name}: {previous['value']} -> {current['value']} {current['unit']} "
+                               f"({change:+.0%}, tolerance {tolerance:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the property analysis pipeline.")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="directory with the census CSVs")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="run only these benchmarks")
+    parser.add_argument("--iterations", type=int, default=50, help="single-address requests per benchmark")
+    parser.add_argument("--repeats", type=int, default=3, help="fresh interpreters per cold-start benchmark")
+    parser.add_argument("--batch-size", type=int, default=500, help="addresses in the batch benchmark")
+    parser.add_argument("--workers", type=int, default=8, help="batch geocoding workers")
+    parser.add_argument("--places-latency", type=float, default=0.05, help="fake Places latency (s)")
+    parser.add_argument("--elevation-latency", type=float, default=0.05, help="fake OpenTopoData latency (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())["results"]
+        regressions = compare(report["results"], baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
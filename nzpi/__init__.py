@@ -0,0 +1 @@
+"""Data and service layer behind the NZ Property Insights app."""
@@ -0,0 +1,252 @@
+"""Single-property analysis, independent of the Streamlit page.
+
+:class:`Analyser` turns an address into the insights dict the app displays
+(and stores in ``st.session_state.insights``). The steps are exposed
+separately — :meth:`Analyser.locate`, elevation lookup and
+:meth:`Analyser.place_insights` — so bulk scoring can batch the network calls.
+"""
+import threading
+
+import pandas as pd
+
+from nzpi.areas import growth_column, income_column, population_column
+from nzpi.boundaries import get_boundaries
+from nzpi.census import load_census
+from nzpi.dem import get_local_dem
+from nzpi.elevation import get_elevation_client
+from nzpi.gazetteer import get_gazetteer
+from nzpi.geocode import PLACES_URL, find_place, get_geocode_cache
+from nzpi.maps import boundaries_map_html
+from nzpi.profiles import PROFILE_FIELDS, get_profiles
+from nzpi.scoring import flood_risk
+from nzpi.scoring import resilience as score_resilience
+from nzpi.stages import Stage, run_stages
+from nzpi.suburbs import get_suburb_index
+from nzpi.telemetry import count, span, trace
+
+# Keys of the insights dict, in a stable order for tabular output
+INSIGHT_FIELDS = ("short_address", "suburb", "main_suburb", "display_suburb", "elevation", "risk", "risk_color",
+                  "risk_desc", "resilience_score", "resilience", "income", "pop", "growth", *PROFILE_FIELDS,
+                  "lat", "lon", "sa2_codes")
+
+# Per-stage deadlines (seconds) for a single-address request
+STAGE_TIMEOUTS = {"elevation": 8.0, "demographics": 3.0, "map": 1.0}
+
+_lock = threading.Lock()
+_analysers = {}
+
+
+def parse_address(full_address):
+    """Guess ``(main_suburb, city_postcode)`` from a Google formatted address."""
+    address_parts = [part.strip() for part in full_address.split(',')]
+    main_suburb = "Unknown"
+    city_postcode = "Unknown"
+    # Find the part before the one containing digits (postcode) – that's usually the suburb
+    for i, part in enumerate(address_parts):
+        if i + 1 < len(address_parts):
+            next_part = address_parts[i + 1]
+            if any(c.isdigit() for c in next_part):  # next part has postcode
+                main_suburb = part.title()
+                city_postcode = next_part.title()
+                break
+    # Fallback: if no postcode found, use second part (common for schools/landmarks)
+    if main_suburb == "Unknown" and len(address_parts) > 1:
+        main_suburb = address_parts[1].title()
+        if len(address_parts) > 2:
+            city_postcode = address_parts[2].title()
+    # Final cleanup: remove any trailing digits/postcode from suburb name
+    main_suburb = ' '.join([word for word in main_suburb.split() if not word.isdigit() and not word.startswith('5')])
+    return main_suburb, city_postcode
+
+
+def display_suburb(main_suburb, city_postcode):
+    # For display: use city/postcode if available
+    display_context = city_postcode if city_postcode != "Unknown" else ""
+    return f"{main_suburb} ({display_context})" if display_context != "Unknown" else main_suburb
+
+
+class Analyser:
+    def __init__(self, census, places_key, geocode_cache=None, elevation_client=None, boundaries=None,
+                 linz_key=None, stage_timeouts=STAGE_TIMEOUTS, places_url=PLACES_URL, tile_proxy=None,
+                 places_provider=None, gazetteer=None):
+        self.census = census
+        self.places_key = places_key
+        self.places_url = places_url
+        self.places_provider = places_provider
+        self.linz_key = linz_key
+        self.tile_proxy = tile_proxy
+        self.stage_timeouts = stage_timeouts
+        self.geocode_cache = geocode_cache
+        self.gazetteer = gazetteer
+        self.elevation_client = elevation_client
+        self.boundaries = boundaries
+        self.profiles = get_profiles(census)
+        self.suburbs = get_suburb_index(census)
+        self.pop_col = population_column(census.pop)
+        self.growth_col = growth_column(census.pop)
+        self.income_col = income_column(census.income)
+
+    def locate_offline(self, address):
+        """Gazetteer candidate for a plain street address, or None (no gazetteer, landmark, ambiguous)."""
+        if self.gazetteer is None:
+            return None
+        place = self.gazetteer.resolve(address)
+        count("gazetteer_requests", result="miss" if place is None else "hit")
+        return place
+
+    def locate(self, address, offline=True):
+        """Places candidate ``{"formatted_address", "lat", "lon"}`` for an address, or None.
+
+        Tries the local gazetteer first unless ``offline`` is False; whatever
+        it cannot resolve goes to Places. Raises
+        :class:`nzpi.outbound.OutboundBusy` when Places is saturated and
+        :class:`nzpi.geocode.PlacesError` when it fails.
+        """
+        with span("geocode"):
+            place = self.locate_offline(address) if offline else None
+            if place is not None:
+                return place
+            return find_place(address, self.places_key, cache=self.geocode_cache, url=self.places_url,
+                              provider=self.places_provider)
+
+    def elevation(self, lat, lon):
+        with span("elevation"):
+            return self.elevation_client.elevation(lat, lon)
+
+    def resolve_suburb(self, full_address, lat, lon):
+        """``(main_suburb, display_suburb, sa2_codes)`` for a located place."""
+        with span("suburb_match"):
+            main_suburb, city_postcode = parse_address(full_address)
+            # With SA2 polygons loaded, the containing SA2 replaces the address-text guess
+            sa2_codes = ()
+            if self.boundaries is not None:
+                sa2_code = self.boundaries.locate(lat, lon)
+                if sa2_code is not None:
+                    sa2_codes = (sa2_code,)
+                    main_suburb = self.suburbs.names.get(sa2_code, main_suburb)
+            if not sa2_codes and main_suburb != "Unknown":
+                sa2_codes = self.suburbs.resolve(main_suburb)
+        return main_suburb, display_suburb(main_suburb, city_postcode), sa2_codes
+
+    def suburb_stats(self, sa2_codes):
+        """Income, population, growth and demographic profile fields for a set of SA2s."""
+        with span("demographic_aggregation"):
+            return self._suburb_stats(sa2_codes)
+
+    def _suburb_stats(self, sa2_codes):
+        income = "N/A"
+        pop_2023 = "N/A"
+        growth = "N/A"
+        profile = self.profiles.lookup(sa2_codes)
+        if sa2_codes:
+            pop_matches = self.census.pop.iloc[self.suburbs.positions('pop', sa2_codes)]
+            income_matches = self.census.income.iloc[self.suburbs.positions('income', sa2_codes)]
+            if not pop_matches.empty:
+                if self.pop_col:
+                    pop_total = pop_matches[self.pop_col].sum()
+                    pop_2023 = int(pop_total) if pd.notna(pop_total) else "N/A"
+                if self.growth_col:
+                    growth_avg = pop_matches[self.growth_col].mean()
+                    growth = f"{growth_avg:+.1f}" if pd.notna(growth_avg) else "N/A"
+            if not income_matches.empty:
+                if self.income_col:
+                    income_avg = income_matches[self.income_col].mean()
+                    income = int(income_avg) if pd.notna(income_avg) else "N/A"
+        return {"income": income, "pop": pop_2023, "growth": growth, **profile, "sa2_codes": list(sa2_codes)}
+
+    def demographics(self, place):
+        """``(main_suburb, display_suburb, stats)`` for a located place."""
+        main_suburb, suburb_display, sa2_codes = self.resolve_suburb(place["formatted_address"], place["lat"], place["lon"])
+        return main_suburb, suburb_display, self.suburb_stats(sa2_codes)
+
+    def _no_demographics(self, place):
+        # Fallback when the demographics stage misses its deadline: address-text suburb, N/A stats
+        main_suburb, city_postcode = parse_address(place["formatted_address"])
+        return main_suburb, display_suburb(main_suburb, city_postcode), self.suburb_stats(())
+
+    def map_html(self, lat, lon, label):
+        with span("map_html"):
+            return boundaries_map_html(lat, lon, label, self.linz_key, self.tile_proxy)
+
+    def place_insights(self, place, elev_value, demographics=None):
+        """Insights dict for a located place and its elevation (None if unavailable)."""
+        full_address = place["formatted_address"]
+        lat, lon = place["lat"], place["lon"]
+        main_suburb, suburb_display, stats = demographics or self.demographics(place)
+        elevation = round(float(elev_value), 1) if elev_value is not None else "N/A"
+        risk, risk_color, risk_desc = flood_risk(elevation)
+        resilience_score, resilience = score_resilience(elevation, stats["growth"], stats["income"])
+        return {
+            "short_address": full_address.split(',')[0],
+            "suburb": main_suburb,  # This is what we use for data matching
+            "main_suburb": main_suburb,
+            "display_suburb": suburb_display,  # For display with context
+            "elevation": elevation,
+            "risk": risk,
+            "risk_color": risk_color,
+            "risk_desc": risk_desc,
+            "resilience_score": resilience_score,
+            "resilience": resilience,
+            **stats,  # income, population, growth and the demographic profile
+            "lat": lat,
+            "lon": lon,
+        }
+
+    def analyse(self, address):
+        """Full analysis for one address, or None if the location is not found.
+
+        Raises :class:`nzpi.outbound.OutboundBusy` if geocoding is shed under load
+        or over quota, and :class:`nzpi.geocode.PlacesError` if Places fails.
+
+        After geocoding, elevation, demographics and map preparation run
+        concurrently under ``stage_timeouts``; a stage that fails or runs late
+        degrades to N/A and is listed under ``"degraded"``. The request's
+        timing spans are returned under ``"trace"``.
+        """
+        with trace("analyse") as request_trace:
+            insights = self._analyse(address)
+        if insights is not None:
+            insights["trace"] = request_trace.waterfall()
+        return insights
+
+    def _analyse(self, address):
+        place = self.locate(address)
+        if place is None:
+            return None
+        lat, lon = place["lat"], place["lon"]
+        short_address = place["formatted_address"].split(',')[0]
+        stages = {
+            "elevation": Stage(lambda: self.elevation(lat, lon), self.stage_timeouts["elevation"]),
+            "demographics": Stage(lambda: self.demographics(place), self.stage_timeouts["demographics"],
+                                  fallback=None),
+        }
+        if self.linz_key or self.tile_proxy:
+            stages["map"] = Stage(lambda: self.map_html(lat, lon, short_address), self.stage_timeouts["map"])
+        results, degraded = run_stages(stages)
+        with span("scoring"):
+            insights = self.place_insights(place, results["elevation"],
+                                           results["demographics"] or self._no_demographics(place))
+        insights["map_html"] = results.get("map")
+        insights["degraded"] = degraded
+        return insights
+
+
+def get_analyser(places_key, linz_key=None, tile_proxy=None):
+    """Return the process-wide :class:`Analyser` wired to the default data and services."""
+    with _lock:
+        analyser = _analysers.get((places_key, linz_key, tile_proxy))
+        if analyser is None:
+            analyser = Analyser(
+                load_census(),
+                places_key,
+                geocode_cache=get_geocode_cache(),
+                # Local LINZ address index (data/gazetteer) when built, with Places as fallback
+                gazetteer=get_gazetteer(),
+                # Local memory-mapped DEM (data/dem) when present, else OpenTopoData
+                elevation_client=get_local_dem() or get_elevation_client(),
+                boundaries=get_boundaries(),
+                linz_key=linz_key,
+                tile_proxy=tile_proxy,
+            )
+            _analysers[(places_key, linz_key, tile_proxy)] = analyser
+        return analyser
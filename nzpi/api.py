@@ -0,0 +1,238 @@
+"""Headless JSON API over the same analysis as the Streamlit page.
+
+A plain WSGI app (no framework dependency):
+
+    GET  /analyse?address=...   insights for one address
+    GET  /sa2/<code>            census profile and metrics for one SA2
+    POST /batch                 {"addresses": [...]} -> one row per address
+    GET  /healthz               data snapshot version
+    GET  /metrics               stage timings and counters (Prometheus text)
+
+GET responses carry an ETag derived from the census snapshot version and the
+normalized request, and are kept in a per-worker LRU cache for their
+``Cache-Control`` lifetime. A matching ``If-None-Match`` gets ``304 Not
+Modified``. Degraded analyses (a stage fell back to N/A) are neither cached
+nor given an ETag. Census data and indexes are
+loaded once per worker process, on the first request. Run it under any WSGI
+server, e.g. ``gunicorn -w 4 nzpi.api:app``, or with the built-in pre-fork
+server: ``python -m nzpi.api --port 8000 --workers 4``.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from nzpi.analysis import get_analyser
+from nzpi.areas import get_area_table
+from nzpi.batch import score_addresses
+from nzpi.geocode import PlacesError, normalize_query
+from nzpi.outbound import OutboundBusy
+from nzpi.settings import require_secret
+from nzpi.telemetry import count, prometheus_text
+
+MAX_BATCH = 1000
+RESPONSE_CACHE_SIZE = 4096
+CACHE_SECONDS = {"analyse": 300, "sa2": 86400}
+
+logger = logging.getLogger(__name__)
+
+_cache = OrderedDict()  # etag -> (stored at, body)
+_cache_lock = threading.Lock()
+_places_key = None  # read from the environment or secrets.toml on first use, then kept
+
+
+def _jsonable(value):
+    if hasattr(value, "item"):  # numpy scalars
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value if isinstance(value, (int, float, str, bool, type(None))) else str(value)
+
+
+def _encode(payload):
+    def clean(obj):
+        if isinstance(obj, dict):
+            return {str(k): clean(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [clean(v) for v in obj]
+        return _jsonable(obj)
+    return json.dumps(clean(payload), ensure_ascii=False).encode("utf-8")
+
+
+def _analyser():
+    global _places_key
+    if _places_key is None:
+        _places_key = require_secret("GOOGLE_PLACES_KEY")
+    return get_analyser(_places_key)
+
+
+def analyse_payload(address):
+    try:
+        insights = _analyser().analyse(address)
+    except OutboundBusy:
+        return 503, {"error": "Address lookups are busy – try again in a few seconds"}
+    except PlacesError as exc:
+        logger.warning("analyse %r: %s", address, exc)
+        return 502, {"error": "Address lookup is unavailable right now"}
+    if insights is None:
+        return 404, {"error": "Location not found – try more specific"}
+    # Neither the map nor this request's timings belong in a cached response
+    insights.pop("map_html", None)
+    insights.pop("trace", None)
+    return 200, insights
+
+
+def sa2_payload(code):
+    analyser = _analyser()
+    areas = get_area_table(analyser.census)
+    if code not in areas.index:
+        return 404, {"error": f"Unknown SA2 code {code}"}
+    return 200, {"code": code, "name": areas.at[code, "name"], **analyser.suburb_stats((code,)),
+                 "metrics": areas.loc[code].drop("name").to_dict()}
+
+
+def batch_payload(body):
+    try:
+        addresses = json.loads(body or b"{}").get("addresses")
+    except (ValueError, AttributeError):
+        addresses = None
+    if not isinstance(addresses, list) or not all(isinstance(a, str) for a in addresses):
+        return 400, {"error": 'Expected JSON body {"addresses": ["...", ...]}'}
+    if len(addresses) > MAX_BATCH:
+        return 413, {"error": f"At most {MAX_BATCH} addresses per request"}
+    # Rows keep profiles and SA2 codes as objects, matching /analyse; only the file sinks flatten them
+    return 200, {"results": list(score_addresses(addresses, _analyser()))}
+
+
+def _cached_get(kind, etag, compute):
+    """``(status, body, cacheable)`` for a GET, computing on a miss or an entry older than its max-age."""
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(etag)
+        if hit is not None and now - hit[0] > CACHE_SECONDS[kind]:
+            del _cache[etag]
+            hit = None
+        elif hit is not None:
+            _cache.move_to_end(etag)
+    count("cache_requests", cache="response", result="miss" if hit is None else "hit")
+    if hit is not None:
+        return 200, hit[1], True
+    status, payload = compute()
+    body = _encode(payload)
+    # A degraded analysis (e.g. elevation timed out) must not outlive the outage
+    cacheable = status == 200 and not payload.get("degraded")
+    if cacheable:
+        with _cache_lock:
+            _cache[etag] = (now, body)
+            while len(_cache) > RESPONSE_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return status, body, cacheable
+
+
+def _respond(start_response, status, body, headers=(), content_type="application/json; charset=utf-8"):
+    reason = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+              413: "Payload Too Large", 502: "Bad Gateway", 503: "Service Unavailable"}[status]
+    start_response(f"{status} {reason}", [("Content-Type", content_type),
+                                          ("Content-Length", str(len(body))), *headers])
+    return [body]
+
+
+def app(environ, start_response):
+    method = environ["REQUEST_METHOD"]
+    path = environ.get("PATH_INFO", "/").rstrip("/") or "/"
+    query = parse_qs(environ.get("QUERY_STRING", ""))
+    if path == "/healthz":
+        return _respond(start_response, 200, _encode({"status": "ok", "version": _analyser().census.version}))
+    if path == "/metrics":
+        return _respond(start_response, 200, prometheus_text().encode("utf-8"),
+                        content_type="text/plain; version=0.0.4; charset=utf-8")
+    if path == "/batch":
+        if method != "POST":
+            return _respond(start_response, 405, _encode({"error": "Use POST"}), [("Allow", "POST")])
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        status, payload = batch_payload(environ["wsgi.input"].read(length))
+        return _respond(start_response, status, _encode(payload))
+    if method not in ("GET", "HEAD"):
+        return _respond(start_response, 405, _encode({"error": "Use GET"}), [("Allow", "GET, HEAD")])
+    if path == "/analyse":
+        address = (query.get("address") or [""])[0].strip()
+        if not address:
+            return _respond(start_response, 400, _encode({"error": "Missing ?address="}))
+        kind, key, compute = "analyse", normalize_query(address), lambda: analyse_payload(address)
+    elif path.startswith("/sa2/") and path[5:].isdigit():
+        code = int(path[5:])
+        kind, key, compute = "sa2", str(code), lambda: sa2_payload(code)
+    else:
+        return _respond(start_response, 404, _encode({"error": f"No route for {path}"}))
+    etag = '"%s-%s"' % (_analyser().census.version, hashlib.sha1(f"{kind}:{key}".encode()).hexdigest()[:16])
+    headers = [("ETag", etag), ("Cache-Control", f"public, max-age={CACHE_SECONDS[kind]}")]
+    # The ETag depends only on the data version and the request, so a revalidation needs no analysis
+    if etag in [t.strip() for t in environ.get("HTTP_IF_NONE_MATCH", "").split(",")]:
+        count("cache_requests", cache="response", result="not_modified")
+        return _respond(start_response, 304, b"", headers)
+    status, body, cacheable = _cached_get(kind, etag, compute)
+    if status == 503:
+        return _respond(start_response, status, body, [("Retry-After", "5")])
+    if status != 200:
+        return _respond(start_response, status, body)
+    if not cacheable:
+        headers = [("Cache-Control", "no-store")]
+    return _respond(start_response, 200, body if method == "GET" else b"", headers)
+
+
+class _ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=8000, workers=1):
+    """Bind once, then fork ``workers - 1`` children that share the listening socket."""
+    server = make_server(host, port, app, server_class=_ThreadingServer, handler_class=_QuietHandler)
+    children = []
+    for _ in range(workers - 1):
+        pid = os.fork()
+        if pid == 0:
+            children = None
+            break
+        children.append(pid)
+    _analyser()  # load census data and indexes once in this worker
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children or ():
+            os.kill(pid, signal.SIGTERM)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the property insights JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    try:
+        require_secret("GOOGLE_PLACES_KEY")  # fail before binding rather than on the first request
+    except RuntimeError as exc:
+        parser.error(str(exc))
+    # Request traces are logged as one JSON object per line
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    print(f"serving on http://{args.host}:{args.port} with {args.workers} workers")
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
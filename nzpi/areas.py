@@ -0,0 +1,77 @@
+"""One row of headline metrics per SA2, for cross-suburb features.
+
+Combines population, growth and median household income with the
+demographic shares from :mod:`nzpi.profiles` into a single frame indexed by
+SA2 code. Stats NZ suppression sentinels (-999 confidential, -998 not
+applicable) become NaN here so they cannot skew comparisons.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nzpi.census import CODE_COL, NAME_COL
+from nzpi.profiles import get_profiles
+from nzpi.schema import parse_header
+
+_lock = threading.Lock()
+_built = {}
+
+
+# Column choices shared with the single-address page, so both report the same figures
+def population_column(pop_df):
+    cols = [col for col in pop_df.columns if '2023' in col and 'population' in col.lower()]
+    return cols[0] if cols else None
+
+
+def growth_column(pop_df):
+    # Latest intercensal percentage change ("Change 2018-2023"), not whichever header matches first
+    changes = [spec for spec in map(parse_header, pop_df.columns)
+               if spec is not None and spec.year.startswith("Change") and spec.measure == "Percent"]
+    if changes:
+        return max(changes, key=lambda spec: spec.year).column
+    cols = [col for col in pop_df.columns if 'change' in col.lower() or 'growth' in col.lower()]
+    return cols[0] if cols else None
+
+
+def income_column(income_df):
+    # Latest census year's median (2023), matching growth and the profile shares; not the first (2013)
+    medians = [spec for spec in map(parse_header, income_df.columns)
+               if spec is not None and spec.year.isdigit() and spec.measure == "Median"
+               and 'income' in spec.variable.lower()]
+    if medians:
+        return max(medians, key=lambda spec: spec.year).column
+    cols = [col for col in income_df.columns if 'median' in col.lower() and 'income' in col.lower()]
+    return cols[0] if cols else None
+
+
+def _clean(series):
+    values = series.astype("float64")
+    return values.where(values > -998)
+
+
+def build_area_table(census):
+    pop = census.pop.set_index(CODE_COL)
+    income = census.income.set_index(CODE_COL)
+    table = pd.DataFrame({"name": pop[NAME_COL]})
+    for field, frame, col in (("pop", pop, population_column(census.pop)),
+                              ("growth", pop, growth_column(census.pop)),
+                              ("income", income, income_column(census.income))):
+        table[field] = _clean(frame[col]).reindex(table.index) if col else np.nan
+    # Pinned to 2018-2023 for screening, whatever growth_column picks for a future release
+    recent = census.schemas["pop"].column(year="Change 2018-2023", measure="Percent")
+    table["growth_2018_2023"] = _clean(pop[recent]).reindex(table.index) if recent else np.nan
+    shares = get_profiles(census).shares()
+    table = table.join(shares, how="left")
+    table.index.name = CODE_COL
+    return table
+
+
+def get_area_table(census):
+    """Return the process-wide per-SA2 metrics frame for ``census``."""
+    with _lock:
+        table = _built.get(census.version)
+        if table is None:
+            table = build_area_table(census)
+            _built[census.version] = table
+        return table
@@ -0,0 +1,234 @@
+"""Bulk portfolio scoring.
+
+Scores many addresses with the same fields as the single-address page. Input
+is processed in chunks: Places lookups for a chunk run on a bounded thread
+pool behind a rate limiter, the chunk's elevations are fetched in one batched
+call, and the next chunk is already geocoding while the current one is scored
+and written. Rows are appended to the output as each chunk completes, so an
+interrupted run can be resumed: addresses already scored ("ok" or
+"not_found") are skipped, while "error" rows and "partial" rows (located, but
+the elevation lookup failed) are retried and the new row is appended after the
+old one (the last row for an address is current). Every input row gets an
+output row, duplicates included.
+
+    python -m nzpi.batch portfolio.csv results.csv --column address --workers 8 --rate 10
+"""
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from nzpi.analysis import INSIGHT_FIELDS, get_analyser
+from nzpi.outbound import OutboundBusy
+from nzpi.settings import require_secret
+
+OUTPUT_FIELDS = ("input_address", "status", "error", *INSIGHT_FIELDS)
+CHUNK_SIZE = 100  # one batched elevation call per chunk
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 10.0  # Places requests per second
+BUSY_RETRY = 1.0  # seconds to back off when the shared Places limit sheds a lookup
+BUSY_ATTEMPTS = 30  # lookups shed this many times in a row become an error row (retried on resume)
+# Statuses that a resumed run scores again
+RETRY_STATUSES = ("error", "partial")
+
+
+class RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def read_addresses(path, column=None):
+    """Address strings from a CSV (``column``, else an "address" column, else the first)."""
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if column is None:
+        column = "address" if "address" in frame.columns else frame.columns[0]
+    return [a.strip() for a in frame[column] if a.strip()]
+
+
+def _row(address, status, error="", insights=None):
+    row = {"input_address": address, "status": status, "error": error}
+    for field in INSIGHT_FIELDS:
+        row[field] = (insights or {}).get(field, "")
+    return row
+
+
+def flat_row(row):
+    """``row`` for a tabular sink: dict and list fields (profiles, SA2 codes) as JSON text."""
+    return {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in row.items()}
+
+
+def score_addresses(addresses, analyser, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE,
+                    busy_retry=BUSY_RETRY, busy_attempts=BUSY_ATTEMPTS):
+    """Yield one output row per address, in input order, with insight values unencoded."""
+    limiter = RateLimiter(rate)
+
+    def locate(address):
+        place = analyser.locate_offline(address)
+        if place is not None:
+            return place, ""  # gazetteer hit: no Places call, so no pacing
+        limiter.acquire()
+        for attempt in range(1, busy_attempts + 1):
+            try:
+                return analyser.locate(address, offline=False), ""
+            except OutboundBusy as exc:
+                if attempt == busy_attempts:
+                    return None, f"{type(exc).__name__}: {exc}"
+                time.sleep(busy_retry)  # shared Places quota saturated by other sessions; wait our turn
+            except Exception as exc:  # one bad address must not stop the portfolio
+                return None, f"{type(exc).__name__}: {exc}"
+
+    addresses = list(addresses)
+    chunks = (addresses[i:i + chunk_size] for i in range(0, len(addresses), chunk_size))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, [pool.submit(locate, a) for a in chunk]))
+            if len(pending) < 2:
+                continue  # keep the next chunk geocoding while this one is scored
+            yield from _finish(analyser, *pending.popleft())
+        while pending:
+            yield from _finish(analyser, *pending.popleft())
+
+
+def _finish(analyser, chunk, futures):
+    located = [f.result() for f in futures]
+    points = [(place["lat"], place["lon"]) for place, _ in located if place is not None]
+    elevations = iter(analyser.elevation_client.elevations(points))
+    for address, (place, error) in zip(chunk, located):
+        if place is None:
+            yield _row(address, "error" if error else "not_found", error)
+            continue
+        elevation = next(elevations)
+        insights = analyser.place_insights(place, elevation)
+        if elevation is None:
+            yield _row(address, "partial", "elevation unavailable", insights)
+        else:
+            yield _row(address, "ok", insights=insights)
+
+
+class CsvSink:
+    """Appends rows to a CSV, writing the header only for a new file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def completed(self):
+        """Scored rows per input address; :data:`RETRY_STATUSES` rows do not count, so they are retried."""
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return Counter()
+        with open(self.path, newline="", encoding="utf-8") as f:
+            return Counter(row["input_address"] for row in csv.DictReader(f)
+                           if row["status"] not in RETRY_STATUSES)
+
+    def write(self, rows):
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+            if new:
+                writer.writeheader()
+            writer.writerows(map(flat_row, rows))
+
+
+class ParquetSink:
+    """Writes each chunk as a numbered part file in a directory (needs pyarrow)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def _parts(self):
+        return sorted(self.path.glob("part-*.parquet")) if self.path.exists() else []
+
+    def completed(self):
+        """Scored rows per input address; :data:`RETRY_STATUSES` rows do not count, so they are retried."""
+        done = Counter()
+        for part in self._parts():
+            frame = pd.read_parquet(part, columns=["input_address", "status"])
+            done.update(frame.loc[~frame["status"].isin(RETRY_STATUSES), "input_address"])
+        return done
+
+    def write(self, rows):
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Fields mix numbers and "N/A", so every column is text; missing values are empty, as in the CSV
+        frame = pd.DataFrame(map(flat_row, rows), columns=OUTPUT_FIELDS).fillna("").astype(str)
+        frame.to_parquet(self.path / f"part-{len(self._parts()):06d}.parquet", index=False)
+
+
+def open_sink(path):
+    return ParquetSink(path) if str(path).endswith(".parquet") else CsvSink(path)
+
+
+def run(addresses, sink, analyser, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE,
+        progress=None):
+    """Score every address not already in ``sink``, flushing one chunk at a time.
+
+    ``progress(done, total)`` is called after each flush. Returns the number
+    of rows written.
+    """
+    done = sink.completed()
+    todo = []
+    for address in addresses:  # duplicates are kept: one output row per input row
+        if done[address]:
+            done[address] -= 1
+        else:
+            todo.append(address)
+    written, buffer = 0, []
+    for row in score_addresses(todo, analyser, workers, rate, chunk_size):
+        buffer.append(row)
+        if len(buffer) >= chunk_size:
+            sink.write(buffer)
+            written += len(buffer)
+            buffer = []
+            if progress:
+                progress(written, len(todo))
+    if buffer:
+        sink.write(buffer)
+        written += len(buffer)
+        if progress:
+            progress(written, len(todo))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV of NZ addresses.")
+    parser.add_argument("input", help="CSV file with one address per row")
+    parser.add_argument("output", help="output .csv file, or .parquet directory of part files")
+    parser.add_argument("--column", help="address column (default: 'address' or the first column)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="concurrent Places lookups")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="max Places requests per second")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    try:
+        key = require_secret("GOOGLE_PLACES_KEY")
+    except RuntimeError as exc:
+        parser.error(str(exc))
+    addresses = read_addresses(args.input, args.column)
+
+    def progress(done, total):
+        print(f"{done}/{total} scored", file=sys.stderr)
+
+    written = run(addresses, open_sink(args.output), get_analyser(key), args.workers, args.rate,
+                  args.chunk_size, progress)
+    print(f"wrote {written} rows to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Offline SA2 assignment from latitude/longitude.
+
+Optional: loads a local GeoJSON or shapefile export of the Stats NZ
+"Statistical Area 2 2023" polygons and answers point-in-polygon queries without
+going through the address text. Coordinates must be WGS84 lon/lat, as GeoJSON
+requires; shapefiles need pyshp and must be exported in WGS84 (EPSG:4326), not
+the default NZTM, since nothing here reprojects. Polygon parts are bucketed
+into a regular grid by bounding box; a query only ray-casts the parts
+registered in its cell, and all points that fall in the same cell are tested
+against a part in one vectorized pass.
+"""
+import json
+import math
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from nzpi.census import DATA_DIR
+
+BOUNDARIES_PATH = DATA_DIR / "sa2_2023.geojson"
+SHAPEFILE_PATH = DATA_DIR / "sa2_2023.shp"  # used when the GeoJSON is absent
+# Property holding the SA2 code in the Stats NZ export
+CODE_FIELDS = ("SA22023_V1_00", "SA22023_V1", "SA2_code")
+CELL_DEGREES = 0.05
+# Cap on points x edges evaluated at once, to bound temporary memory
+MAX_BLOCK = 4_000_000
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _polygons(geometry):
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"]]
+    if geometry["type"] == "MultiPolygon":
+        return geometry["coordinates"]
+    return []
+
+
+class SA2Boundaries:
+    def __init__(self, features, code_field=None):
+        self.part_codes = []
+        self.part_edges = []  # (E, 4) arrays of x1, y1, x2, y2 over every ring of the part
+        self.part_areas = []
+        self.part_centroids = []  # (lat, lon) of each part's exterior ring
+        bboxes = []
+        for feature in features:
+            props = feature.get("properties") or {}
+            field = code_field or next((f for f in CODE_FIELDS if f in props), None)
+            if field is None:
+                continue
+            code = int(props[field])
+            for rings in _polygons(feature.get("geometry")):
+                edges = []
+                for ring in rings:
+                    pts = np.asarray(ring, dtype="float64")[:, :2]
+                    edges.append(np.hstack([pts[:-1], pts[1:]]))
+                x, y, x2, y2 = edges[0].T
+                cross = x * y2 - x2 * y
+                area = cross.sum() / 2
+                if area:
+                    centroid = (((y + y2) * cross).sum() / (6 * area), ((x + x2) * cross).sum() / (6 * area))
+                else:
+                    centroid = (y.mean(), x.mean())
+                self.part_areas.append(abs(area))
+                self.part_centroids.append(centroid)
+                edges = np.vstack(edges)
+                self.part_codes.append(code)
+                self.part_edges.append(edges)
+                xs, ys = edges[:, [0, 2]], edges[:, [1, 3]]
+                bboxes.append((xs.min(), ys.min(), xs.max(), ys.max()))
+        self.bboxes = np.array(bboxes, dtype="float64").reshape(-1, 4)
+        self.grid = {}
+        for part, (x0, y0, x1, y1) in enumerate(self.bboxes):
+            for cx in range(math.floor(x0 / CELL_DEGREES), math.floor(x1 / CELL_DEGREES) + 1):
+                for cy in range(math.floor(y0 / CELL_DEGREES), math.floor(y1 / CELL_DEGREES) + 1):
+                    self.grid.setdefault((cx, cy), []).append(part)
+
+    @classmethod
+    def from_geojson(cls, path, code_field=None):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["features"], code_field)
+
+    @classmethod
+    def from_shapefile(cls, path, code_field=None):
+        """Load a WGS84 ``.shp`` (with its ``.shx``/``.dbf``; needs pyshp)."""
+        try:
+            import shapefile
+        except ImportError as exc:
+            raise RuntimeError("pyshp is required to read SA2 shapefiles") from exc
+        with shapefile.Reader(str(path)) as reader:
+            x0, y0, x1, y1 = reader.bbox
+            if not (-180 <= x0 <= x1 <= 360 and -90 <= y0 <= y1 <= 90):
+                raise ValueError(f"{path}: coordinates are not WGS84 lon/lat; export the layer as EPSG:4326")
+            return cls([record.__geo_interface__ for record in reader.iterShapeRecords()], code_field)
+
+    @classmethod
+    def load(cls, path, code_field=None):
+        """Load a ``.shp`` shapefile or a GeoJSON file, by extension."""
+        if Path(path).suffix.lower() == ".shp":
+            return cls.from_shapefile(path, code_field)
+        return cls.from_geojson(path, code_field)
+
+    def _inside(self, part, px, py):
+        """Even-odd ray cast of points against every ring of one polygon part."""
+        e = self.part_edges[part]
+        x1, y1, x2, y2 = e[:, 0], e[:, 1], e[:, 2], e[:, 3]
+        inside = np.zeros(len(px), dtype=bool)
+        step = max(1, MAX_BLOCK // len(e))
+        for start in range(0, len(px), step):
+            qx = px[start:start + step, None]
+            qy = py[start:start + step, None]
+            straddles = (y1 > qy) != (y2 > qy)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cross_x = (x2 - x1) * (qy - y1) / (y2 - y1) + x1
+            crossings = np.count_nonzero(straddles & (qx < cross_x), axis=1)
+            inside[start:start + step] = crossings % 2 == 1
+        return inside
+
+    def assign(self, lats, lons):
+        """Return the containing SA2 code for each point (0 where none contains it)."""
+        lats = np.asarray(lats, dtype="float64").ravel()
+        lons = np.asarray(lons, dtype="float64").ravel()
+        result = np.zeros(len(lats), dtype="int64")
+        cells = np.stack([np.floor(lons / CELL_DEGREES), np.floor(lats / CELL_DEGREES)], axis=1)
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        for k, (cx, cy) in enumerate(keys):
+            idx = np.flatnonzero(inverse == k)
+            for part in self.grid.get((int(cx), int(cy)), ()):
+                pending = idx[result[idx] == 0]
+                if not len(pending):
+                    break
+                x0, y0, x1, y1 = self.bboxes[part]
+                px, py = lons[pending], lats[pending]
+                in_box = (px >= x0) & (px <= x1) & (py >= y0) & (py <= y1)
+                if not in_box.any():
+                    continue
+                hits = pending[in_box][self._inside(part, px[in_box], py[in_box])]
+                result[hits] = self.part_codes[part]
+        return result
+
+    def centroids(self):
+        """``{code: (lat, lon)}`` using the centroid of each SA2's largest part."""
+        best = {}
+        for code, area, centroid in zip(self.part_codes, self.part_areas, self.part_centroids):
+            if code not in best or area > best[code][0]:
+                best[code] = (area, centroid)
+        return {code: centroid for code, (_, centroid) in best.items()}
+
+    def locate(self, lat, lon):
+        """SA2 code containing one point, or None."""
+        code = int(self.assign([lat], [lon])[0])
+        return code or None
+
+
+def get_boundaries(path=None):
+    """Return the process-wide :class:`SA2Boundaries`, or None if the file is absent."""
+    if path is None:
+        path = BOUNDARIES_PATH if BOUNDARIES_PATH.exists() or not SHAPEFILE_PATH.exists() else SHAPEFILE_PATH
+    path = Path(path)
+    with _lock:
+        if path not in _loaded:
+            _loaded[path] = SA2Boundaries.load(path) if path.exists() else None
+        return _loaded[path]
@@ -0,0 +1,274 @@
+"""Census CSV loading.
+
+Each census CSV is parsed at most once per process and the resulting frames are
+shared by every Streamlit session, so callers must treat them as read-only.
+
+Parsed tables are also written to a binary snapshot under ``data/.snapshot``:
+one ``.npy`` block holding the numeric columns (column-major, so each column is
+contiguous) plus a JSON manifest with the column order, dtypes and text columns.
+A snapshot is reused while the source file's mtime and size are unchanged; when
+the mtime moves the file is re-hashed and the snapshot is rebuilt only if the
+SHA-256 differs.
+
+The wide households table (~270 columns over 2013/2018/2023) is loaded pruned:
+only the columns selected by :data:`HOUSEHOLD_SELECTIONS` (matched through the
+header grammar, see :mod:`nzpi.schema`) are parsed, counts are downcast to
+int32/float32 and SA2 names become categoricals. ``python -m nzpi.census``
+reports the memory saved.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from nzpi.schema import SchemaIndex
+from nzpi.telemetry import count, span
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+SNAPSHOT_DIRNAME = ".snapshot"
+SNAPSHOT_FORMAT = 1
+
+POP_CSV = "2023_Census_population_change_by_SA2_5545354433051253430.csv"
+INCOME_CSV = "2023_Census_totals_by_topic_for_households_by_SA2_-132143055565075773.csv"
+INDIVIDUALS_CSV = "individuals_clean_wide.csv"
+
+CODE_COL = "Statistical area 2 (SA2) 2023 code"
+NAME_COL = "Statistical area 2 (SA2) 2023 name"
+ASCII_NAME_COL = "Statistical area 2 (SA2) 2023 name no macrons"
+
+# Households columns the analysis and insight features read; everything else is skipped
+HOUSEHOLD_KEY_COLUMNS = (CODE_COL, NAME_COL, ASCII_NAME_COL)
+HOUSEHOLD_SELECTIONS = (
+    {"measure": "Median", "variable": "household income"},  # every census year; see areas.income_column
+)
+CATEGORICAL_COLS = (NAME_COL, ASCII_NAME_COL)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CensusData:
+    pop: pd.DataFrame
+    income: pd.DataFrame
+    individuals: pd.DataFrame
+    # Short digest of all source files; changes whenever any CSV changes
+    version: str
+    # Parsed header index per table, keyed "pop" / "income" / "individuals"
+    schemas: dict = field(default_factory=dict)
+    # Directory the CSVs came from, for features that need columns pruned from ``income``
+    data_dir: Path = None
+
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(path, variant=""):
+    base = path.parent / SNAPSHOT_DIRNAME / (f"{path.stem}.{variant}" if variant else path.stem)
+    return base / "manifest.json", base / "numeric.npy"
+
+
+def _write_json_atomic(target, payload):
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def _read_snapshot(path, stat, variant=""):
+    """Return ``(frame, sha256)``; ``frame`` is None when the snapshot is stale."""
+    manifest_path, numeric_path = _snapshot_paths(path, variant)
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None, None
+    if manifest.get("format") != SNAPSHOT_FORMAT or manifest.get("size") != stat.st_size:
+        return None, None
+    if manifest.get("mtime_ns") != stat.st_mtime_ns:
+        digest = _sha256(path)
+        if digest != manifest.get("sha256"):
+            return None, digest
+        # Touched but unchanged: remember the new mtime so we skip hashing next time
+        manifest["mtime_ns"] = stat.st_mtime_ns
+        try:
+            _write_json_atomic(manifest_path, manifest)
+        except OSError:
+            pass
+    try:
+        numeric = np.load(numeric_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None, manifest["sha256"]
+    data = {}
+    for col in manifest["columns"]:
+        if col["kind"] == "numeric":
+            data[col["name"]] = numeric[col["index"]].astype(col["dtype"])
+        else:
+            data[col["name"]] = pd.Series(manifest["text"][col["name"]], dtype=col["dtype"])
+    # copy() consolidates the per-column arrays into one block per dtype
+    return pd.DataFrame(data).copy(), manifest["sha256"]
+
+
+def _write_snapshot(path, stat, frame, digest, variant=""):
+    manifest_path, numeric_path = _snapshot_paths(path, variant)
+    numeric_cols = frame.select_dtypes(include="number").columns
+    columns, text = [], {}
+    for name in frame.columns:
+        if name in numeric_cols:
+            columns.append({"name": name, "kind": "numeric", "dtype": str(frame[name].dtype),
+                            "index": numeric_cols.get_loc(name)})
+        else:
+            values = frame[name].astype(object)
+            text[name] = values.where(values.notna(), None).tolist()
+            columns.append({"name": name, "kind": "text", "dtype": str(frame[name].dtype)})
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "source": path.name,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest,
+        "columns": columns,
+        "text": text,
+    }
+    try:
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        block = np.ascontiguousarray(frame[numeric_cols].to_numpy(dtype="float64").T)
+        tmp = numeric_path.with_suffix(".tmp.npy")
+        np.save(tmp, block)
+        os.replace(tmp, numeric_path)
+        _write_json_atomic(manifest_path, manifest)
+    except OSError:
+        # Read-only deployments still work, they just re-parse on the next cold start
+        pass
+
+
+def compact_dtypes(frame):
+    """Downcast integer counts to int32, floats to float32 and SA2 names to categoricals."""
+    int32 = np.iinfo("int32")
+    dtypes = {}
+    for col in frame.columns:
+        values = frame[col]
+        if col in CATEGORICAL_COLS:
+            dtypes[col] = "category"
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            if values.empty or (values.min() >= int32.min and values.max() <= int32.max):
+                dtypes[col] = "int32"
+        elif pd.api.types.is_float_dtype(values.dtype):
+            dtypes[col] = "float32"
+    return frame.astype(dtypes)
+
+
+def household_columns(path):
+    """Columns of the households CSV to load, in file order."""
+    header = pd.read_csv(path, nrows=0).columns
+    schema = SchemaIndex(header)
+    wanted = set(HOUSEHOLD_KEY_COLUMNS)
+    for criteria in HOUSEHOLD_SELECTIONS:
+        wanted.update(schema.select(**criteria))
+    return [col for col in header if col in wanted]
+
+
+def load_csv(path, usecols=None, compact=False):
+    """Load one census CSV via its snapshot. Returns ``(frame, sha256)``.
+
+    ``usecols`` limits parsing to those columns and ``compact`` applies
+    :func:`compact_dtypes`; each such variant has its own snapshot.
+    """
+    path = Path(path)
+    stat = path.stat()
+    variant = ""
+    if usecols is not None or compact:
+        variant = hashlib.sha256(json.dumps([usecols, compact]).encode()).hexdigest()[:8]
+    with span("load_csv"):
+        frame, digest = _read_snapshot(path, stat, variant)
+        count("cache_requests", cache="snapshot", result="miss" if frame is None else "hit")
+        if frame is None:
+            frame = pd.read_csv(path, usecols=usecols)
+            if compact:
+                frame = compact_dtypes(frame)
+            digest = digest or _sha256(path)
+            _write_snapshot(path, stat, frame, digest, variant)
+    return frame, digest
+
+
+def load_households(path):
+    """Pruned, compacted households table. Returns ``(frame, sha256)``.
+
+    Only :data:`HOUSEHOLD_SELECTIONS` survive; use :func:`load_all_households`
+    for every variable.
+    """
+    frame, digest = load_csv(path, usecols=household_columns(path), compact=True)
+    logger.info("households: %d columns, %.1f MB", frame.shape[1], frame.memory_usage(deep=True).sum() / 1e6)
+    return frame, digest
+
+
+def load_all_households(data_dir):
+    """Every households column, compacted, via its own snapshot. Returns ``(frame, sha256)``."""
+    return load_csv(Path(data_dir) / INCOME_CSV, compact=True)
+
+
+def memory_report(data_dir=DATA_DIR):
+    """Columns and bytes of the households table read in full versus pruned and compacted."""
+    path = Path(data_dir) / INCOME_CSV
+    full = pd.read_csv(path)
+    pruned, _ = load_households(path)
+    return {
+        "columns_before": full.shape[1],
+        "columns_after": pruned.shape[1],
+        "bytes_before": int(full.memory_usage(deep=True).sum()),
+        "bytes_after": int(pruned.memory_usage(deep=True).sum()),
+    }
+
+
+def _add_main_suburb(df):
+    # By name, not position: the pruned households table has no OBJECTID column
+    df["main_suburb"] = df[ASCII_NAME_COL].astype(str).str.strip().str.title()
+    return df
+
+
+def load_census(data_dir=DATA_DIR):
+    """Return the process-wide :class:`CensusData` for ``data_dir``."""
+    data_dir = Path(data_dir)
+    with _lock:
+        census = _loaded.get(data_dir)
+        if census is None:
+            with span("census_load"):
+                frames, digests = [], []
+                for name in (POP_CSV, INCOME_CSV, INDIVIDUALS_CSV):
+                    loader = load_households if name == INCOME_CSV else load_csv
+                    frame, digest = loader(data_dir / name)
+                    frames.append(_add_main_suburb(frame))
+                    digests.append(digest)
+                version = hashlib.sha256("".join(digests).encode()).hexdigest()[:12]
+                schemas = {name: SchemaIndex(frame.columns)
+                           for name, frame in zip(("pop", "income", "individuals"), frames)}
+                census = CensusData(*frames, version=version, schemas=schemas, data_dir=data_dir)
+            _loaded[data_dir] = census
+        return census
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report households table memory, full versus pruned.")
+    parser.add_argument("--data-dir", default=str(DATA_DIR))
+    args = parser.parse_args(argv)
+    report = memory_report(args.data_dir)
+    print(f"columns: {report['columns_before']} -> {report['columns_after']}")
+    print(f"memory:  {report['bytes_before'] / 1e6:.1f} MB -> {report['bytes_after'] / 1e6:.1f} MB "
+          f"({1 - report['bytes_after'] / report['bytes_before']:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
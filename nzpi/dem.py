@@ -0,0 +1,126 @@
+"""Offline elevation from a local, memory-mapped DEM.
+
+Alternative to the OpenTopoData client with the same ``elevation`` /
+``elevations`` interface. A DEM directory holds ``.npy`` float32 tiles in
+WGS84 plus a ``manifest.json``::
+
+    {"tiles": [{"path": "tile_0.npy", "bounds": [west, south, east, north], "nodata": -9999}]}
+
+Row 0 of each tile is its northern edge and samples sit at pixel centres.
+Tiles are opened with ``mmap_mode="r"`` on first use, so only the pages a
+query touches are read, and each batch of points is sampled with vectorized
+bilinear interpolation. :func:`convert_geotiff` builds such a directory from
+nzdem8m GeoTIFF tiles when rasterio is installed.
+"""
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from nzpi.census import DATA_DIR
+
+DEM_DIR = DATA_DIR / "dem"
+# Fractional pixel offsets closer than this to a sample are snapped onto it (8 m * 1e-6 = 8 um)
+SNAP_PIXELS = 1e-6
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def _lerp(a, b, t):
+    # Exact at the samples themselves, and a nodata neighbour does not leak into them
+    return np.where(t == 0, a, np.where(t == 1, b, a * (1 - t) + b * t))
+
+
+def _snap(v):
+    nearest = np.round(v)
+    return np.where(np.abs(v - nearest) < SNAP_PIXELS, nearest, v)
+
+
+class LocalDEM:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        manifest = json.loads((self.directory / "manifest.json").read_text(encoding="utf-8"))
+        self.tiles = manifest["tiles"]
+        self.bounds = np.array([t["bounds"] for t in self.tiles], dtype="float64").reshape(-1, 4)
+        self._arrays = [None] * len(self.tiles)
+        self._lock = threading.Lock()
+
+    def _tile(self, k):
+        if self._arrays[k] is None:
+            with self._lock:
+                if self._arrays[k] is None:
+                    self._arrays[k] = np.load(self.directory / self.tiles[k]["path"], mmap_mode="r")
+        return self._arrays[k]
+
+    def _bilinear(self, k, lats, lons):
+        grid = self._tile(k)
+        rows, cols = grid.shape
+        west, south, east, north = self.bounds[k]
+        # Fractional pixel-centre coordinates, clamped so edge points use the edge samples
+        x = np.clip(_snap((lons - west) / (east - west) * cols - 0.5), 0, cols - 1)
+        y = np.clip(_snap((north - lats) / (north - south) * rows - 0.5), 0, rows - 1)
+        x0 = np.minimum(np.floor(x).astype(np.intp), max(cols - 2, 0))
+        y0 = np.minimum(np.floor(y).astype(np.intp), max(rows - 2, 0))
+        x1 = np.minimum(x0 + 1, cols - 1)
+        y1 = np.minimum(y0 + 1, rows - 1)
+        fx, fy = x - x0, y - y0
+        corners = np.stack([grid[y0, x0], grid[y0, x1], grid[y1, x0], grid[y1, x1]]).astype("float64")
+        nodata = self.tiles[k].get("nodata")
+        if nodata is not None:
+            corners[corners == nodata] = np.nan
+        return _lerp(_lerp(corners[0], corners[1], fx), _lerp(corners[2], corners[3], fx), fy)
+
+    def sample(self, lats, lons):
+        """Bilinear elevations for arrays of points; NaN outside coverage or over nodata."""
+        lats = np.asarray(lats, dtype="float64").ravel()
+        lons = np.asarray(lons, dtype="float64").ravel()
+        out = np.full(len(lats), np.nan)
+        pending = np.ones(len(lats), dtype=bool)
+        for k, (west, south, east, north) in enumerate(self.bounds):
+            hit = pending & (lons >= west) & (lons <= east) & (lats >= south) & (lats <= north)
+            if hit.any():
+                out[hit] = self._bilinear(k, lats[hit], lons[hit])
+                pending &= ~hit
+        return out
+
+    def elevations(self, points):
+        """Elevation in metres for each ``(lat, lon)`` point, None where unavailable."""
+        if not points:
+            return []
+        lats, lons = zip(*points)
+        return [None if np.isnan(v) else float(v) for v in self.sample(lats, lons)]
+
+    def elevation(self, lat, lon):
+        return self.elevations([(lat, lon)])[0]
+
+
+def get_local_dem(directory=DEM_DIR):
+    """Return the process-wide :class:`LocalDEM`, or None if no manifest is present."""
+    directory = Path(directory)
+    with _lock:
+        if directory not in _loaded:
+            _loaded[directory] = LocalDEM(directory) if (directory / "manifest.json").exists() else None
+        return _loaded[directory]
+
+
+def convert_geotiff(sources, directory=DEM_DIR):
+    """Reproject GeoTIFF tiles to WGS84 ``.npy`` tiles and write the manifest (needs rasterio)."""
+    try:
+        import rasterio
+        from rasterio.vrt import WarpedVRT
+    except ImportError as exc:
+        raise RuntimeError("rasterio is required to convert GeoTIFF DEM tiles") from exc
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tiles = []
+    for k, source in enumerate(sources):
+        with rasterio.open(source) as ds, WarpedVRT(ds, crs="EPSG:4326") as vrt:
+            grid = vrt.read(1).astype("float32")
+            name = f"tile_{k}.npy"
+            np.save(directory / name, grid)
+            tiles.append({"path": name, "bounds": list(vrt.bounds),
+                          "nodata": None if vrt.nodata is None else float(vrt.nodata)})
+    (directory / "manifest.json").write_text(json.dumps({"tiles": tiles}), encoding="utf-8")
+    return directory
@@ -0,0 +1,146 @@
+"""Elevation lookups against the OpenTopoData ``nzdem8m`` dataset.
+
+One pooled ``requests.Session`` per process with connect/read timeouts and
+retry with exponential backoff on connection errors, 429 and 5xx. Lookups are
+batched up to the API's 100-locations-per-request limit, and results are
+cached per cell of an 8 m grid (the DEM resolution), so nearby points such as
+units in the same complex share one network lookup. Requests go through the
+shared outbound layer (:mod:`nzpi.outbound`), so identical in-flight batches
+are coalesced and the public API's rate limit is respected across sessions.
+Failed or shed lookups return None and are not cached.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from nzpi.outbound import OutboundBusy, get_provider
+from nzpi.telemetry import count, span
+
+OPENTOPODATA_URL = "https://api.opentopodata.org/v1"
+DATASET = "nzdem8m"
+MAX_LOCATIONS = 100  # OpenTopoData per-request limit
+GRID_METRES = 8.0
+METRES_PER_DEGREE = 111_320.0
+TIMEOUT = (3.05, 10)  # connect, read (seconds)
+CACHE_SIZE = 100_000
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def grid_cell(lat, lon):
+    """Index of the ~8 m cell containing a point."""
+    row = round(lat * METRES_PER_DEGREE / GRID_METRES)
+    lat_centre = row * GRID_METRES / METRES_PER_DEGREE
+    lon_step = GRID_METRES / (METRES_PER_DEGREE * math.cos(math.radians(lat_centre)))
+    return row, round(lon / lon_step)
+
+
+def cell_centre(cell):
+    row, col = cell
+    lat = row * GRID_METRES / METRES_PER_DEGREE
+    lon_step = GRID_METRES / (METRES_PER_DEGREE * math.cos(math.radians(lat)))
+    return lat, col * lon_step
+
+
+class ElevationClient:
+    def __init__(self, base_url=OPENTOPODATA_URL, dataset=DATASET, timeout=TIMEOUT, retries=3,
+                 backoff=0.5, cache_size=CACHE_SIZE, batch_size=MAX_LOCATIONS, provider=None):
+        self.url = f"{base_url.rstrip('/')}/{dataset}"
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.provider = provider or get_provider("opentopodata")
+        self.counters = {"hits": 0, "misses": 0, "requests": 0, "failures": 0}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _cached(self, cell):
+        with self._lock:
+            if cell in self._cache:
+                self._cache.move_to_end(cell)
+                self.counters["hits"] += 1
+                hit, value = True, self._cache[cell]
+            else:
+                self.counters["misses"] += 1
+                hit, value = False, None
+        count("cache_requests", cache="elevation", result="hit" if hit else "miss")
+        return hit, value
+
+    def _store(self, cell, value):
+        with self._lock:
+            self._cache[cell] = value
+            self._cache.move_to_end(cell)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _fetch(self, cells):
+        """Query one batch of cell centres; returns elevations (None on failure)."""
+        locations = "|".join(f"{lat:.6f},{lon:.6f}" for lat, lon in map(cell_centre, cells))
+
+        def request():
+            with self._lock:
+                self.counters["requests"] += 1
+            count("external_calls", provider="opentopodata")
+            try:
+                with span("elevation_request"):
+                    return self.session.get(self.url, params={"locations": locations}, timeout=self.timeout).json()
+            except (requests.RequestException, ValueError):
+                return {}
+
+        try:
+            data = self.provider.call((self.url, locations), request)
+        except OutboundBusy:
+            return [None] * len(cells)
+        if data.get("status") != "OK" or len(data.get("results", ())) != len(cells):
+            with self._lock:
+                self.counters["failures"] += 1
+            count("failures", provider="opentopodata")
+            return [None] * len(cells)
+        return [r.get("elevation") for r in data["results"]]
+
+    def elevations(self, points):
+        """Elevation in metres for each ``(lat, lon)`` point, None where unavailable."""
+        cells = [grid_cell(lat, lon) for lat, lon in points]
+        found = {}
+        missing = []
+        for cell in dict.fromkeys(cells):
+            hit, value = self._cached(cell)
+            if hit:
+                found[cell] = value
+            else:
+                missing.append(cell)
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            for cell, value in zip(batch, self._fetch(batch)):
+                found[cell] = value
+                if value is not None:
+                    self._store(cell, value)
+        return [found[cell] for cell in cells]
+
+    def elevation(self, lat, lon):
+        return self.elevations([(lat, lon)])[0]
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "size": len(self._cache)}
+
+
+def get_elevation_client(base_url=OPENTOPODATA_URL, dataset=DATASET):
+    """Return the process-wide :class:`ElevationClient` for ``base_url``/``dataset``."""
+    with _lock:
+        client = _clients.get((base_url, dataset))
+        if client is None:
+            client = ElevationClient(base_url, dataset)
+            _clients[(base_url, dataset)] = client
+        return client
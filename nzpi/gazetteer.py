@@ -0,0 +1,265 @@
+"""Offline street-address geocoding from a local LINZ NZ Addresses extract.
+
+Optional: :func:`build` turns a CSV or Parquet export of the LINZ "NZ
+Addresses" layer (~2M rows) into a directory of flat arrays:
+
+* ``keys.bin`` / ``key_offsets.npy`` – every address's normalized search keys
+  (``number road suburb town``, ``number road suburb`` and ``number road
+  town``), sorted, as one UTF-8 blob and its offsets;
+* ``key_rows.npy`` – the address row of each key;
+* ``lat.npy``, ``lon.npy``, ``locality.npy`` – per-address coordinates and an
+  index into the manifest's ``[suburb, town]`` list;
+* ``streets.bin`` / ``street_offsets.npy`` – the display ``number road`` text;
+* ``manifest.json``.
+
+Everything is memory-mapped, so loading costs a few milliseconds and a
+lookup only touches the pages its binary search reads. Queries are
+normalized like geocode cache keys (:func:`nzpi.geocode.normalize_query`),
+with any trailing postcode and "New Zealand" dropped. The sorted keys stand
+in for a prefix trie: the keys a query prefixes form one contiguous run,
+found by bisection. A query resolves when the best of its matches (exact
+key, then whole words, then a partial last word) belong to one address, so
+"18 lanyon pl whitby" and "18 lanyon pl, whitby heights, por" both resolve.
+A partial last word only resolves after at least one complete word: "2"
+alone would otherwise locate "20 Lanyon Place" whenever it is the only key
+starting with 2. Landmarks and ambiguous input return None and fall back to
+Google Places.
+
+    python -m nzpi.gazetteer build nz-addresses.csv
+    python -m nzpi.gazetteer lookup "18 Lanyon Pl, Whitby"
+"""
+import argparse
+import bisect
+import json
+import mmap
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from nzpi.census import DATA_DIR
+from nzpi.geocode import normalize_query
+
+GAZETTEER_DIR = DATA_DIR / "gazetteer"
+FORMAT_VERSION = 1
+# LINZ column -> gazetteer field
+COLUMNS = {
+    "full_address_number": "number",
+    "full_road_name": "road",
+    "suburb_locality": "suburb",
+    "town_city": "town",
+    "gd2000_ycoord": "lat",
+    "gd2000_xcoord": "lon",
+}
+# Keys scanned per lookup before the query is treated as ambiguous
+MAX_CANDIDATES = 64
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def query_key(text):
+    """Search key for free text: :func:`normalize_query` without a trailing postcode or country."""
+    words = normalize_query(text).split()
+    if words[-2:] == ["new", "zealand"]:
+        words = words[:-2]
+    if words and len(words[-1]) == 4 and words[-1].isdigit():
+        words = words[:-1]
+    return " ".join(words)
+
+
+class _Strings:
+    """Read-only sequence view of a UTF-8 blob split at ``offsets``, usable with :mod:`bisect`."""
+
+    def __init__(self, path, offsets):
+        with open(path, "rb") as f:
+            self.blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if path.stat().st_size else b""
+        # Plain-int indexing through a memoryview is ~10x faster than numpy scalars
+        self.offsets = memoryview(np.asarray(offsets))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, k):
+        return self.blob[self.offsets[k]:self.offsets[k + 1]]
+
+
+def _pack(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+class Gazetteer:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.manifest = json.loads((self.directory / "manifest.json").read_text(encoding="utf-8"))
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{self.directory}: unsupported gazetteer format {self.manifest.get('version')}")
+        self.localities = [tuple(pair) for pair in self.manifest["localities"]]
+
+        def load(name):
+            return np.load(self.directory / name, mmap_mode="r")
+
+        self.keys = _Strings(self.directory / "keys.bin", load("key_offsets.npy"))
+        self.streets = _Strings(self.directory / "streets.bin", load("street_offsets.npy"))
+        self.key_rows = load("key_rows.npy")
+        self.lat = load("lat.npy")
+        self.lon = load("lon.npy")
+        self.locality = load("locality.npy")
+
+    def __len__(self):
+        return len(self.lat)
+
+    def _range(self, prefix):
+        # UTF-8 never contains 0xff, so every key starting with ``prefix`` sorts below prefix + b"\xff"
+        lo = bisect.bisect_left(self.keys, prefix)
+        return lo, bisect.bisect_left(self.keys, prefix + b"\xff", lo)
+
+    def address(self, row):
+        """``{"formatted_address", "lat", "lon", "suburb"}`` for an address row."""
+        suburb, town = self.localities[self.locality[row]]
+        parts = [self.streets[row].decode("utf-8"), suburb]
+        if town and town != suburb:
+            parts.append(town)
+        return {"formatted_address": ", ".join(p for p in parts if p), "lat": float(self.lat[row]),
+                "lon": float(self.lon[row]), "suburb": suburb}
+
+    def rows(self, text, limit=MAX_CANDIDATES, partial=True):
+        """Distinct address rows of the best keys the query prefixes: exact, else whole words, else any.
+
+        With ``partial=False`` the last tier is only used when a complete word precedes the partial one.
+        """
+        prefix = query_key(text).encode("utf-8")
+        if not prefix:
+            return []
+        partial = partial or b" " in prefix
+        lo, hi = self._range(prefix)
+        exact, whole, partial_rows = {}, {}, {}
+        for k in range(lo, min(hi, lo + limit)):
+            key = self.keys[k]
+            # "... whitby" must not lose to "... whitby heights", nor "1 main" match "1 mainstreet"
+            if len(key) == len(prefix):
+                bucket = exact
+            else:
+                bucket = whole if key[len(prefix)] == 0x20 else partial_rows
+            bucket.setdefault(int(self.key_rows[k]), None)
+        return list(exact or whole or (partial_rows if partial else ()))
+
+    def resolve(self, text):
+        """The single address matching ``text`` as a Places-style candidate, or None if none or several."""
+        rows = self.rows(text, partial=False)
+        return self.address(rows[0]) if len(rows) == 1 else None
+
+    def complete(self, text, limit=10):
+        """Up to ``limit`` addresses completing partial input, in key order."""
+        return [self.address(row) for row in self.rows(text, limit * 4)[:limit]]
+
+
+def _read_extract(source):
+    """LINZ address rows renamed to the :data:`COLUMNS` fields (Parquet needs pyarrow)."""
+    if str(source).endswith(".parquet"):
+        frame = pd.read_parquet(source, columns=list(COLUMNS))
+    else:
+        frame = pd.read_csv(source, usecols=lambda c: c in COLUMNS, dtype=str, keep_default_na=False)
+    missing = [c for c in COLUMNS if c not in frame.columns]
+    if missing:
+        raise ValueError(f"{source}: missing LINZ address columns {missing}")
+    frame = frame[list(COLUMNS)].rename(columns=COLUMNS)
+    frame["lat"] = pd.to_numeric(frame["lat"], errors="coerce")
+    frame["lon"] = pd.to_numeric(frame["lon"], errors="coerce")
+    frame = frame.dropna(subset=["lat", "lon"])
+    for field in ("number", "road", "suburb", "town"):
+        frame[field] = frame[field].fillna("").astype(str).str.strip()
+    return frame[(frame["number"] != "") & (frame["road"] != "")].reset_index(drop=True)
+
+
+def build(source, directory=GAZETTEER_DIR):
+    """Build a gazetteer directory from a LINZ NZ Addresses CSV or Parquet extract."""
+    frame = _read_extract(source)
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    localities = pd.MultiIndex.from_frame(frame[["suburb", "town"]]).drop_duplicates()
+    locality = localities.get_indexer(pd.MultiIndex.from_frame(frame[["suburb", "town"]])).astype("int32")
+    streets = (frame["number"] + " " + frame["road"]).tolist()
+
+    # normalize_query works word by word, so each distinct number, road and place is normalized once
+    fields = [frame[f].tolist() for f in ("number", "road", "suburb", "town")]
+    normal = {value: normalize_query(value) for values in fields for value in set(values)}
+    # Code-point order of str equals byte order of their UTF-8, so the packed blob is sorted
+    entries = sorted(
+        (key, row)
+        for row, (number, road, suburb, town) in enumerate(zip(*fields))
+        for key in {" ".join(filter(None, parts)) for parts in (
+            (normal[number], normal[road], normal[suburb], normal[town]),
+            (normal[number], normal[road], normal[suburb]),
+            (normal[number], normal[road], normal[town]),
+        )}
+    )
+    key_blob, key_offsets = _pack([key for key, _ in entries])
+    street_blob, street_offsets = _pack(streets)
+
+    (directory / "keys.bin").write_bytes(key_blob)
+    np.save(directory / "key_offsets.npy", key_offsets)
+    np.save(directory / "key_rows.npy", np.array([row for _, row in entries], dtype="int32"))
+    (directory / "streets.bin").write_bytes(street_blob)
+    np.save(directory / "street_offsets.npy", street_offsets)
+    np.save(directory / "lat.npy", frame["lat"].to_numpy("float64"))
+    np.save(directory / "lon.npy", frame["lon"].to_numpy("float64"))
+    np.save(directory / "locality.npy", locality)
+    manifest = {"version": FORMAT_VERSION, "source": Path(source).name, "addresses": len(frame),
+                "keys": len(entries), "localities": [list(pair) for pair in localities]}
+    (directory / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    with _lock:
+        _loaded.pop(directory, None)
+    return directory
+
+
+def get_gazetteer(directory=GAZETTEER_DIR):
+    """Return the process-wide :class:`Gazetteer`, or None if no index has been built."""
+    directory = Path(directory)
+    with _lock:
+        if directory not in _loaded:
+            _loaded[directory] = Gazetteer(directory) if (directory / "manifest.json").exists() else None
+        return _loaded[directory]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline address lookup from a LINZ NZ Addresses extract.")
+    parser.add_argument("--dir", default=str(GAZETTEER_DIR), help="gazetteer directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="index a LINZ NZ Addresses CSV or Parquet extract")
+    build_cmd.add_argument("source")
+    lookup = commands.add_parser("lookup", help="resolve addresses against the index")
+    lookup.add_argument("address", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        build(args.source, args.dir)
+        manifest = json.loads((Path(args.dir) / "manifest.json").read_text(encoding="utf-8"))
+        print(f"{manifest['addresses']} addresses, {manifest['keys']} keys in {args.dir} "
+              f"({time.perf_counter() - start:.1f}s)")
+        return
+    gazetteer = get_gazetteer(args.dir)
+    if gazetteer is None:
+        parser.error(f"no gazetteer in {args.dir}; run the build command first")
+    for address in args.address:
+        start = time.perf_counter()
+        place = gazetteer.resolve(address)
+        elapsed = (time.perf_counter() - start) * 1e6
+        if place is None:
+            matches = gazetteer.complete(address, limit=5)
+            print(f"{address!r}: {'ambiguous' if matches else 'not found'} ({elapsed:.0f} us)")
+            for match in matches:
+                print(f"    {match['formatted_address']}")
+        else:
+            print(f"{address!r}: {place['formatted_address']} ({place['lat']:.6f}, {place['lon']:.6f}) "
+                  f"({elapsed:.0f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Google Places lookup behind a persistent, process-wide geocode cache.
+
+Cache keys are normalized queries, so "18 Lanyon Pl, Whitby" and
+"18 lanyon place whitby" share one entry. Entries live in SQLite, expire after
+a TTL (Google allows coordinates to be cached for up to 30 days) and the
+least recently used rows are evicted once the table exceeds ``max_entries``.
+Only successful lookups are cached. Places requests go through the shared
+outbound layer (:mod:`nzpi.outbound`), which coalesces identical in-flight
+lookups and rate-limits them across sessions. Only ``ZERO_RESULTS`` means
+"not found": a Places quota error raises :class:`~nzpi.outbound.OutboundBusy`,
+and any other error status or network failure raises :class:`PlacesError`.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+from nzpi.census import DATA_DIR
+from nzpi.outbound import OutboundBusy, get_provider
+from nzpi.suburbs import normalize
+from nzpi.telemetry import count, span
+
+PLACES_URL = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
+CACHE_PATH = DATA_DIR / ".cache" / "geocode.sqlite"
+DEFAULT_TTL = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50_000
+PLACES_TIMEOUT = 10
+
+ABBREVIATIONS = {
+    "st": "street", "rd": "road", "ave": "avenue", "av": "avenue", "pl": "place", "dr": "drive",
+    "cres": "crescent", "cr": "crescent", "tce": "terrace", "hwy": "highway", "ln": "lane",
+    "ct": "court", "cl": "close", "gr": "grove", "pde": "parade", "sq": "square", "mt": "mount",
+    "nth": "north", "sth": "south", "nz": "new zealand",
+}
+
+_lock = threading.Lock()
+_caches = {}
+
+
+class PlacesError(Exception):
+    """Places could not answer (network failure or an error status other than over-quota)."""
+
+
+def normalize_query(query):
+    """Cache key for a free-text address: normalized words with abbreviations expanded."""
+    return " ".join(ABBREVIATIONS.get(word, word) for word in normalize(query).split())
+
+
+class GeocodeCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        if str(path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY, payload TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS geocode_accessed ON geocode (accessed)")
+
+    def get(self, query):
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT payload, created FROM geocode WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM geocode WHERE key = ?", (key,))
+                self.counters["expired"] += 1
+                row = None
+            if row is None:
+                self.counters["misses"] += 1
+                count("cache_requests", cache="geocode", result="miss")
+                return None
+            self._db.execute("UPDATE geocode SET accessed = ? WHERE key = ?", (now, key))
+            self.counters["hits"] += 1
+        count("cache_requests", cache="geocode", result="hit")
+        return json.loads(row[0])
+
+    def put(self, query, value):
+        key = normalize_query(query)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocode (key, payload, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            size = self._db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+            excess = size - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM geocode WHERE key IN (SELECT key FROM geocode ORDER BY accessed LIMIT ?)",
+                    (excess,),
+                )
+                self.counters["evictions"] += excess
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+            return {**self.counters, "size": size}
+
+
+def get_geocode_cache(path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """Return the process-wide :class:`GeocodeCache` for ``path``."""
+    with _lock:
+        cache = _caches.get(str(path))
+        if cache is None:
+            cache = GeocodeCache(path, ttl, max_entries)
+            _caches[str(path)] = cache
+        return cache
+
+
+def find_place(query, api_key, cache=None, url=PLACES_URL, provider=None):
+    """Best Places candidate for ``query`` as ``{"formatted_address", "lat", "lon"}``, or None if not found.
+
+    Raises :class:`nzpi.outbound.OutboundBusy` when Places is saturated or
+    over quota, and :class:`PlacesError` when it fails otherwise.
+    """
+    if cache is not None:
+        hit = cache.get(query)
+        if hit is not None:
+            return hit
+    params = {
+        "input": query,
+        "inputtype": "textquery",
+        "fields": "formatted_address,geometry",
+        "key": api_key,
+        "locationbias": "country:nz",
+    }
+
+    def request():
+        count("external_calls", provider="places")
+        try:
+            with span("places_request"):
+                return requests.get(url, params=params, timeout=PLACES_TIMEOUT).json()
+        except (requests.RequestException, ValueError) as exc:
+            count("failures", provider="places")
+            raise PlacesError(f"Places request failed: {exc}") from exc
+
+    provider = provider or get_provider("places")
+    data = provider.call((url, api_key, normalize_query(query)), request)
+    status = data.get("status")
+    if status not in ("OK", "ZERO_RESULTS"):
+        count("failures", provider="places")
+        detail = f"Places answered {status}: {data.get('error_message', '')}".rstrip(": ")
+        raise OutboundBusy(detail) if status == "OVER_QUERY_LIMIT" else PlacesError(detail)
+    if status != "OK" or not data["candidates"]:
+        return None
+    candidate = data["candidates"][0]
+    place = {
+        "formatted_address": candidate["formatted_address"],
+        "lat": candidate["geometry"]["location"]["lat"],
+        "lon": candidate["geometry"]["location"]["lng"],
+    }
+    if cache is not None:
+        cache.put(query, place)
+    return place
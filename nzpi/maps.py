@@ -0,0 +1,32 @@
+"""Leaflet map HTML for the results page."""
+
+OSM_TILES = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+LINZ_BOUNDARIES_TILES = "https://tiles.linz.govt.nz/services;key={key}/tiles/v4/layer=50767/EPSG:3857/{z}/{x}/{y}.png"
+
+
+def boundaries_map_html(lat, lon, label, linz_key, tile_proxy=None):
+    """OSM base map with the LINZ boundaries overlay (layer 50767) and a marker.
+
+    With ``tile_proxy`` (base URL of :mod:`nzpi.tiles`) both layers load through
+    the proxy and the LINZ key is not embedded in the page. Without it the
+    overlay URL, key included, is in the returned HTML and visible to every
+    visitor. Only use a key restricted to this site's referrer/tiles there.
+    """
+    if tile_proxy:
+        base = tile_proxy.rstrip("/")
+        osm_url = base + "/osm/{z}/{x}/{y}.png"
+        boundaries_url = base + "/linz/{z}/{x}/{y}.png"
+    else:
+        osm_url = OSM_TILES
+        boundaries_url = LINZ_BOUNDARIES_TILES.replace("{key}", str(linz_key))
+    return f"""
+    <div id="boundaries-map" style="width:100%; height:600px;"></div>
+    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
+    <script>
+        var boundaries_map = L.map('boundaries-map').setView([{lat}, {lon}], 18);
+        L.tileLayer('{osm_url}', {{attribution: '© OpenStreetMap'}}).addTo(boundaries_map);
+        L.tileLayer('{boundaries_url}', {{attribution: '© LINZ', opacity: 0.6}}).addTo(boundaries_map);
+        L.marker([{lat}, {lon}]).addTo(boundaries_map).bindPopup('{label}').openPopup();
+    </script>
+    """
@@ -0,0 +1,156 @@
+"""Shared gateway for outbound API calls: coalescing, rate limiting and load shedding.
+
+Every Streamlit session, API thread and batch job in a process calls Google
+Places, OpenTopoData and the tile servers through one :class:`Provider` per
+service:
+
+* identical requests already in flight are coalesced (single-flight): later
+  callers wait for the first call's result instead of repeating it;
+* calls are paced by a per-provider token bucket, so a burst queues briefly
+  instead of tripping the provider's QPS limit;
+* at most ``max_queue`` callers may wait for a token, each for at most
+  ``max_wait`` seconds. Past that, :class:`OutboundBusy` is raised at once,
+  so the caller can report "busy" rather than a spurious "not found".
+"""
+import threading
+import time
+
+from nzpi.telemetry import count
+
+# name -> (requests per second, burst, max_queue, max_wait seconds)
+PROVIDER_LIMITS = {
+    "places": (10.0, 10, 64, 5.0),
+    "opentopodata": (1.0, 2, 16, 5.0),  # public API: 1 call per second
+    "tiles:osm": (10.0, 20, 256, 10.0),
+    "tiles:linz": (20.0, 40, 256, 10.0),
+}
+
+_lock = threading.Lock()
+_providers = {}
+
+
+class OutboundBusy(Exception):
+    """A provider's queue is full, or its rate limit cannot admit the call in time."""
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, going into debt if none is left; returns the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name=""):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._calls)
+
+    def do(self, key, fn):
+        """Run ``fn()`` once per ``key`` at a time; concurrent callers share its result or exception."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            count("outbound_coalesced", provider=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class Provider:
+    """Single-flight plus rate limiting for one external service; ``rate=None`` disables pacing."""
+
+    def __init__(self, name, rate=None, burst=1, max_queue=32, max_wait=5.0):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.flights = SingleFlight(name)
+        self.waiting = 0
+        self._lock = threading.Lock()
+
+    def _admit(self):
+        if self.bucket is None:
+            return
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                wait = None
+            else:
+                wait = self.bucket.reserve()
+                if wait > self.max_wait:
+                    self.bucket.refund()
+                    wait = None
+                elif wait:
+                    self.waiting += 1
+        if wait is None:
+            count("outbound_rejected", provider=self.name)
+            raise OutboundBusy(f"{self.name} is busy, try again shortly")
+        if wait:
+            try:
+                time.sleep(wait)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+
+    def call(self, key, fn):
+        """``fn()``, coalesced with identical in-flight ``key`` calls and paced by the token bucket."""
+        def admitted():
+            self._admit()
+            return fn()
+        return self.flights.do(key, admitted)
+
+    def stats(self):
+        with self._lock:
+            waiting = self.waiting
+        return {"waiting": waiting, "in_flight": len(self.flights)}
+
+
+def get_provider(name):
+    """Return the process-wide :class:`Provider` for ``name`` (limits from :data:`PROVIDER_LIMITS`)."""
+    with _lock:
+        provider = _providers.get(name)
+        if provider is None:
+            rate, burst, max_queue, max_wait = PROVIDER_LIMITS.get(name, (None, 1, 32, 5.0))
+            provider = Provider(name, rate, burst, max_queue, max_wait)
+            _providers[name] = provider
+        return provider
@@ -0,0 +1,184 @@
+"""Precomputed demographic profiles for every SA2.
+
+The individuals table is reduced once, in a single vectorized pass, to a
+compact float32 matrix of *counts* (one row per SA2, one column per metric):
+education split, cumulative age bands, ethnic groups, occupations and income
+sources together with the denominators each share is taken against. Keeping
+counts rather than percentages means a suburb made up of several SA2s is
+just the sum of its rows, which reproduces the original per-request
+``.sum().sum()`` arithmetic exactly.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nzpi.census import CODE_COL
+
+LOWER_QUALIFICATIONS = ('no qualification', 'level 1', 'level 2', 'level 3', 'level 4', 'level 5', 'level 6',
+                        'overseas secondary')
+HIGHER_QUALIFICATIONS = ('bachelor', 'post-graduate', 'honours', 'masters', 'doctorate')
+# Cumulative age bands: each band's count includes every younger band
+AGE_BANDS = {
+    'age_le20': ('0-4 years', '5-9 years', '10-14 years', '15-19 years'),
+    'age_le40': ('20-24 years', '25-29 years', '30-34 years', '35-39 years'),
+    'age_le60': ('40-44 years', '45-49 years', '50-54 years', '55-59 years'),
+    'age_le65': ('60-64 years',),
+}
+AGE_OLDER = ('65-69 years', '70-74 years', '75-79 years', '80-84 years', '85 years and over')
+ETHNIC_GROUPS = {
+    'european_pct': 'european',
+    'maori_pct': 'māori',
+    'pacific_pct': 'pacific peoples',
+    'asian_pct': 'asian',
+}
+OCCUPATIONS = {
+    'Managers': 'managers',
+    'Professionals': 'professionals',
+    'Technicians and Trades Workers': 'technicians and trades workers',
+    'Community and Personal Service Workers': 'community and personal service workers',
+    'Clerical and Administrative Workers': 'clerical and administrative workers',
+    'Sales Workers': 'sales workers',
+    'Machinery Operators and Drivers': 'machinery operators and drivers',
+    'Labourers': 'labourers',
+}
+INCOME_SOURCES = {
+    'wages_salary_pct': 'wages, salary, commissions',
+    'self_employed_pct': 'self-employment or business',
+    'superannuation_pct': 'superannuation',
+    'benefits_pct': 'other government benefits',
+}
+PROFILE_FIELDS = ('lower_bachelor', 'bachelor_higher', *AGE_BANDS, 'age_65plus', *ETHNIC_GROUPS,
+                  'occupation_profile', *INCOME_SOURCES)
+
+_lock = threading.Lock()
+_built = {}
+
+
+def _metric_columns(schema):
+    """Map each metric to the census columns summed into it (empty list = unavailable)."""
+    select = schema.select
+    metrics = {
+        'edu_lower': select(year='2023', variable='qualification', category=LOWER_QUALIFICATIONS),
+        'edu_higher': select(year='2023', variable='qualification', category=HIGHER_QUALIFICATIONS),
+    }
+    all_ages = tuple(b for bins in AGE_BANDS.values() for b in bins) + AGE_OLDER
+    metrics['age_total'] = select(year='2023', variable='age', category=all_ages)
+    cumulative = []
+    for band, bins in AGE_BANDS.items():
+        cumulative += select(year='2023', variable='age', category=bins)
+        metrics[band] = list(cumulative)
+    metrics['ethnic_total'] = select(year='2023', variable='ethnic', category='total stated')[:1]
+    for field, key in ETHNIC_GROUPS.items():
+        # "total" is part of every header here ("grouped total responses"), so only descent is excluded
+        metrics[field] = select(year='2023', variable='ethnic', category=key, exclude='descent')
+    metrics['occ_total'] = select(year='2023', variable='occupation', header='usual residence',
+                                  category='total stated')[:1]
+    for label, key in OCCUPATIONS.items():
+        metrics['occ:' + label] = select(year='2023', variable='occupation', header='usual residence',
+                                         category=key, exclude='total')
+    metrics['income_total'] = select(year='2023', variable='sources of personal income',
+                                     category='total stated')[:1]
+    for field, key in INCOME_SOURCES.items():
+        metrics[field] = select(year='2023', variable='sources of personal income', category=key)
+    return metrics
+
+
+class DemographicProfiles:
+    """Per-SA2 count matrix with O(1) row lookup by SA2 code."""
+
+    def __init__(self, individuals, schema):
+        metrics = _metric_columns(schema)
+        self.metrics = list(metrics)
+        self.codes = individuals[CODE_COL].to_numpy()
+        self.row_of = {int(code): row for row, code in enumerate(self.codes)}
+        used = sorted({c for cols in metrics.values() for c in cols})
+        # Suppressed/confidential cells are negative sentinels; treat them as zero
+        values = individuals[used].to_numpy(dtype='float64')
+        values = np.nan_to_num(np.clip(values, 0, None), nan=0.0)
+        position = {c: i for i, c in enumerate(used)}
+        self.matrix = np.full((len(self.codes), len(self.metrics)), np.nan, dtype='float32')
+        for j, cols in enumerate(metrics.values()):
+            if cols:
+                self.matrix[:, j] = values[:, [position[c] for c in cols]].sum(axis=1)
+        self._col = {m: j for j, m in enumerate(self.metrics)}
+
+    def rows(self, codes):
+        return [self.row_of[int(c)] for c in codes if int(c) in self.row_of]
+
+    def counts(self, codes):
+        """Summed metric counts over ``codes`` (float64), or None if none are known."""
+        rows = self.rows(codes)
+        if not rows:
+            return None
+        if len(rows) == 1:
+            return self.matrix[rows[0]].astype('float64')
+        return self.matrix[rows].sum(axis=0, dtype='float64')
+
+    def lookup(self, codes):
+        """Formatted profile fields (as stored in the insights dict) for one or more SA2s."""
+        profile = {f: "N/A" for f in PROFILE_FIELDS}
+        profile['occupation_profile'] = {}
+        counts = self.counts(codes)
+        if counts is None:
+            return profile
+        v = dict(zip(self.metrics, counts))
+
+        def pct(x, total):
+            return f"{(x / total * 100):.1f}%"
+
+        total_stated = v['edu_lower'] + v['edu_higher']
+        if total_stated > 0:
+            profile['lower_bachelor'] = pct(v['edu_lower'], total_stated)
+            profile['bachelor_higher'] = pct(v['edu_higher'], total_stated)
+        if v['age_total'] > 0:
+            # A band with no matching columns contributes nothing, as with an empty column scan
+            for band in AGE_BANDS:
+                profile[band] = pct(np.nan_to_num(v[band]), v['age_total'])
+            profile['age_65plus'] = f"{(100 - (np.nan_to_num(v['age_le65']) / v['age_total'] * 100)):.1f}%"
+        if v['ethnic_total'] > 0:
+            for field in ETHNIC_GROUPS:
+                if not np.isnan(v[field]):
+                    profile[field] = pct(v[field], v['ethnic_total'])
+        if v['occ_total'] > 0:
+            for label in OCCUPATIONS:
+                if not np.isnan(v['occ:' + label]):
+                    profile['occupation_profile'][label] = pct(v['occ:' + label], v['occ_total'])
+        if v['income_total'] > 0:
+            for field in INCOME_SOURCES:
+                if not np.isnan(v[field]):
+                    profile[field] = pct(v[field], v['income_total'])
+        return profile
+
+    def shares(self):
+        """Percentage metrics for every SA2 as a float32 frame indexed by SA2 code."""
+        m = self.matrix.astype('float64')
+
+        def ratio(num, den):
+            den = m[:, self._col[den]]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(den > 0, m[:, self._col[num]] / den * 100, np.nan)
+
+        edu_total = m[:, self._col['edu_lower']] + m[:, self._col['edu_higher']]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = {'bachelor_higher': np.where(edu_total > 0, m[:, self._col['edu_higher']] / edu_total * 100, np.nan)}
+        for band in AGE_BANDS:
+            out[band] = ratio(band, 'age_total')
+        out['age_65plus'] = 100 - out['age_le65']
+        for field in ETHNIC_GROUPS:
+            out[field] = ratio(field, 'ethnic_total')
+        for label in OCCUPATIONS:
+            out['occ:' + label] = ratio('occ:' + label, 'occ_total')
+        for field in INCOME_SOURCES:
+            out[field] = ratio(field, 'income_total')
+        return pd.DataFrame(out, index=pd.Index(self.codes, name=CODE_COL)).astype('float32')
+
+
+def get_profiles(census):
+    """Return the process-wide :class:`DemographicProfiles` for ``census``."""
+    with _lock:
+        profiles = _built.get(census.version)
+        if profiles is None:
+            profiles = DemographicProfiles(census.individuals, census.schemas['individuals'])
+            _built[census.version] = profiles
+        return profiles
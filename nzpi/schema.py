@@ -0,0 +1,143 @@
+"""Structured index over census column headers.
+
+Census headers follow a fixed grammar::
+
+    Subject pop: <topic>, Year: <year>, Measure: <measure>, Var1: <variable> (<category>)
+
+e.g. ``Subject pop: Households in occupied private dwellings, Year: 2023,
+Measure: Median, Var1: Total household income (Median ($))``. Each header is
+parsed once into a :class:`ColumnSpec`; lookups then filter on the parsed
+fields (exact year and measure, whole-word keyword match within a single field)
+instead of substring-scanning whole header strings, so e.g. ``year="2023"``
+no longer matches ``Change 2018-2023`` or the ``SA2 2023 code`` column,
+``variable="age"`` does not match "Language" or "Average", and
+``category="0-4 years"`` does not match "10-14 years".
+"""
+import re
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+HEADER_RE = re.compile(
+    r"^Subject pop: (?P<topic>.*), Year: (?P<year>[^,]*), Measure: (?P<measure>[^,]*), Var1: (?P<var>.*)$"
+)
+FIELDS = ("topic", "year", "measure", "variable", "category")
+WORD_RE = re.compile(r"\w+")
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    column: str
+    topic: str
+    year: str
+    measure: str
+    variable: str
+    category: str
+
+
+def _split_category(var):
+    """Split ``'Age (5-year groups) (0-4 years)'`` into variable and trailing category."""
+    var = var.strip()
+    if not var.endswith(")"):
+        return var, ""
+    depth = 0
+    for pos in range(len(var) - 1, -1, -1):
+        if var[pos] == ")":
+            depth += 1
+        elif var[pos] == "(":
+            depth -= 1
+            if depth == 0:
+                return var[:pos].strip(), var[pos + 1:-1].strip()
+    return var, ""
+
+
+def parse_header(column):
+    """Parse one census header, or return None for plain columns (codes, names, areas)."""
+    m = HEADER_RE.match(column)
+    if m is None:
+        return None
+    variable, category = _split_category(m.group("var"))
+    return ColumnSpec(column, m.group("topic").strip(), m.group("year").strip(),
+                      m.group("measure").strip(), variable, category)
+
+
+def _words(text):
+    """``text`` as space-separated lower-case words, padded so phrases match on word boundaries."""
+    return " " + " ".join(WORD_RE.findall(text.casefold())) + " "
+
+
+def _as_keywords(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = (value,)
+    return tuple(_words(v) for v in value)
+
+
+class SchemaIndex:
+    """Parsed headers of one census table.
+
+    ``table`` is indexed by a ``(topic, year, measure, variable, category)``
+    MultiIndex with the original column name as its single value.
+    """
+
+    def __init__(self, columns):
+        self.specs = [spec for spec in map(parse_header, columns) if spec is not None]
+        self.columns = np.array([s.column for s in self.specs], dtype=object)
+        self._year = np.array([s.year for s in self.specs], dtype=object)
+        self._measure = np.array([s.measure for s in self.specs], dtype=object)
+        self._words = {
+            "topic": np.array([_words(s.topic) for s in self.specs], dtype=object),
+            "variable": np.array([_words(s.variable) for s in self.specs], dtype=object),
+            "category": np.array([_words(s.category) for s in self.specs], dtype=object),
+            "header": np.array([_words(s.column) for s in self.specs], dtype=object),
+        }
+        self.table = pd.DataFrame(
+            {"column": self.columns},
+            index=pd.MultiIndex.from_tuples([tuple(getattr(s, f) for f in FIELDS) for s in self.specs],
+                                            names=FIELDS),
+        )
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def _contains(self, field, keywords):
+        values = self._words[field]
+        return np.array([any(k in v for k in keywords) for v in values], dtype=bool)
+
+    def select(self, *, year=None, measure=None, topic=None, variable=None, category=None,
+               header=None, exclude=None):
+        """Return matching column names, in table order.
+
+        ``year`` and ``measure`` match exactly. ``topic``, ``variable`` and
+        ``category`` are case-insensitive keywords (a tuple means any-of) matched
+        as whole words within that field only; ``header`` matches whole words
+        anywhere in the raw header. ``exclude`` drops columns whose header
+        contains any of its keywords as whole words.
+        """
+        key = (year, measure, _as_keywords(topic), _as_keywords(variable), _as_keywords(category),
+               _as_keywords(header), _as_keywords(exclude))
+        with self._lock:
+            hit = self._memo.get(key)
+        if hit is not None:
+            return list(hit)
+        mask = np.ones(len(self.specs), dtype=bool)
+        if year is not None:
+            mask &= self._year == str(year)
+        if measure is not None:
+            mask &= self._measure == measure
+        for field, keywords in zip(("topic", "variable", "category", "header"), key[2:6]):
+            if keywords is not None:
+                mask &= self._contains(field, keywords)
+        if key[6] is not None:
+            mask &= ~self._contains("header", key[6])
+        result = tuple(self.columns[mask])
+        with self._lock:
+            self._memo[key] = result
+        return list(result)
+
+    def column(self, **criteria):
+        """Return the first matching column name, or None."""
+        matches = self.select(**criteria)
+        return matches[0] if matches else None
@@ -0,0 +1,43 @@
+"""Flood/coastal risk and resilience scoring.
+
+Pure functions of elevation, population growth and median income, so the
+same thresholds apply to the single-address page and to offline bulk scoring.
+"""
+
+
+def flood_risk(elevation):
+    """``(risk, colour, description)`` for an elevation in metres (or "N/A")."""
+    if isinstance(elevation, float):
+        if elevation > 30:
+            return "Low", "green", "Well elevated – minimal flood/coastal risk"
+        if elevation > 10:
+            return "Moderate", "orange", "Some elevation – check local flood maps"
+        return "High", "red", "Low-lying – higher potential flood/coastal exposure"
+    return "Unknown", "gray", "Elevation data unavailable"
+
+
+def resilience(elevation, growth, income):
+    """``(score, rating)``: elevation up to 60 points, growth and income up to 20 each."""
+    score = 0
+    if isinstance(elevation, float):
+        if elevation > 50: score += 60
+        elif elevation > 30: score += 50
+        elif elevation > 10: score += 30
+        elif elevation > 5: score += 15
+    if growth != "N/A":
+        growth_float = float(growth.replace('+', '')) if isinstance(growth, str) else 0
+        score += min(max(growth_float, 0) * 2, 20)
+    if income != "N/A":
+        score += min((income / 200000) * 20, 20)
+    score = min(max(int(score), 0), 100)
+    if score >= 80:
+        rating = "★★★★★ Excellent"
+    elif score >= 60:
+        rating = "★★★★ Very Good"
+    elif score >= 40:
+        rating = "★★★ Good"
+    elif score >= 20:
+        rating = "★★ Fair"
+    else:
+        rating = "★ Poor"
+    return score, rating
@@ -0,0 +1,109 @@
+"""Screen and rank every SA2 against metric criteria.
+
+Each screenable metric keeps a sorted index (values in ascending order plus
+the row permutation). A range criterion is two ``searchsorted`` calls that
+select a slice of the permutation, turned into a row bitmap; criteria are
+combined with bitwise AND, and the top-N walk follows the ranking metric's
+precomputed order, so a screen never re-scans or re-sorts the table.
+
+SA2 resilience uses the same scoring as the single-address page. The
+elevation component is only included when a local DEM and SA2 boundaries are
+available (sampled at each SA2's centroid); otherwise resilience covers the
+growth and income components only.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nzpi.areas import get_area_table
+from nzpi.boundaries import get_boundaries
+from nzpi.dem import get_local_dem
+from nzpi.scoring import resilience as score_resilience
+
+SCREEN_METRICS = {
+    "income": "Median household income 2023 ($)",
+    "growth_2018_2023": "Population growth 2018–2023 (%)",
+    "bachelor_higher": "Bachelor's degree or higher (%)",
+    "resilience_score": "Resilience score",
+    "pop": "Population (2023)",
+    "age_65plus": "Aged 65+ (%)",
+    "elevation": "Centroid elevation (m)",
+}
+
+_lock = threading.Lock()
+_built = {}
+
+
+def _resilience_scores(table, elevations):
+    scores = []
+    for elevation, growth, income in zip(elevations, table["growth"], table["income"]):
+        scores.append(score_resilience(
+            round(float(elevation), 1) if pd.notna(elevation) else "N/A",
+            f"{growth:+.1f}" if pd.notna(growth) else "N/A",
+            int(income) if pd.notna(income) else "N/A",
+        )[0])
+    return np.array(scores, dtype="float64")
+
+
+def build_screening_table(census, dem=None, boundaries=None):
+    """Area table plus centroid elevation and resilience score for every SA2."""
+    table = get_area_table(census).copy()
+    elevations = np.full(len(table), np.nan)
+    if dem is not None and boundaries is not None:
+        centroids = boundaries.centroids()
+        rows = [k for k, code in enumerate(table.index) if int(code) in centroids]
+        if rows:
+            points = np.array([centroids[int(table.index[k])] for k in rows])
+            elevations[rows] = dem.sample(points[:, 0], points[:, 1])
+    table["elevation"] = elevations
+    table["resilience_score"] = _resilience_scores(table, elevations)
+    return table
+
+
+class ScreeningIndex:
+    def __init__(self, table, metrics=SCREEN_METRICS):
+        self.table = table
+        self.metrics = dict(metrics)
+        self.sorted_values = {}
+        self.order = {}
+        for metric in self.metrics:
+            values = table[metric].to_numpy(dtype="float64")
+            # NaNs sort last and are excluded from every range
+            order = np.argsort(values, kind="stable")
+            self.order[metric] = order
+            self.sorted_values[metric] = values[order][: int(np.count_nonzero(~np.isnan(values)))]
+
+    def _range(self, metric, low=None, high=None):
+        values = self.sorted_values[metric]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+        bitmap = np.zeros(len(self.table), dtype=bool)
+        bitmap[self.order[metric][start:stop]] = True
+        return bitmap
+
+    def screen(self, criteria, rank_by="resilience_score", descending=True, limit=50):
+        """SA2s meeting every ``{metric: (low, high)}`` criterion, ranked by ``rank_by``.
+
+        Either bound may be None. Returns at most ``limit`` rows of the table.
+        """
+        bitmap = np.ones(len(self.table), dtype=bool)
+        for metric, (low, high) in criteria.items():
+            bitmap &= self._range(metric, low, high)
+        ranked = self.order[rank_by][: len(self.sorted_values[rank_by])]
+        if descending:
+            ranked = ranked[::-1]
+        # Rows with no value for the ranking metric go last
+        unranked = np.setdiff1d(np.flatnonzero(bitmap), ranked, assume_unique=True)
+        rows = np.concatenate([ranked[bitmap[ranked]], unranked])[:limit]
+        return self.table.iloc[rows]
+
+
+def get_screening_index(census):
+    """Return the process-wide :class:`ScreeningIndex` for ``census``."""
+    with _lock:
+        index = _built.get(census.version)
+        if index is None:
+            index = ScreeningIndex(build_screening_table(census, get_local_dem(), get_boundaries()))
+            _built[census.version] = index
+        return index
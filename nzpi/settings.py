@@ -0,0 +1,32 @@
+"""Secrets for entry points that run outside Streamlit (CLI, API, benchmarks).
+
+Environment variables win; otherwise values come from the same
+``.streamlit/secrets.toml`` the app reads through ``st.secrets``. A missing
+file just means no secrets, but a malformed one is an error rather than a
+silent None.
+"""
+import os
+import tomllib
+from pathlib import Path
+
+SECRETS_PATH = Path(__file__).resolve().parent.parent / ".streamlit" / "secrets.toml"
+
+
+def secret(name, default=None):
+    if name in os.environ:
+        return os.environ[name]
+    try:
+        with open(SECRETS_PATH, "rb") as f:
+            return tomllib.load(f).get(name, default)
+    except OSError:
+        return default
+    except tomllib.TOMLDecodeError as exc:
+        raise RuntimeError(f"{SECRETS_PATH} is not valid TOML ({exc}); quote string values") from exc
+
+
+def require_secret(name):
+    """Like :func:`secret`, but a missing or empty value raises RuntimeError."""
+    value = secret(name)
+    if not value:
+        raise RuntimeError(f"{name} is not set (environment or {SECRETS_PATH})")
+    return value
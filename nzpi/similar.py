@@ -0,0 +1,88 @@
+"""Similar-suburb search over normalized SA2 demographic vectors.
+
+Each populated SA2 becomes a feature vector of the profile shares
+(education, age bands, ethnicity, occupation, income sources) plus 2023 median
+household income and 2018-2023 population growth. Features are z-scored once into a
+float32 matrix; a query is one vectorized distance pass with an
+``argpartition`` top-k, so optional filters (e.g. "cheaper than here") are
+just a boolean mask over the candidate rows.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from nzpi.areas import get_area_table
+from nzpi.profiles import AGE_BANDS, ETHNIC_GROUPS, INCOME_SOURCES, OCCUPATIONS
+
+FEATURES = ("bachelor_higher", *AGE_BANDS, *ETHNIC_GROUPS, *("occ:" + label for label in OCCUPATIONS),
+            *INCOME_SOURCES, "income", "growth")
+# Oceanic, inlet and other near-empty SA2s make meaningless neighbours
+MIN_POPULATION = 200
+
+_lock = threading.Lock()
+_built = {}
+
+
+class SimilarSuburbs:
+    def __init__(self, areas, features=FEATURES, min_population=MIN_POPULATION):
+        areas = areas[areas["pop"] >= min_population]
+        values = areas[list(features)].astype("float64")
+        # Missing metrics are imputed with the median so they neither attract nor repel
+        values = values.fillna(values.median())
+        std = values.std().replace(0, 1)
+        self.mean, self.std = values.mean(), std
+        self.matrix = ((values - self.mean) / std).to_numpy(dtype="float32")
+        self.matrix = np.nan_to_num(self.matrix)
+        self.codes = areas.index.to_numpy()
+        self.row_of = {int(code): row for row, code in enumerate(self.codes)}
+        self.areas = areas
+        self.income = areas["income"].to_numpy()
+        self.growth = areas["growth"].to_numpy()
+
+    def query_vector(self, codes):
+        """Mean normalized vector of the given SA2s, or None if none are indexed."""
+        rows = [self.row_of[int(c)] for c in codes if int(c) in self.row_of]
+        if not rows:
+            return None
+        return self.matrix[rows].mean(axis=0)
+
+    def search(self, codes, k=10, max_income=None, min_income=None, min_growth=None):
+        """Top-``k`` SA2s most similar to ``codes``, nearest first (excluding ``codes``).
+
+        Returns a frame with name, similarity (0-100), income, growth and
+        population, indexed by SA2 code.
+        """
+        query = self.query_vector(codes)
+        if query is None:
+            return self.areas.iloc[:0][["name", "income", "growth", "pop"]].assign(similarity=[])
+        mask = np.ones(len(self.codes), dtype=bool)
+        mask[[self.row_of[int(c)] for c in codes if int(c) in self.row_of]] = False
+        if max_income is not None:
+            mask &= self.income <= max_income
+        if min_income is not None:
+            mask &= self.income >= min_income
+        if min_growth is not None:
+            mask &= self.growth >= min_growth
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return self.areas.iloc[:0][["name", "income", "growth", "pop"]].assign(similarity=[])
+        diff = self.matrix[candidates] - query
+        dist = np.sqrt(np.einsum("ij,ij->i", diff, diff))
+        k = min(k, len(candidates))
+        top = np.argpartition(dist, k - 1)[:k]
+        top = top[np.argsort(dist[top], kind="stable")]
+        result = self.areas.iloc[candidates[top]][["name", "income", "growth", "pop"]].copy()
+        # Map distance to a 0-100 score; sqrt(n_features) is roughly a "typical" distance
+        result["similarity"] = np.clip(100 * (1 - dist[top] / np.sqrt(self.matrix.shape[1])), 0, 100).round(1)
+        return result
+
+
+def get_similar_index(census):
+    """Return the process-wide :class:`SimilarSuburbs` index for ``census``."""
+    with _lock:
+        index = _built.get(census.version)
+        if index is None:
+            index = SimilarSuburbs(get_area_table(census))
+            _built[census.version] = index
+        return index
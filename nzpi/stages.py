@@ -0,0 +1,72 @@
+"""Run independent request stages concurrently, each with its own deadline.
+
+A stage that raises or misses its deadline yields its fallback value instead
+of stalling the request, so end-to-end latency is bounded by the slowest
+stage's timeout rather than the sum of all stages. Each stage name has its own
+bounded pool, so late work of one kind (elevation lookups retrying for tens of
+seconds) cannot hold the threads that the cheap stages need. A stage that is
+still queued when its deadline passes is cancelled; one already running keeps
+its thread until it finishes (threads cannot be interrupted) and its result is
+dropped, though completed network results still land in the shared caches.
+Stages run in a copy of the caller's context, so their telemetry spans land in
+the caller's request trace.
+"""
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from nzpi.telemetry import count
+
+logger = logging.getLogger(__name__)
+
+# Worker threads per stage name
+STAGE_WORKERS = 16
+
+_lock = threading.Lock()
+_pools = {}
+
+
+def _pool(name):
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix=f"nzpi-stage-{name}")
+            _pools[name] = pool
+        return pool
+
+
+@dataclass
+class Stage:
+    fn: Callable[[], Any]
+    timeout: float
+    fallback: Any = None
+
+
+def run_stages(stages):
+    """Run ``{name: Stage}`` concurrently; returns ``(results, degraded_names)``."""
+    start = time.monotonic()
+    futures = {name: _pool(name).submit(contextvars.copy_context().run, stage.fn)
+               for name, stage in stages.items()}
+    results, degraded = {}, []
+    for name, future in futures.items():
+        stage = stages[name]
+        remaining = max(0.0, start + stage.timeout - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeout:
+            future.cancel()
+            logger.warning("stage %s missed its %.1fs deadline", name, stage.timeout)
+            results[name] = stage.fallback
+            degraded.append(name)
+            count("stage_degraded", stage=name, reason="timeout")
+        except Exception:
+            logger.exception("stage %s failed", name)
+            results[name] = stage.fallback
+            degraded.append(name)
+            count("stage_degraded", stage=name, reason="error")
+    return results, degraded
@@ -0,0 +1,213 @@
+"""Suburb name to SA2 code resolution.
+
+Names are indexed once at load time; a query is then a handful of hash
+lookups rather than a regex scan over every row of every table. Resolution
+tries progressively looser tiers and stops at the first one that matches, so
+results are deterministic and as tight as the query allows:
+
+1. exact normalized name (case-folded, macrons and punctuation removed,
+   "Mt"/"St"/"Pt" spelled out as Mount/Saint/Point)
+2. names that *start with* the query's words ("Whitby" -> Whitby North/South)
+3. names containing every query word as a whole word
+4. partial input: the last word as a prefix ("whitb"), after earlier whole
+   words that already pin down one place ("forrest hil")
+5. typos ("Whitbey", "Karory"): names and base names within one edit (two
+   from 10 characters), shortlisted by character-trigram similarity; a name
+   the query is a prefix of is partial input, left to tier 4
+
+Tiers 2-5 only match one place: names sharing a base name once trailing
+qualifiers such as "North" or "Central" are dropped (a parenthesised district
+is kept, so the Auckland and Christchurch Avondales stay apart). If the query is itself a base name only that place is kept
+("Karori" -> Karori East/North/South/West, not Karori Park); otherwise a
+query spanning unrelated places ("Auckland", "Mount", "hill") resolves to
+nothing rather than to their union, and "Te Aro" does not become Te Aroha.
+"""
+import bisect
+import re
+import threading
+import unicodedata
+
+from nzpi.census import ASCII_NAME_COL, CODE_COL, NAME_COL
+
+TABLES = ("pop", "income", "individuals")
+FUZZY_MIN_SCORE = 0.5
+# Edits allowed by the typo tier, and the query length from which a second one is
+FUZZY_EDITS = 1
+FUZZY_LONG_QUERY = 10
+MEMO_LIMIT = 10_000
+# Trailing words that split one place into several SA2s ("Karori North", "Hutt Central South")
+QUALIFIERS = {"north", "south", "east", "west", "central", "upper", "lower", "inner", "outer"}
+# Abbreviations spelled out in place names, since Stats NZ uses both ("St Clair", "Saint Heliers")
+PLACE_ABBREVIATIONS = {"mt": "mount", "st": "saint", "pt": "point"}
+
+_lock = threading.Lock()
+_built = {}
+
+
+def normalize(name):
+    """Case-fold, strip macrons/diacritics and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = "".join(ch if ch.isalnum() else " " for ch in text)
+    return " ".join(text.split())
+
+
+def place_key(name):
+    """:func:`normalize` with :data:`PLACE_ABBREVIATIONS` spelled out ("St" is Saint, not Street)."""
+    return " ".join(PLACE_ABBREVIATIONS.get(word, word) for word in normalize(name).split())
+
+
+def base_name(name):
+    """Normalized name without trailing :data:`QUALIFIERS`, keeping any parenthesised district."""
+    name = str(name)
+    words = place_key(re.sub(r"\(.*?\)", " ", name)).split()
+    while len(words) > 1 and words[-1] in QUALIFIERS:
+        words.pop()
+    return " ".join(words + place_key(" ".join(re.findall(r"\((.*?)\)", name))).split())
+
+
+def _edits(a, b, limit):
+    """Levenshtein distance between ``a`` and ``b``, or ``limit + 1`` once it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SuburbIndex:
+    def __init__(self, census):
+        names = {}  # normalized name -> set of codes
+        self.bases = {}  # normalized name -> base name
+        self.rows = {}  # table -> {code: row position}
+        self.names = dict(zip(census.pop[CODE_COL].astype(int), census.pop[NAME_COL]))  # code -> display name
+        for table in TABLES:
+            frame = getattr(census, table)
+            codes = frame[CODE_COL].to_numpy()
+            self.rows[table] = {int(code): pos for pos, code in enumerate(codes)}
+            for col in (NAME_COL, ASCII_NAME_COL):
+                for code, name in zip(codes, frame[col].to_numpy()):
+                    names.setdefault(place_key(name), set()).add(int(code))
+                    self.bases.setdefault(place_key(name), base_name(name))
+        self.exact = {name: tuple(sorted(codes)) for name, codes in names.items()}
+        self.leading = {}
+        self.tokens = {}
+        self.targets = {}  # typo-tier target (a name or a base name) -> names it stands for
+        for name in self.exact:
+            words = tuple(name.split())
+            for k in range(1, len(words) + 1):
+                self.leading.setdefault(words[:k], set()).add(name)
+            for word in words:
+                self.tokens.setdefault(word, set()).add(name)
+            self.targets.setdefault(name, set()).add(name)
+            self.targets.setdefault(self.bases[name], set()).add(name)
+        self.trigrams = {}
+        self.gram_count = {}
+        for target in self.targets:
+            grams = _trigrams(target)
+            self.gram_count[target] = len(grams)
+            for gram in grams:
+                self.trigrams.setdefault(gram, []).append(target)
+        self.sorted_tokens = sorted(self.tokens)
+        self._memo = {}
+
+    def _names_with_word_prefix(self, prefix):
+        start = bisect.bisect_left(self.sorted_tokens, prefix)
+        found = set()
+        for word in self.sorted_tokens[start:]:
+            if not word.startswith(prefix):
+                break
+            found |= self.tokens[word]
+        return found
+
+    def _codes(self, names):
+        return tuple(sorted({code for name in names for code in self.exact[name]}))
+
+    def _one_place(self, names, query=None):
+        """Codes of the names that are one place (the ``query`` base if it is one), else no match."""
+        bases = {self.bases[name] for name in names}
+        if query in bases:
+            return self._codes(name for name in names if self.bases[name] == query)
+        return self._codes(names) if len(bases) == 1 else ()
+
+    def _resolve(self, query):
+        if query in self.exact:
+            return self.exact[query]
+        words = query.split()
+        names = self.leading.get(tuple(words))
+        if names:
+            return self._one_place(names, query)
+        names = set.intersection(*(self.tokens.get(w, set()) for w in words))
+        if names:
+            return self._one_place(names, query)
+        *complete, partial = words
+        names = self._names_with_word_prefix(partial)
+        if complete:
+            # The complete words must already name one place; the partial one only narrows it
+            before = set.intersection(*(self.tokens.get(w, set()) for w in complete))
+            if len({self.bases[name] for name in before}) != 1:
+                names = set()
+            names &= before
+        if names:
+            return self._one_place(names, query)
+        grams = _trigrams(query)
+        shared = {}
+        for gram in grams:
+            for target in self.trigrams.get(gram, ()):
+                if not target.startswith(query):
+                    shared[target] = shared.get(target, 0) + 1
+        limit = FUZZY_EDITS + (len(query) >= FUZZY_LONG_QUERY)
+        best, names = None, set()
+        for target in sorted(shared):
+            # Dice coefficient over trigram sets
+            score = 2 * shared[target] / (len(grams) + self.gram_count[target])
+            if score < FUZZY_MIN_SCORE:
+                continue
+            edits = _edits(query, target, limit)
+            if edits > limit:
+                continue
+            rank = (edits, -score)
+            if best is None or rank < best:
+                best, names = rank, set(self.targets[target])
+            elif rank == best:
+                names |= self.targets[target]
+        return self._one_place(names) if names else ()
+
+    def resolve(self, suburb):
+        """Return the sorted SA2 codes for a suburb name (empty tuple if none)."""
+        query = place_key(suburb)
+        if not query:
+            return ()
+        codes = self._memo.get(query)
+        if codes is None:
+            codes = self._resolve(query)
+            if len(self._memo) >= MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[query] = codes
+        return codes
+
+    def positions(self, table, codes):
+        """Row positions of ``codes`` in one of the census tables, for ``iloc``."""
+        rows = self.rows[table]
+        return [rows[c] for c in codes if c in rows]
+
+
+def get_suburb_index(census):
+    """Return the process-wide :class:`SuburbIndex` for ``census``."""
+    with _lock:
+        index = _built.get(census.version)
+        if index is None:
+            index = SuburbIndex(census)
+            _built[census.version] = index
+        return index
@@ -0,0 +1,150 @@
+"""Lightweight per-request span timing and process-wide counters.
+
+``with trace("analyse") as t:`` opens a request trace; ``with span("geocode"):``
+anywhere beneath it records a span with its start offset and duration. That
+includes stage threads started through :func:`nzpi.stages.run_stages`, which
+copy the caller's context. Every span also feeds a process-wide duration
+histogram, and :func:`count` increments labelled counters for external calls,
+cache hits/misses and failures.
+
+A finished trace is logged as one JSON line on the ``nzpi.telemetry`` logger.
+:func:`prometheus_text` renders the histograms and counters in the Prometheus
+text format. Figures are per process, so each server worker reports its own.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "nzpi"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNTER_HELP = {
+    "external_calls": "Outbound HTTP requests by provider.",
+    "cache_requests": "Cache lookups by cache and result.",
+    "cache_evictions": "Entries evicted from size-bounded caches.",
+    "gazetteer_requests": "Addresses looked up in the local gazetteer, by whether it resolved them.",
+    "failures": "Failed or rejected external calls by provider.",
+    "outbound_coalesced": "Outbound calls served by an identical call already in flight.",
+    "outbound_rejected": "Outbound calls shed because the provider's queue or rate limit was saturated.",
+    "stage_degraded": "Request stages that fell back after an error or missed deadline.",
+}
+
+_current = contextvars.ContextVar("nzpi_trace", default=None)
+_lock = threading.Lock()
+_counters = {}  # (name, ((label, value), ...)) -> total
+_histograms = {}  # span name -> cumulative bucket counts + [sum, count]
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration, ok):
+        record = {"span": name, "start_ms": round((start - self.start) * 1000, 2),
+                  "duration_ms": round(duration * 1000, 2), "ok": ok, "thread": threading.current_thread().name}
+        with self._lock:
+            self.spans.append(record)
+
+    def waterfall(self):
+        """Spans recorded so far, ordered by start time."""
+        with self._lock:
+            return sorted(self.spans, key=lambda s: s["start_ms"])
+
+
+def _observe(name, seconds):
+    with _lock:
+        buckets = _histograms.get(name)
+        if buckets is None:
+            buckets = _histograms[name] = [0] * len(BUCKETS) + [0.0, 0]
+        for k, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[k] += 1
+        buckets[-2] += seconds
+        buckets[-1] += 1
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block as ``name``, in the current trace if there is one."""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _observe(name, duration)
+        current = _current.get()
+        if current is not None:
+            current.add(name, start, duration, ok)
+
+
+@contextmanager
+def trace(name):
+    """Collect the spans of one request; the whole block is itself a span."""
+    current = Trace(name)
+    token = _current.set(current)
+    try:
+        with span(name):
+            yield current
+    finally:
+        _current.reset(token)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({"trace": name, "spans": current.waterfall()}))
+
+
+def count(name, value=1, **labels):
+    """Add ``value`` to the counter ``name`` with the given labels."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def counters():
+    """Snapshot of every counter as ``{(name, ((label, value), ...)): total}``."""
+    with _lock:
+        return dict(_counters)
+
+
+def _labels(pairs):
+    """``{k="v",...}`` with values escaped as the exposition format requires (backslash, quote, newline)."""
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def prometheus_text():
+    """Counters and span histograms in the Prometheus text exposition format."""
+    with _lock:
+        counter_items = sorted(_counters.items())
+        histograms = {name: list(buckets) for name, buckets in sorted(_histograms.items())}
+    lines = []
+    seen = set()
+    for (name, pairs), total in counter_items:
+        metric = f"{PREFIX}_{name}_total"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# HELP {metric} {COUNTER_HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric}{_labels(pairs)} {total}")
+    if histograms:
+        metric = f"{PREFIX}_span_duration_seconds"
+        lines.append(f"# HELP {metric} Duration of timed spans.")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, buckets in histograms.items():
+            for bound, total in zip(BUCKETS, buckets):
+                lines.append(f"{metric}_bucket{_labels((('span', name), ('le', bound)))} {total}")
+            lines.append(f"{metric}_bucket{_labels((('span', name), ('le', '+Inf')))} {buckets[-1]}")
+            lines.append(f"{metric}_sum{_labels((('span', name),))} {buckets[-2]:.6f}")
+            lines.append(f"{metric}_count{_labels((('span', name),))} {buckets[-1]}")
+    return "\n".join(lines) + "\n"
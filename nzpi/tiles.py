@@ -0,0 +1,285 @@
+"""Local disk-caching proxy for the map's OSM base layer and LINZ boundaries overlay.
+
+Tiles are stored on disk as ``<layer>/<z>/<x>/<y>.png``. Once the store
+exceeds ``max_bytes``, the least recently served tiles are evicted; file
+mtimes record recency, so the order survives restarts. On a miss the tile is
+fetched from upstream through the shared outbound layer
+(:mod:`nzpi.outbound`). Concurrent requests for the same tile therefore wait
+for a single fetch, and each layer's upstream is rate-limited. Tiles the
+upstream does not have (404, 204 or an empty body) are remembered in memory
+for ``MISSING_SECONDS`` and answered with 404 without asking again; errors
+and timeouts are not remembered. The LINZ key
+is only used here, server-side. Pages built with ``boundaries_map_html(...,
+tile_proxy=...)`` load tiles from this proxy and never see the key.
+
+    python -m nzpi.tiles serve --port 8001
+    python -m nzpi.tiles prewarm --bbox -41.32,174.70,-41.20,174.90 --zooms 12-16
+
+``--upstream layer=URL`` points a layer at another server (e.g. a local
+stand-in). Keep pre-warm boxes small: OpenStreetMap's tile usage policy does
+not allow bulk downloading.
+"""
+import argparse
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from nzpi.census import DATA_DIR
+from nzpi.maps import LINZ_BOUNDARIES_TILES, OSM_TILES
+from nzpi.outbound import OutboundBusy, get_provider
+from nzpi.settings import secret
+from nzpi.telemetry import count, span
+
+TILE_DIR = DATA_DIR / ".cache" / "tiles"
+MAX_BYTES = 1 << 30  # 1 GiB
+MAX_ZOOM = 20
+MAX_PREWARM = 20_000  # tiles per pre-warm request
+TIMEOUT = (3.05, 10)  # connect, read (seconds)
+USER_AGENT = "nzpi-tile-proxy/1.0 (NZ Property Insights)"
+CACHE_SECONDS = 7 * 24 * 3600
+MISSING_SECONDS = 24 * 3600  # how long an upstream "no such tile" is trusted
+MAX_MISSING = 100_000
+PATH_RE = re.compile(r"^/(?P<layer>[a-z0-9_-]+)/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.png$")
+
+
+def upstream_layers(linz_key=None):
+    """``{layer: URL template}`` for the map's layers; LINZ only when a key is configured."""
+    layers = {"osm": OSM_TILES}
+    if linz_key:
+        layers["linz"] = LINZ_BOUNDARIES_TILES.replace("{key}", linz_key)
+    return layers
+
+
+def tile_xy(lat, lon, z):
+    """Web Mercator tile containing a point at zoom ``z``."""
+    n = 1 << z
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(south, west, north, east, zooms):
+    """Every ``(z, x, y)`` covering a lat/lon bounding box at each zoom."""
+    for z in zooms:
+        x0, y0 = tile_xy(north, west, z)
+        x1, y1 = tile_xy(south, east, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+class TileStore:
+    def __init__(self, directory=TILE_DIR, max_bytes=MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()  # path -> bytes, least recently served first
+        self._lock = threading.Lock()
+        existing = []
+        for path in self.directory.glob("*/*/*/*.png"):
+            stat = path.stat()
+            existing.append((stat.st_mtime_ns, path, stat.st_size))
+        for _, path, size in sorted(existing):
+            self._entries[path] = size
+            self.size += size
+
+    def path(self, layer, z, x, y):
+        return self.directory / layer / str(z) / str(x) / f"{y}.png"
+
+    def get(self, layer, z, x, y):
+        path = self.path(layer, z, x, y)
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:  # absent, or evicted between lookup and read
+            return None
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        return data
+
+    def put(self, layer, z, x, y, data):
+        path = self.path(layer, z, x, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        evicted = []
+        with self._lock:
+            self.size += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                old, size = self._entries.popitem(last=False)
+                self.size -= size
+                evicted.append(old)
+        for old in evicted:
+            old.unlink(missing_ok=True)
+        if evicted:
+            count("cache_evictions", len(evicted), cache="tiles")
+
+    def stats(self):
+        with self._lock:
+            return {"tiles": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+class TileProxy:
+    def __init__(self, layers, store=None, timeout=TIMEOUT, retries=2, backoff=0.5, providers=None):
+        self.layers = dict(layers)
+        self.store = store if store is not None else TileStore()
+        self.timeout = timeout
+        self.providers = {layer: get_provider(f"tiles:{layer}") for layer in self.layers}
+        self.providers.update(providers or {})
+        self._missing = OrderedDict()  # (layer, z, x, y) -> monotonic expiry, oldest first
+        self._missing_lock = threading.Lock()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _fetch(self, layer, z, x, y):
+        """Fetch one tile from upstream into the store; returns its bytes, or None."""
+        count("external_calls", provider=f"tiles:{layer}")
+        url = self.layers[layer].format(z=z, x=x, y=y)
+        try:
+            with span("tile_request"):
+                response = self.session.get(url, timeout=self.timeout)
+        except requests.RequestException:
+            response = None
+        if response is not None and (response.status_code in (204, 404)
+                                     or response.status_code == 200 and not response.content):
+            with self._missing_lock:
+                self._missing[(layer, z, x, y)] = time.monotonic() + MISSING_SECONDS
+                while len(self._missing) > MAX_MISSING:
+                    self._missing.popitem(last=False)
+            return None
+        if response is None or response.status_code != 200:
+            count("failures", provider=f"tiles:{layer}")
+            return None
+        self.store.put(layer, z, x, y, response.content)
+        return response.content
+
+    def valid(self, layer, z, x, y):
+        return layer in self.layers and 0 <= z <= MAX_ZOOM and 0 <= x < 1 << z and 0 <= y < 1 << z
+
+    def missing(self, layer, z, x, y):
+        """Whether upstream recently answered that this tile does not exist."""
+        key = (layer, z, x, y)
+        with self._missing_lock:
+            expires = self._missing.get(key)
+            if expires is not None and expires < time.monotonic():
+                del self._missing[key]
+                expires = None
+        return expires is not None
+
+    def tile(self, layer, z, x, y):
+        """PNG bytes of one tile, from disk or a single upstream fetch; None if unavailable."""
+        if not self.valid(layer, z, x, y):
+            return None
+        data = self.store.get(layer, z, x, y)
+        if data is None and self.missing(layer, z, x, y):
+            count("cache_requests", cache="tiles", result="missing")
+            return None
+        count("cache_requests", cache="tiles", result="miss" if data is None else "hit")
+        if data is not None:
+            return data
+        try:
+            return self.providers[layer].call((z, x, y), lambda: self._fetch(layer, z, x, y))
+        except OutboundBusy:
+            return None
+
+    def prewarm(self, layer, south, west, north, east, zooms, workers=4):
+        """Fetch every tile of a bounding box into the store; returns ``{"tiles", "failed"}``."""
+        tiles = list(tiles_in_bbox(south, west, north, east, zooms))
+        if len(tiles) > MAX_PREWARM:
+            raise ValueError(f"{len(tiles)} tiles requested, at most {MAX_PREWARM} per pre-warm")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda t: self.tile(layer, *t), tiles))
+        return {"tiles": len(tiles), "failed": sum(r is None for r in results)}
+
+
+def make_app(proxy):
+    """WSGI app serving ``/<layer>/<z>/<x>/<y>.png`` from ``proxy``."""
+    def app(environ, start_response):
+        match = PATH_RE.match(environ.get("PATH_INFO", ""))
+        if environ["REQUEST_METHOD"] not in ("GET", "HEAD") or match is None:
+            start_response("404 Not Found", [("Content-Type", "text/plain"), ("Content-Length", "0")])
+            return [b""]
+        layer, z, x, y = match["layer"], int(match["z"]), int(match["x"]), int(match["y"])
+        data = proxy.tile(layer, z, x, y)
+        if data is None:
+            known = proxy.valid(layer, z, x, y) and not proxy.missing(layer, z, x, y)
+            status = "502 Bad Gateway" if known else "404 Not Found"
+            start_response(status, [("Content-Type", "text/plain"), ("Content-Length", "0")])
+            return [b""]
+        start_response("200 OK", [("Content-Type", "image/png"), ("Content-Length", str(len(data))),
+                                  ("Cache-Control", f"public, max-age={CACHE_SECONDS}"),
+                                  ("Access-Control-Allow-Origin", "*")])
+        return [data if environ["REQUEST_METHOD"] == "GET" else b""]
+    return app
+
+
+class _ThreadingServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def _zooms(text):
+    low, _, high = text.partition("-")
+    return range(int(low), int(high or low) + 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Disk-caching tile proxy for the results map.")
+    parser.add_argument("--dir", default=str(TILE_DIR), help="tile store directory")
+    parser.add_argument("--max-mb", type=int, default=MAX_BYTES >> 20, help="tile store size limit (MB)")
+    parser.add_argument("--upstream", action="append", default=[], metavar="LAYER=URL",
+                        help="override a layer's upstream URL template ({z}/{x}/{y})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="serve tiles over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8001)
+    prewarm = commands.add_parser("prewarm", help="fetch a bounding box of tiles into the store")
+    prewarm.add_argument("--bbox", required=True, help="south,west,north,east in degrees")
+    prewarm.add_argument("--zooms", default="12-16", help="zoom or range, e.g. 14 or 12-16")
+    prewarm.add_argument("--layer", action="append", help="layers to warm (default: all)")
+    args = parser.parse_args(argv)
+
+    try:
+        layers = upstream_layers(secret("LINZ_API_KEY"))
+    except RuntimeError as exc:  # malformed secrets.toml
+        parser.error(str(exc))
+    layers.update(dict(item.split("=", 1) for item in args.upstream))
+    proxy = TileProxy(layers, TileStore(args.dir, args.max_mb << 20))
+    if args.command == "serve":
+        print(f"serving {', '.join(layers)} tiles on http://{args.host}:{args.port}")
+        make_server(args.host, args.port, make_app(proxy), server_class=_ThreadingServer,
+                    handler_class=_QuietHandler).serve_forever()
+    else:
+        south, west, north, east = (float(v) for v in args.bbox.split(","))
+        for layer in args.layer or layers:
+            result = proxy.prewarm(layer, south, west, north, east, _zooms(args.zooms))
+            print(f"{layer}: {result['tiles']} tiles, {result['failed']} failed")
+        print(f"store: {proxy.store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Multi-year trend cube over every census variable.
+
+Every header that the census grammar (see :mod:`nzpi.schema`) reports for all
+of 2013, 2018 and 2023 becomes one variable: a (table, topic, measure,
+variable, category) combination. The values form a dense float32 array shaped
+(SA2, variable, year); absolute and percentage changes per period are computed
+from the requested slice on demand. A historical comparison is then an array
+slice rather than another header scan. Suppressed values (-999/-998) are NaN.
+
+``census.income`` keeps only the household columns the analysis reads (see
+:data:`nzpi.census.HOUSEHOLD_SELECTIONS`), but nearly every households column
+has all three years. So the cube is built once from the full households table
+and saved next to the census snapshots (``data/.snapshot/trends``, keyed by
+the census version). Later starts memory-map it, so workers share its pages
+and never load the full table.
+"""
+import json
+import os
+import threading
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from nzpi.census import CODE_COL, SNAPSHOT_DIRNAME, load_all_households
+from nzpi.schema import SchemaIndex
+from nzpi.telemetry import count
+
+YEARS = ("2013", "2018", "2023")
+PERIODS = (("2013", "2018"), ("2018", "2023"), ("2013", "2023"))
+TABLES = ("pop", "income", "individuals")
+VARIABLE_FIELDS = ("table", "topic", "measure", "variable", "category")
+TREND_FORMAT = 1
+# Year positions of each period's start and end
+_START = [YEARS.index(a) for a, _ in PERIODS]
+_END = [YEARS.index(b) for _, b in PERIODS]
+
+_lock = threading.Lock()
+_built = {}
+
+
+def _label(topic, measure, variable, category):
+    label = f"{variable} ({category})" if category and category != "Total" else variable
+    if measure in ("Count", "") or measure.casefold() in label.casefold():
+        return label
+    return f"{label} – {measure.lower()}"
+
+
+def trend_tables(census):
+    """``{table: frame}`` for the cube: the census tables, with households unpruned when the CSV is at hand."""
+    tables = {table: getattr(census, table) for table in TABLES}
+    if census.data_dir is not None:
+        tables["income"], _ = load_all_households(census.data_dir)
+    return tables
+
+
+class TrendCube:
+    def __init__(self, codes, variables, cube):
+        self.codes = np.asarray(codes)
+        self.row_of = {int(code): row for row, code in enumerate(self.codes)}
+        self.variables = pd.DataFrame(list(map(tuple, variables)), columns=list(VARIABLE_FIELDS))
+        self.variables["label"] = [_label(*spec[1:]) for spec in self.variables.itertuples(index=False)]
+        self.cube = cube
+        # Counts aggregate over several SA2s by summing; medians and percents by averaging
+        self.additive = (self.variables["measure"] == "Count").to_numpy()
+
+    @classmethod
+    def build(cls, census, tables=None):
+        """Build from the census tables (``tables`` overrides them, see :func:`trend_tables`)."""
+        tables = tables if tables is not None else {table: getattr(census, table) for table in TABLES}
+        codes = census.pop[CODE_COL].astype(int).to_numpy()
+        specs, columns = [], []
+        for table in TABLES:
+            frame = tables[table]
+            schema = census.schemas[table] if frame is getattr(census, table) else SchemaIndex(frame.columns)
+            by_key = {}
+            for (topic, year, measure, variable, category), column in schema.table["column"].items():
+                if year in YEARS:
+                    by_key.setdefault((topic, measure, variable, category), {})[year] = column
+            for key, years in by_key.items():
+                if len(years) == len(YEARS):
+                    specs.append((table, *key))
+                    columns.append((table, [years[y] for y in YEARS]))
+        cube = np.full((len(codes), len(specs), len(YEARS)), np.nan, dtype="float32")
+        frames = {table: tables[table].set_index(CODE_COL) for table in TABLES}
+        for v, (table, cols) in enumerate(columns):
+            values = frames[table][cols].reindex(codes).to_numpy(dtype="float64")
+            cube[:, v, :] = np.where(values > -998, values, np.nan)
+        return cls(codes, specs, cube)
+
+    @classmethod
+    def load(cls, directory, version):
+        """Memory-mapped cube saved by :meth:`save` for census ``version``, or None if absent or stale."""
+        directory = Path(directory)
+        try:
+            manifest = json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+            if manifest.get("format") != TREND_FORMAT or manifest.get("version") != version:
+                return None
+            cube = np.load(directory / "cube.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if cube.shape != (len(manifest["codes"]), len(manifest["variables"]), len(YEARS)):
+            return None
+        return cls(manifest["codes"], manifest["variables"], cube)
+
+    def save(self, directory, version):
+        """Write the cube and its manifest under ``directory`` (silently skipped if read-only)."""
+        directory = Path(directory)
+        manifest = {"format": TREND_FORMAT, "version": version, "codes": self.codes.tolist(),
+                    "variables": self.variables[list(VARIABLE_FIELDS)].values.tolist()}
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = directory / "cube.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(self.cube))
+            os.replace(tmp, directory / "cube.npy")
+            tmp = directory / "manifest.tmp"
+            tmp.write_text(json.dumps(manifest), encoding="utf-8")
+            os.replace(tmp, directory / "manifest.json")
+        except OSError:
+            pass
+
+    def find(self, table=None, topic=None, measure=None, variable=None, category=None):
+        """Positions of the variables whose fields contain the given keywords (case-insensitive)."""
+        mask = np.ones(len(self.variables), dtype=bool)
+        for field, value in (("table", table), ("topic", topic), ("measure", measure), ("variable", variable),
+                             ("category", category)):
+            if value is not None:
+                mask &= self.variables[field].str.casefold().str.contains(value.casefold(), regex=False).to_numpy()
+        return np.flatnonzero(mask)
+
+    def values(self, codes, variables=None):
+        """``(len(variables), years)`` values for a set of SA2s, aggregated per variable."""
+        rows = [self.row_of[int(c)] for c in codes if int(c) in self.row_of]
+        variables = np.arange(len(self.variables)) if variables is None else np.asarray(variables)
+        if not rows:
+            return np.full((len(variables), len(YEARS)), np.nan, dtype="float32")
+        block = self.cube[rows][:, variables, :]
+        with warnings.catch_warnings():
+            # nanmean of an all-NaN slice warns; those slices are meant to stay NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            summed = np.where(np.isnan(block).all(axis=0), np.nan, np.nansum(block, axis=0))
+            averaged = np.nanmean(block, axis=0)
+        return np.where(self.additive[variables, None], summed, averaged).astype("float32")
+
+    def trends(self, codes, variables=None):
+        """Values per year plus absolute and percentage change per period, one row per variable."""
+        variables = np.arange(len(self.variables)) if variables is None else np.asarray(variables)
+        values = self.values(codes, variables)
+        delta = values[:, _END] - values[:, _START]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = np.where(values[:, _START] > 0, delta / values[:, _START] * 100, np.nan)
+        frame = self.variables.iloc[variables].reset_index(drop=True)
+        for k, year in enumerate(YEARS):
+            frame[year] = values[:, k]
+        for k, (a, b) in enumerate(PERIODS):
+            frame[f"change {a}-{b}"] = delta[:, k]
+            frame[f"change {a}-{b} %"] = pct[:, k]
+        return frame
+
+
+def get_trend_cube(census):
+    """Return the process-wide :class:`TrendCube` for ``census``, from its snapshot when there is one."""
+    with _lock:
+        cube = _built.get(census.version)
+        if cube is None:
+            directory = census.data_dir / SNAPSHOT_DIRNAME / "trends" if census.data_dir is not None else None
+            cube = TrendCube.load(directory, census.version) if directory is not None else None
+            count("cache_requests", cache="trend_snapshot", result="miss" if cube is None else "hit")
+            if cube is None:
+                cube = TrendCube.build(census, trend_tables(census))
+                if directory is not None:
+                    cube.save(directory, census.version)
+            _built[census.version] = cube
+        return cube
@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+
+class StubServer:
+    """Local HTTP server answering from a script of ``(status, body, delay)`` responses.
+
+    Scripted responses are served in order, then ``default(path, query)`` is
+    called for every further request. Each request is recorded as
+    ``(path, query)``.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.default = lambda path, query: (404, b"", 0.0)
+        self.requests = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                with server._lock:
+                    server.requests.append((url.path, query))
+                    scripted = server.script.pop(0) if server.script else None
+                status, body, delay = scripted or server.default(url.path, query)
+                if isinstance(body, (dict, list)):
+                    body = json.dumps(body).encode()
+                time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:  # the client gave up (timeout test)
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
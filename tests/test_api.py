@@ -0,0 +1,170 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from nzpi import api
+from nzpi.outbound import OutboundBusy
+
+INSIGHTS = {"short_address": "18 Lanyon Place", "elevation": 12.5, "sa2_codes": [240401], "degraded": [],
+            "map_html": "<div>", "trace": [{"span": "analyse"}]}
+
+
+class FakeElevations:
+    def elevations(self, points):
+        return [12.5] * len(points)
+
+
+class FakeAnalyser:
+    def __init__(self):
+        self.census = SimpleNamespace(version="v1")
+        self.elevation_client = FakeElevations()
+        self.analysed = []
+        self.result = INSIGHTS
+
+    def analyse(self, address):
+        self.analysed.append(address)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return None if self.result is None else dict(self.result)
+
+    def locate_offline(self, address):
+        return None
+
+    def locate(self, address, offline=True):
+        if "Nowhere" in address:
+            return None
+        return {"formatted_address": f"{address}, Whitby, Porirua 5024", "lat": -41.11, "lon": 174.89}
+
+    def place_insights(self, place, elevation):
+        return {"short_address": place["formatted_address"].split(",")[0], "elevation": elevation,
+                "sa2_codes": [240401]}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def analyser(monkeypatch):
+    fake = FakeAnalyser()
+    monkeypatch.setattr(api, "_analyser", lambda: fake)
+    api._cache.clear()
+    yield fake
+    api._cache.clear()
+
+
+def call(method, path, query="", body=b"", headers=None):
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+               "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body)}
+    environ.update({"HTTP_" + k.upper().replace("-", "_"): v for k, v in (headers or {}).items()})
+    status = {}
+    out = b"".join(api.app(environ, lambda s, h: status.update(code=int(s.split()[0]), headers=dict(h))))
+    return status["code"], status["headers"], out
+
+
+def test_analyse_is_cached_under_an_etag(analyser):
+    code, headers, body = call("GET", "/analyse", "address=18+Lanyon+Pl,+Whitby")
+    assert code == 200
+    payload = json.loads(body)
+    assert payload["elevation"] == 12.5 and "map_html" not in payload and "trace" not in payload
+    assert headers["ETag"].startswith('"v1-') and headers["Cache-Control"] == "public, max-age=300"
+    # The same normalized request shares the entry and the ETag
+    again = call("GET", "/analyse", "address=18%20lanyon%20place%20whitby")
+    assert again[0] == 200 and again[1]["ETag"] == headers["ETag"] and again[2] == body
+    assert len(analyser.analysed) == 1
+
+
+def test_if_none_match_is_304_without_analysing(analyser):
+    etag = call("GET", "/analyse", "address=1+Main+St")[1]["ETag"]
+    api._cache.clear()
+    code, headers, body = call("GET", "/analyse", "address=1+Main+St", headers={"If-None-Match": f'"x", {etag}'})
+    assert (code, body, headers["ETag"]) == (304, b"", etag)
+    assert len(analyser.analysed) == 1
+    assert call("GET", "/analyse", "address=1+Main+St", headers={"If-None-Match": '"stale"'})[0] == 200
+
+
+def test_etag_changes_with_the_data_version(analyser):
+    first = call("GET", "/analyse", "address=1+Main+St")[1]["ETag"]
+    analyser.census.version = "v2"
+    assert call("GET", "/analyse", "address=1+Main+St")[1]["ETag"] != first
+
+
+def test_entries_expire_after_max_age(analyser, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(api, "time", clock)
+    call("GET", "/analyse", "address=1+Main+St")
+    clock.now += api.CACHE_SECONDS["analyse"]
+    call("GET", "/analyse", "address=1+Main+St")
+    assert len(analyser.analysed) == 1
+    clock.now += 1
+    call("GET", "/analyse", "address=1+Main+St")
+    assert len(analyser.analysed) == 2
+
+
+def test_cache_evicts_least_recently_used(analyser, monkeypatch):
+    monkeypatch.setattr(api, "RESPONSE_CACHE_SIZE", 2)
+    for address in ("1+A+St", "2+B+St", "1+A+St", "3+C+St"):  # touching A makes B the oldest
+        call("GET", "/analyse", f"address={address}")
+    assert len(api._cache) == 2
+    call("GET", "/analyse", "address=1+A+St")
+    call("GET", "/analyse", "address=2+B+St")
+    assert analyser.analysed == ["1 A St", "2 B St", "3 C St", "2 B St"]
+
+
+def test_degraded_analyses_are_not_cached(analyser):
+    analyser.result = {**INSIGHTS, "degraded": ["elevation"]}
+    code, headers, _ = call("GET", "/analyse", "address=1+Main+St")
+    assert code == 200 and headers["Cache-Control"] == "no-store" and "ETag" not in headers
+    analyser.result = INSIGHTS
+    code, headers, _ = call("GET", "/analyse", "address=1+Main+St")
+    assert "ETag" in headers and len(analyser.analysed) == 2
+
+
+@pytest.mark.parametrize("result, status", [(None, 404), (OutboundBusy("busy"), 503),
+                                            (api.PlacesError("REQUEST_DENIED"), 502)])
+def test_analyse_errors_are_not_cached(analyser, result, status):
+    analyser.result = result
+    code, headers, _ = call("GET", "/analyse", "address=1+Main+St")
+    assert code == status and "ETag" not in headers
+    assert (headers.get("Retry-After") == "5") == (status == 503)
+    assert api._cache == {}
+
+
+def test_routing_errors(analyser):
+    assert call("GET", "/analyse")[0] == 400
+    assert call("POST", "/analyse", "address=x")[0] == 405
+    assert call("GET", "/nope")[0] == 404
+    assert call("GET", "/batch")[0] == 405
+
+
+@pytest.mark.parametrize("body", [b"", b"not json", b"[]", b'{"addresses": "1 Main St"}',
+                                  b'{"addresses": ["1 Main St", 2]}'])
+def test_batch_rejects_malformed_bodies(analyser, body):
+    code, _, out = call("POST", "/batch", body=body)
+    assert code == 400 and "addresses" in json.loads(out)["error"]
+
+
+def test_batch_limits_its_size(analyser, monkeypatch):
+    monkeypatch.setattr(api, "MAX_BATCH", 2)
+    assert call("POST", "/batch", body=json.dumps({"addresses": ["a", "b", "c"]}).encode())[0] == 413
+
+
+def test_batch_returns_structured_rows(analyser):
+    code, _, out = call("POST", "/batch", body=json.dumps({"addresses": ["1 Good St", "2 Nowhere Rd"]}).encode())
+    rows = json.loads(out)["results"]
+    assert code == 200
+    assert [(r["input_address"], r["status"]) for r in rows] == [("1 Good St", "ok"), ("2 Nowhere Rd", "not_found")]
+    assert rows[0]["sa2_codes"] == [240401] and rows[0]["elevation"] == 12.5
+
+
+def test_healthz_and_metrics(analyser):
+    code, _, out = call("GET", "/healthz")
+    assert code == 200 and json.loads(out) == {"status": "ok", "version": "v1"}
+    code, headers, out = call("GET", "/metrics")
+    assert code == 200 and headers["Content-Type"].startswith("text/plain; version=0.0.4")
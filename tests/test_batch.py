@@ -0,0 +1,113 @@
+import csv
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+from nzpi.batch import CsvSink, ParquetSink, run, score_addresses
+from nzpi.outbound import OutboundBusy
+
+
+class FakeElevations:
+    def __init__(self):
+        self.down = False
+
+    def elevations(self, points):
+        return [None if self.down else 12.5] * len(points)
+
+
+class FakeAnalyser:
+    """Locates "<n> Good St" addresses, fails "flaky" ones while ``flaky`` is set, misses the rest."""
+
+    def __init__(self):
+        self.flaky = True
+        self.located = []
+        self.elevation_client = FakeElevations()
+
+    def locate_offline(self, address):
+        return None
+
+    def locate(self, address, offline=True):
+        self.located.append(address)
+        if "flaky" in address and self.flaky:
+            raise ConnectionError("upstream reset")
+        if "Good St" in address or "flaky" in address:
+            return {"formatted_address": f"{address}, Whitby, Porirua 5024", "lat": -41.11, "lon": 174.89}
+        return None
+
+    def place_insights(self, place, elevation):
+        return {"short_address": place["formatted_address"].split(",")[0], "elevation": elevation,
+                "sa2_codes": [240401]}
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_every_input_row_gets_an_output_row(tmp_path):
+    addresses = ["1 Good St", "2 Nowhere Rd", "1 Good St"]
+    sink = CsvSink(tmp_path / "out.csv")
+    assert run(addresses, sink, FakeAnalyser(), workers=2, rate=None) == 3
+    rows = read_rows(tmp_path / "out.csv")
+    assert [(r["input_address"], r["status"]) for r in rows] == [
+        ("1 Good St", "ok"), ("2 Nowhere Rd", "not_found"), ("1 Good St", "ok")]
+    assert rows[0]["sa2_codes"] == "[240401]"
+
+
+def test_resume_skips_scored_rows_and_retries_errors(tmp_path):
+    addresses = ["1 Good St", "3 flaky Ave", "2 Nowhere Rd", "1 Good St"]
+    sink = CsvSink(tmp_path / "out.csv")
+    analyser = FakeAnalyser()
+    run(addresses[:3], sink, analyser, rate=None)  # interrupted before the duplicate
+    assert [r["status"] for r in read_rows(tmp_path / "out.csv")] == ["ok", "error", "not_found"]
+
+    analyser.flaky = False
+    analyser.located.clear()
+    assert run(addresses, sink, analyser, rate=None) == 2
+    assert sorted(analyser.located) == ["1 Good St", "3 flaky Ave"]
+    rows = read_rows(tmp_path / "out.csv")
+    latest = {r["input_address"]: r["status"] for r in rows}
+    assert latest == {"1 Good St": "ok", "3 flaky Ave": "ok", "2 Nowhere Rd": "not_found"}
+    assert sum(r["input_address"] == "1 Good St" for r in rows) == 2
+    assert sink.completed()["1 Good St"] == 2
+
+
+def test_busy_lookups_give_up_after_bounded_attempts():
+    class BusyAnalyser(FakeAnalyser):
+        def locate(self, address, offline=True):
+            self.located.append(address)
+            raise OutboundBusy("places is busy, try again shortly")
+
+    analyser = BusyAnalyser()
+    rows = list(score_addresses(["1 Good St"], analyser, rate=None, busy_retry=0.01, busy_attempts=3))
+    assert [(r["status"], r["error"]) for r in rows] == [("error", "OutboundBusy: places is busy, try again shortly")]
+    assert len(analyser.located) == 3
+
+
+def test_rows_without_elevation_are_partial_and_retried(tmp_path):
+    sink = CsvSink(tmp_path / "out.csv")
+    analyser = FakeAnalyser()
+    analyser.elevation_client.down = True
+    run(["1 Good St"], sink, analyser, rate=None)
+    assert [(r["status"], r["error"], r["elevation"]) for r in read_rows(tmp_path / "out.csv")] == [
+        ("partial", "elevation unavailable", "")]
+    assert not sink.completed()
+
+    analyser.elevation_client.down = False
+    assert run(["1 Good St"], sink, analyser, rate=None) == 1
+    assert [r["status"] for r in read_rows(tmp_path / "out.csv")] == ["partial", "ok"]
+
+
+def test_parquet_sink_writes_missing_values_as_empty(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = ParquetSink(tmp_path / "out.parquet")
+    analyser = FakeAnalyser()
+    analyser.elevation_client.down = True
+    run(["1 Good St", "2 Nowhere Rd", "3 flaky Ave"], sink, analyser, rate=None)
+    frame = pd.read_parquet(next((tmp_path / "out.parquet").glob("part-*.parquet")))
+    assert frame["status"].tolist() == ["partial", "not_found", "error"]
+    values = frame.to_numpy().ravel().tolist()
+    assert "nan" not in values and "None" not in values
+    assert frame["sa2_codes"].tolist() == ["[240401]", "", ""]
+    assert sink.completed() == Counter({"2 Nowhere Rd": 1})
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from nzpi.boundaries import SA2Boundaries
+
+# Two adjacent squares; the second has a square hole
+WEST = [[174.0, -41.0], [174.1, -41.0], [174.1, -40.9], [174.0, -40.9], [174.0, -41.0]]
+EAST = [[174.1, -41.0], [174.2, -41.0], [174.2, -40.9], [174.1, -40.9], [174.1, -41.0]]
+HOLE = [[174.14, -40.96], [174.14, -40.94], [174.16, -40.94], [174.16, -40.96], [174.14, -40.96]]
+FEATURES = [
+    {"type": "Feature", "properties": {"SA22023_V1_00": "100100"}, "geometry": {"type": "Polygon", "coordinates": [WEST]}},
+    {"type": "Feature", "properties": {"SA22023_V1_00": "100200"},
+     "geometry": {"type": "MultiPolygon", "coordinates": [[EAST, HOLE]]}},
+]
+
+
+def check(boundaries):
+    codes = boundaries.assign([-40.95, -40.95, -40.95, -40.91, -42.0], [174.05, 174.15, 174.12, 174.19, 174.05])
+    assert codes.tolist() == [100100, 0, 100200, 100200, 0]
+    assert boundaries.locate(-40.95, 174.05) == 100100
+    assert boundaries.locate(-42.0, 174.05) is None
+    assert boundaries.centroids()[100100] == pytest.approx((-40.95, 174.05))
+
+
+def test_geojson(tmp_path):
+    path = tmp_path / "sa2.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": FEATURES}))
+    check(SA2Boundaries.load(path))
+
+
+def test_shapefile(tmp_path):
+    shapefile = pytest.importorskip("shapefile")
+    with shapefile.Writer(str(tmp_path / "sa2"), shapeType=shapefile.POLYGON) as writer:
+        writer.field("SA22023_V1", "C", size=6)
+        writer.poly([WEST])
+        writer.record("100100")
+        writer.poly([EAST, HOLE])
+        writer.record("100200")
+    check(SA2Boundaries.load(tmp_path / "sa2.shp"))
+
+
+def test_projected_shapefile_is_rejected(tmp_path):
+    shapefile = pytest.importorskip("shapefile")
+    with shapefile.Writer(str(tmp_path / "nztm"), shapeType=shapefile.POLYGON) as writer:
+        writer.field("SA22023_V1", "C", size=6)
+        writer.poly([[[1748000, 5428000], [1749000, 5428000], [1749000, 5429000], [1748000, 5428000]]])
+        writer.record("100100")
+    with pytest.raises(ValueError, match="WGS84"):
+        SA2Boundaries.load(tmp_path / "nztm.shp")
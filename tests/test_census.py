@@ -0,0 +1,116 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nzpi import census
+from nzpi.census import load_csv
+
+CSV = """code,name,count,median
+100,Ara,10,50000.5
+200,Bay,-999,
+300,Ōtaki,7,41000
+"""
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "table.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Count CSV parses and file hashes done by the loader."""
+    calls = {"read_csv": 0, "sha256": 0}
+    read_csv, sha256 = pd.read_csv, census._sha256
+
+    def counted_read_csv(*args, **kwargs):
+        calls["read_csv"] += 1
+        return read_csv(*args, **kwargs)
+
+    def counted_sha256(path):
+        calls["sha256"] += 1
+        return sha256(path)
+
+    monkeypatch.setattr(census.pd, "read_csv", counted_read_csv)
+    monkeypatch.setattr(census, "_sha256", counted_sha256)
+    return calls
+
+
+def manifest_path(source):
+    return census._snapshot_paths(source)[0]
+
+
+def touch(path, seconds=10):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+def test_snapshot_round_trips_the_frame(source, parses):
+    parsed, digest = load_csv(source)
+    loaded, again = load_csv(source)
+    assert parses["read_csv"] == 1 and digest == again
+    pd.testing.assert_frame_equal(loaded, parsed)
+    assert loaded["name"].tolist() == ["Ara", "Bay", "Ōtaki"] and np.isnan(loaded.at[1, "median"])
+
+
+def test_touched_but_unchanged_file_is_rehashed_once(source, parses):
+    load_csv(source)
+    touch(source)
+    load_csv(source)
+    assert (parses["read_csv"], parses["sha256"]) == (1, 2)
+    assert json.loads(manifest_path(source).read_text())["mtime_ns"] == source.stat().st_mtime_ns
+    load_csv(source)
+    assert (parses["read_csv"], parses["sha256"]) == (1, 2)
+
+
+def test_changed_contents_with_the_same_size_are_reparsed(source, parses):
+    _, before = load_csv(source)
+    source.write_text(CSV.replace("Ara,10", "Ara,12"), encoding="utf-8")
+    touch(source)
+    frame, after = load_csv(source)
+    assert parses["read_csv"] == 2 and after != before
+    assert frame.at[0, "count"] == 12
+
+
+def test_size_change_is_reparsed_without_hashing_first(source, parses):
+    load_csv(source)
+    stat = source.stat()
+    source.write_text(CSV + "400,Cove,3,39000\n", encoding="utf-8")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))  # same mtime: the size alone invalidates
+    frame, _ = load_csv(source)
+    assert parses["read_csv"] == 2 and len(frame) == 4
+
+
+def test_format_version_bump_is_reparsed(source, parses, monkeypatch):
+    load_csv(source)
+    monkeypatch.setattr(census, "SNAPSHOT_FORMAT", census.SNAPSHOT_FORMAT + 1)
+    load_csv(source)
+    load_csv(source)
+    assert parses["read_csv"] == 2
+
+
+@pytest.mark.parametrize("damage", ["manifest", "numeric"])
+def test_corrupt_snapshot_falls_back_to_the_csv(source, parses, damage):
+    expected, _ = load_csv(source)
+    manifest, numeric = census._snapshot_paths(source)
+    (manifest if damage == "manifest" else numeric).write_bytes(b"\x00garbage{")
+    frame, _ = load_csv(source)
+    pd.testing.assert_frame_equal(frame, expected)
+    assert parses["read_csv"] == 2
+    load_csv(source)  # rewritten
+    assert parses["read_csv"] == 2
+
+
+def test_variants_have_their_own_snapshots(source, parses):
+    full, _ = load_csv(source)
+    pruned, _ = load_csv(source, usecols=["code", "median"], compact=True)
+    assert list(pruned.columns) == ["code", "median"] and pruned["median"].dtype == "float32"
+    assert pruned["code"].dtype == "int32"
+    load_csv(source, usecols=["code", "median"], compact=True)
+    pd.testing.assert_frame_equal(load_csv(source)[0], full)
+    assert parses["read_csv"] == 2
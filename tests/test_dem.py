@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+import pytest
+
+from nzpi.dem import LocalDEM, get_local_dem
+
+WEST, SOUTH, EAST, NORTH = 174.0, -41.0, 174.4, -40.7  # 4 columns x 3 rows of 0.1 degree pixels
+NODATA = -9999.0
+
+
+def centre(row, col):
+    return NORTH - (row + 0.5) * 0.1, WEST + (col + 0.5) * 0.1
+
+
+@pytest.fixture
+def grid():
+    # value = 10 * row + 1.5 * col, with one nodata pixel at (2, 3)
+    values = (np.arange(3)[:, None] * 10 + np.arange(4)[None, :] * 1.5).astype("float32")
+    values[2, 3] = NODATA
+    return values
+
+
+@pytest.fixture
+def dem(tmp_path, grid):
+    np.save(tmp_path / "tile_0.npy", grid)
+    manifest = {"tiles": [{"path": "tile_0.npy", "bounds": [WEST, SOUTH, EAST, NORTH], "nodata": NODATA}]}
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    return LocalDEM(tmp_path)
+
+
+def test_pixel_centres_return_the_samples_exactly(dem, grid):
+    for row in range(3):
+        for col in range(4):
+            expected = None if grid[row, col] == NODATA else float(grid[row, col])
+            assert dem.elevation(*centre(row, col)) == expected
+
+
+def test_bilinear_between_centres(dem):
+    (lat0, lon0), (lat1, lon1) = centre(0, 0), centre(1, 1)
+    assert dem.elevation((lat0 + lat1) / 2, (lon0 + lon1) / 2) == pytest.approx((0 + 1.5 + 10 + 11.5) / 4)
+    assert dem.elevation(lat0, lon0 + 0.025) == pytest.approx(0.375)
+
+
+def test_edges_use_the_edge_samples(dem):
+    assert dem.elevation(NORTH, WEST) == 0.0
+    assert dem.elevation(centre(1, 0)[0], WEST) == 10.0
+    assert dem.elevation(SOUTH, centre(2, 1)[1]) == 21.5
+    assert dem.elevation(NORTH, EAST) == 4.5
+
+
+def test_nodata_neighbourhood_is_none(dem):
+    assert dem.elevation(*centre(2, 3)) is None
+    lat, lon = centre(2, 2)
+    assert dem.elevation(lat, lon) == 23.0  # the nodata neighbour does not leak into an exact sample
+    assert dem.elevation(lat, lon + 0.05) is None
+
+
+def test_out_of_bounds_is_none(dem):
+    assert dem.elevations([(NORTH + 0.01, 174.2), (-40.8, WEST - 0.01), (-45.0, 170.0)]) == [None, None, None]
+    assert dem.elevations([]) == []
+
+
+def test_sample_is_vectorized(dem):
+    points = [centre(0, 1), (0.0, 0.0), centre(1, 2)]
+    values = dem.sample(*zip(*points))
+    assert values[0] == 1.5 and np.isnan(values[1]) and values[2] == 13.0
+
+
+def test_get_local_dem_without_manifest_is_none(tmp_path):
+    assert get_local_dem(tmp_path / "missing") is None
@@ -0,0 +1,88 @@
+import pytest
+
+from nzpi.elevation import ElevationClient, grid_cell
+from nzpi.outbound import Provider
+
+POINTS = [(-41.2865 - k * 0.001, 174.7762 + k * 0.001) for k in range(250)]
+
+
+def elevation_response(path, query):
+    """OpenTopoData-shaped answer: elevation = 1000 * |lat| rounded, one result per location."""
+    locations = query["locations"][0].split("|")
+    results = [{"elevation": round(abs(float(loc.split(",")[0])) * 1000, 1)} for loc in locations]
+    return 200, {"status": "OK", "results": results}, 0.0
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault("retries", 0)
+    kwargs.setdefault("backoff", 0)
+    # A private, unpaced provider: the shared one is limited to the public API's 1 call per second
+    return ElevationClient(server.url, provider=Provider("test-opentopodata"), **kwargs)
+
+
+def test_batches_at_most_batch_size_locations(stub_server):
+    stub_server.default = elevation_response
+    client = make_client(stub_server, batch_size=100)
+    values = client.elevations(POINTS)
+    sizes = [len(query["locations"][0].split("|")) for _, query in stub_server.requests]
+    assert sizes == [100, 100, 50]
+    assert all(path == "/nzdem8m" for path, _ in stub_server.requests)
+    assert values == pytest.approx([round(abs(lat) * 1000, 1) for lat, _ in POINTS], abs=0.1)
+
+
+def test_points_in_one_grid_cell_share_a_lookup_and_are_cached(stub_server):
+    stub_server.default = elevation_response
+    client = make_client(stub_server)
+    lat, lon = POINTS[0]
+    assert grid_cell(lat, lon) == grid_cell(lat + 0.00001, lon + 0.00001)
+    first = client.elevations([(lat, lon), (lat + 0.00001, lon + 0.00001)])
+    assert first[0] == first[1] is not None
+    assert client.elevation(lat, lon) == first[0]
+    assert len(stub_server.requests) == 1
+    assert client.stats()["hits"] == 1
+
+
+def test_retries_5xx_then_succeeds(stub_server):
+    stub_server.script = [(503, b"", 0.0), (502, b"", 0.0)]
+    stub_server.default = elevation_response
+    client = make_client(stub_server, retries=2)
+    assert client.elevation(*POINTS[0]) is not None
+    assert len(stub_server.requests) == 3
+
+
+def test_exhausted_retries_give_none_and_are_not_cached(stub_server):
+    stub_server.default = lambda path, query: (500, b"", 0.0)
+    client = make_client(stub_server, retries=1)
+    assert client.elevation(*POINTS[0]) is None
+    assert len(stub_server.requests) == 2
+    stub_server.default = elevation_response
+    assert client.elevation(*POINTS[0]) is not None
+
+
+def test_timeout_gives_none(stub_server):
+    stub_server.default = lambda path, query: (*elevation_response(path, query)[:2], 1.0)
+    client = make_client(stub_server, timeout=(0.5, 0.2))
+    assert client.elevations(POINTS[:3]) == [None, None, None]
+    assert client.stats()["failures"] == 1
+
+
+@pytest.mark.parametrize("status, body", [
+    (200, {"status": "INVALID_REQUEST", "error": "Too many locations"}),
+    (200, {"status": "OK", "results": []}),  # result count does not match the locations
+    (200, b"<html>not json</html>"),
+    (400, {"status": "INVALID_REQUEST"}),
+])
+def test_error_responses_give_none(stub_server, status, body):
+    stub_server.default = lambda path, query: (status, body, 0.0)
+    client = make_client(stub_server)
+    assert client.elevations(POINTS[:2]) == [None, None]
+    assert client.stats()["size"] == 0
+
+
+def test_shed_lookup_gives_none_without_a_request(stub_server):
+    stub_server.default = elevation_response
+    provider = Provider("test-busy", rate=0.001, burst=1, max_wait=0.0)
+    client = ElevationClient(stub_server.url, retries=0, provider=provider)
+    assert client.elevation(*POINTS[0]) is not None
+    assert client.elevation(*POINTS[1]) is None
+    assert len(stub_server.requests) == 1
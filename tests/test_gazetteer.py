@@ -0,0 +1,42 @@
+import csv
+
+import pytest
+
+from nzpi.gazetteer import COLUMNS, Gazetteer, build
+
+ADDRESSES = [
+    ("18", "Lanyon Place", "Whitby", "Porirua", -41.1103, 174.8953),
+    ("20", "Lanyon Place", "Whitby", "Porirua", -41.1105, 174.8951),
+    ("18", "Main Street", "Ōtaki", "Ōtaki", -40.7573, 175.1504),
+]
+
+
+@pytest.fixture(scope="module")
+def gazetteer(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("gazetteer")
+    source = directory / "addresses.csv"
+    with open(source, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(ADDRESSES)
+    return Gazetteer(build(source, directory / "index"))
+
+
+@pytest.mark.parametrize("query, address", [
+    ("18 Lanyon Pl, Whitby", "18 Lanyon Place, Whitby, Porirua"),
+    ("18 lanyon pl, whitby, porirua 5024, New Zealand", "18 Lanyon Place, Whitby, Porirua"),
+    ("20 lan", "20 Lanyon Place, Whitby, Porirua"),
+    ("18 main st otaki", "18 Main Street, Ōtaki"),
+])
+def test_resolves_one_address(gazetteer, query, address):
+    assert gazetteer.resolve(query)["formatted_address"] == address
+
+
+@pytest.mark.parametrize("query", ["18 lanyon pl, whitby heights", "18", "Lanyon Place"])
+def test_missing_or_ambiguous_is_none(gazetteer, query):
+    assert gazetteer.resolve(query) is None
+
+
+def test_partial_word_alone_does_not_resolve(gazetteer):
+    assert gazetteer.resolve("2") is None
+    assert [a["formatted_address"] for a in gazetteer.complete("2")] == ["20 Lanyon Place, Whitby, Porirua"]
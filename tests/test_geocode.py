@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nzpi.geocode import GeocodeCache, PlacesError, find_place, normalize_query
+from nzpi.outbound import OutboundBusy, Provider
+
+CANDIDATE = {"formatted_address": "18 Lanyon Place, Whitby, Porirua 5024, New Zealand",
+             "geometry": {"location": {"lat": -41.1103, "lng": 174.8953}}}
+
+
+def places(status, candidates=(), delay=0.0, **extra):
+    return lambda path, query: (200, {"status": status, "candidates": list(candidates), **extra}, delay)
+
+
+def lookup(server, query="18 Lanyon Pl, Whitby", cache=None):
+    return find_place(query, "key", cache=cache, url=server.url + "/places", provider=Provider("test-places"))
+
+
+def test_normalize_query_expands_abbreviations():
+    assert normalize_query("18 Lanyon Pl,  WHITBY") == normalize_query("18 lanyon place whitby")
+    assert normalize_query("1 Ōtaki St, NZ") == "1 otaki street new zealand"
+
+
+def test_ok_returns_the_first_candidate_and_caches_it(stub_server):
+    stub_server.default = places("OK", [CANDIDATE])
+    cache = GeocodeCache(":memory:")
+    place = lookup(stub_server, cache=cache)
+    assert place == {"formatted_address": CANDIDATE["formatted_address"], "lat": -41.1103, "lon": 174.8953}
+    assert lookup(stub_server, "18 lanyon place whitby", cache=cache) == place
+    assert len(stub_server.requests) == 1
+
+
+def test_zero_results_is_not_found(stub_server):
+    stub_server.default = places("ZERO_RESULTS")
+    cache = GeocodeCache(":memory:")
+    assert lookup(stub_server, cache=cache) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_over_query_limit_is_busy(stub_server):
+    stub_server.default = places("OVER_QUERY_LIMIT", error_message="You have exceeded your daily request quota")
+    with pytest.raises(OutboundBusy, match="OVER_QUERY_LIMIT"):
+        lookup(stub_server)
+
+
+@pytest.mark.parametrize("status", ["REQUEST_DENIED", "INVALID_REQUEST", "UNKNOWN_ERROR"])
+def test_error_statuses_raise_instead_of_not_found(stub_server, status):
+    stub_server.default = places(status)
+    with pytest.raises(PlacesError, match=status):
+        lookup(stub_server)
+
+
+def test_network_failures_raise(stub_server):
+    stub_server.default = lambda path, query: (500, b"<html>oops</html>", 0.0)
+    with pytest.raises(PlacesError):
+        lookup(stub_server)
+
+
+def test_identical_concurrent_lookups_are_coalesced(stub_server):
+    stub_server.default = places("OK", [CANDIDATE], delay=0.3)
+    provider = Provider("test-places")
+    queries = ["18 Lanyon Pl, Whitby", "18 lanyon place whitby"] * 10
+    with ThreadPoolExecutor(20) as pool:
+        results = list(pool.map(
+            lambda q: find_place(q, "key", url=stub_server.url + "/places", provider=provider), queries))
+    assert all(r == results[0] for r in results) and results[0] is not None
+    assert len(stub_server.requests) == 1
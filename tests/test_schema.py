@@ -0,0 +1,79 @@
+import pytest
+
+from nzpi.schema import SchemaIndex, parse_header
+
+POP = "Census usually resident population"
+
+
+def header(var, year="2023", measure="Count", topic=POP):
+    return f"Subject pop: {topic}, Year: {year}, Measure: {measure}, Var1: {var}"
+
+
+COLUMNS = [
+    "Statistical area 2 (SA2) 2023 code",
+    header("Age (5-year groups) (0-4 years)"),
+    header("Age (5-year groups) (10-14 years)"),
+    header("Age (5-year groups) (0-4 years)", year="2018"),
+    header("Age (5-year groups) (Total)"),
+    header("Languages spoken (English)"),
+    header("Average weekly hours worked (Hours)", measure="Mean"),
+    header("Ethnic group (grouped total responses) (Māori)"),
+    header("Ethnic group (grouped total responses) (European)"),
+    header("Ethnic group (grouped total responses) (Total stated)"),
+    header("Ethnic group total responses by descent (Māori)"),
+    header("Highest qualification (Level 1 certificate)"),
+    header("Highest qualification (Level 10 certificate)"),
+    header("Highest qualification (Bachelor's degree and Level 7 qualification)"),
+    header("Population change (Percent)", year="Change 2018-2023", measure="Percent"),
+]
+
+
+@pytest.fixture
+def schema():
+    return SchemaIndex(COLUMNS)
+
+
+def var1(columns):
+    return [parse_header(c).variable + " / " + parse_header(c).category for c in columns]
+
+
+def test_parse_header_splits_variable_and_category():
+    spec = parse_header(COLUMNS[1])
+    assert (spec.topic, spec.year, spec.measure) == (POP, "2023", "Count")
+    assert (spec.variable, spec.category) == ("Age (5-year groups)", "0-4 years")
+    assert parse_header(COLUMNS[0]) is None
+
+
+def test_year_is_exact(schema):
+    assert schema.select(year="2023", category="0-4 years") == [COLUMNS[1]]
+    assert schema.select(year="2018-2023") == []
+    assert schema.column(year="Change 2018-2023", measure="Percent") == COLUMNS[-1]
+
+
+def test_keywords_match_whole_words(schema):
+    # Not "Languages spoken" or "Average weekly hours worked"
+    assert var1(schema.select(year="2023", variable="age")) == [
+        "Age (5-year groups) / 0-4 years", "Age (5-year groups) / 10-14 years", "Age (5-year groups) / Total"]
+    assert schema.select(variable="language") == []
+    assert var1(schema.select(year="2023", category="0-4 years")) == ["Age (5-year groups) / 0-4 years"]
+    assert var1(schema.select(year="2023", variable="age", category=("0-4 years", "10-14 years"))) == [
+        "Age (5-year groups) / 0-4 years", "Age (5-year groups) / 10-14 years"]
+    assert var1(schema.select(variable="qualification", category="level 1")) == [
+        "Highest qualification / Level 1 certificate"]  # not Level 10
+    assert var1(schema.select(variable="qualification", category="bachelor")) == [
+        "Highest qualification / Bachelor's degree and Level 7 qualification"]
+
+
+def test_exclude_applies_to_the_whole_header(schema):
+    assert var1(schema.select(variable="ethnic", category="māori")) == [
+        "Ethnic group (grouped total responses) / Māori", "Ethnic group total responses by descent / Māori"]
+    assert var1(schema.select(variable="ethnic", category="māori", exclude="descent")) == [
+        "Ethnic group (grouped total responses) / Māori"]
+    # "total" is in the variable here, not the category
+    assert schema.select(variable="ethnic", category="european", exclude="total") == []
+
+
+def test_results_are_memoized_copies(schema):
+    first = schema.select(year="2023", variable="age")
+    first.clear()
+    assert len(schema.select(year="2023", variable="age")) == 3
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nzpi import census
+from nzpi.analysis import Analyser
+from nzpi.areas import build_area_table, income_column
+from nzpi.screening import ScreeningIndex
+
+METRICS = {"income": "Income", "growth_2018_2023": "Growth", "resilience_score": "Resilience"}
+
+TABLE = pd.DataFrame({
+    "name": ["Ara", "Bay", "Cove", "Dale", "Eden", "Fern"],
+    "income": [90000, 55000, np.nan, 72000, 72000, 120000],
+    "growth_2018_2023": [5.0, -1.0, 3.0, np.nan, 2.0, 9.0],
+    "resilience_score": [80.0, 40.0, 60.0, 70.0, np.nan, 95.0],
+}, index=pd.Index([100, 200, 300, 400, 500, 600], name=census.CODE_COL))
+
+
+@pytest.fixture
+def index():
+    return ScreeningIndex(TABLE, metrics=METRICS)
+
+
+def codes(frame):
+    return list(frame.index)
+
+
+def test_ranges_are_inclusive_and_skip_missing_values(index):
+    assert codes(TABLE[index._range("income", 72000, 90000)]) == [100, 400, 500]
+    assert codes(TABLE[index._range("income", high=60000)]) == [200]
+    assert codes(TABLE[index._range("income")]) == [100, 200, 400, 500, 600]
+    assert not index._range("income", 200000).any()
+
+
+def test_screen_matches_a_table_scan():
+    rng = np.random.default_rng(7)
+    table = pd.DataFrame({metric: rng.integers(0, 20, 300).astype("float64") for metric in METRICS})
+    table.loc[rng.choice(300, 30, replace=False), "income"] = np.nan
+    index = ScreeningIndex(table, metrics=METRICS)
+    result = index.screen({"income": (5, 12), "growth_2018_2023": (None, 9)}, rank_by="growth_2018_2023",
+                          descending=False, limit=1000)
+    expected = table[table["income"].between(5, 12) & (table["growth_2018_2023"] <= 9)]
+    assert codes(result) == codes(expected.sort_values("growth_2018_2023", kind="stable"))
+
+
+def test_screen_ranks_and_puts_unranked_rows_last(index):
+    assert codes(index.screen({})) == [600, 100, 400, 300, 200, 500]
+    assert codes(index.screen({}, descending=False, limit=3)) == [200, 300, 400]
+    assert codes(index.screen({"income": (70000, None)}, rank_by="growth_2018_2023")) == [600, 100, 500, 400]
+
+
+def household_header(year):
+    return ("Subject pop: Households in occupied private dwellings, Year: "
+            f"{year}, Measure: Median, Var1: Total household income (Median ($))")
+
+
+def pop_header(year, measure="Count"):
+    return ("Subject pop: Census usually resident population, Year: "
+            f"{year}, Measure: {measure}, Var1: Census usually resident population (Total)")
+
+
+def test_income_column_is_the_latest_census_median():
+    columns = [census.CODE_COL, *map(household_header, ("2013", "2023", "2018"))]
+    assert income_column(pd.DataFrame(columns=columns)) == household_header("2023")
+    assert income_column(pd.DataFrame(columns=["code", "Median household income"])) == "Median household income"
+    assert income_column(pd.DataFrame(columns=["code"])) is None
+
+
+def quoted(columns):
+    return ",".join(f'"{col}"' for col in columns)
+
+
+@pytest.fixture
+def tiny_census(tmp_path):
+    key = [census.CODE_COL, census.NAME_COL, census.ASCII_NAME_COL]
+    pop = [*map(pop_header, ("2013", "2018", "2023")), pop_header("Change 2018-2023", "Percent")]
+    (tmp_path / census.POP_CSV).write_text(
+        quoted(key + pop) + "\n100,Ara,Ara,900,950,1000,5.3\n200,Bay,Bay,400,410,420,2.4\n")
+    (tmp_path / census.INCOME_CSV).write_text(
+        quoted(key + [household_header(year) for year in ("2013", "2018", "2023")])
+        + "\n100,Ara,Ara,60000,70000,90000\n200,Bay,Bay,50000,-999,80000\n")
+    (tmp_path / census.INDIVIDUALS_CSV).write_text(quoted(key) + "\n100,Ara,Ara\n200,Bay,Bay\n")
+    return census.load_census(tmp_path)
+
+
+def test_area_table_and_address_page_report_2023_income(tiny_census):
+    table = build_area_table(tiny_census)
+    assert table["income"].to_dict() == {100: 90000, 200: 80000}
+    assert table["growth_2018_2023"].to_dict() == {100: 5.3, 200: 2.4}
+    analyser = Analyser(tiny_census, places_key=None)
+    assert analyser.suburb_stats((100,))["income"] == 90000
+    assert analyser.suburb_stats((100, 200))["income"] == 85000
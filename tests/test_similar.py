@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from nzpi.similar import SimilarSuburbs
+
+FEATURES = ("bachelor_higher", "income", "growth")
+
+
+def area_table(rows):
+    table = pd.DataFrame(rows, columns=["code", "name", "pop", *FEATURES]).set_index("code")
+    return table
+
+
+AREAS = area_table([
+    (100, "Ara", 1000, 30.0, 90000, 5.0),
+    (101, "Ara North", 1200, 31.0, 91000, 5.5),   # Ara's near twin
+    (102, "Ara South", 900, 28.0, 86000, 4.0),
+    (200, "Bay", 800, 10.0, 55000, -1.0),
+    (201, "Bay East", 700, 12.0, 57000, 0.0),
+    (300, "Cove", 1500, 45.0, 130000, 9.0),
+    (900, "Inlet", 12, 30.0, 90000, 5.0),         # too few residents to be indexed
+])
+
+
+def index(areas=AREAS):
+    return SimilarSuburbs(areas, features=FEATURES)
+
+
+def brute_force(idx, codes):
+    query = idx.query_vector(codes)
+    dist = np.linalg.norm(idx.matrix - query, axis=1)
+    order = [int(idx.codes[row]) for row in np.argsort(dist, kind="stable")]
+    return [code for code in order if code not in codes]
+
+
+def test_neighbours_are_nearest_first_and_exclude_the_query():
+    idx = index()
+    result = idx.search([100], k=3)
+    assert list(result.index) == [101, 102, 300] == brute_force(idx, [100])[:3]
+    assert list(result.columns) == ["name", "income", "growth", "pop", "similarity"]
+    assert result["similarity"].is_monotonic_decreasing and result["similarity"].between(0, 100).all()
+
+
+def test_small_populations_are_not_indexed():
+    idx = index()
+    assert 900 not in idx.row_of
+    assert 900 not in idx.search([100], k=10).index
+    assert idx.search([900]).empty
+
+
+def test_multiple_codes_query_their_mean():
+    idx = index()
+    result = idx.search([100, 200], k=10)
+    assert not {100, 200} & set(result.index)
+    assert list(result.index) == brute_force(idx, [100, 200])
+
+
+def test_filters_mask_candidates():
+    idx = index()
+    assert list(idx.search([100], k=3, max_income=90000).index) == [102, 201, 200]
+    assert set(idx.search([100], k=10, min_income=87000).index) == {101, 300}
+    assert set(idx.search([200], k=10, min_growth=5.0).index) == {100, 101, 300}
+    empty = idx.search([100], max_income=1000)
+    assert empty.empty and "similarity" in empty.columns
+
+
+def test_k_is_capped_at_the_candidate_count():
+    assert len(index().search([100], k=50)) == 5
+
+
+def test_missing_metrics_are_imputed_with_the_median():
+    areas = AREAS.copy()
+    areas.loc[300, "income"] = np.nan
+    idx = index(areas)
+    assert not np.isnan(idx.matrix).any()
+    assert idx.matrix[idx.row_of[300], FEATURES.index("income")] == np.float32(
+        (areas.loc[areas["pop"] >= 200, "income"].median() - idx.mean["income"]) / idx.std["income"])
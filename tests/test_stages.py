@@ -0,0 +1,70 @@
+import contextvars
+import threading
+import time
+
+import pytest
+
+from nzpi import stages
+from nzpi.stages import Stage, run_stages
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_results_by_name():
+    results, degraded = run_stages({"a": Stage(lambda: 1, 1.0), "b": Stage(lambda: "two", 1.0)})
+    assert results == {"a": 1, "b": "two"} and degraded == []
+
+
+def test_errors_and_timeouts_fall_back():
+    def boom():
+        raise ValueError("upstream broke")
+
+    start = time.monotonic()
+    results, degraded = run_stages({
+        "ok": Stage(lambda: "fine", 1.0),
+        "error": Stage(boom, 1.0, fallback="N/A"),
+        "slow": Stage(lambda: time.sleep(1.0) or "late", 0.1, fallback="N/A"),
+    })
+    assert results == {"ok": "fine", "error": "N/A", "slow": "N/A"}
+    assert degraded == ["error", "slow"]
+    assert time.monotonic() - start < 0.5
+
+
+def test_stages_see_the_callers_context():
+    request_id.set("req-1")
+    results, _ = run_stages({"ctx": Stage(request_id.get, 1.0)})
+    assert results == {"ctx": "req-1"}
+
+
+def test_late_stages_of_one_kind_do_not_starve_another():
+    release = threading.Event()
+    try:
+        # Fill every "test-elevation" worker with a stage that outlives its deadline
+        stuck = {"test-elevation": Stage(release.wait, 0.05, fallback=None)}
+        for _ in range(stages.STAGE_WORKERS):
+            assert run_stages(stuck) == ({"test-elevation": None}, ["test-elevation"])
+        results, degraded = run_stages({
+            "test-elevation": Stage(lambda: 12.5, 0.05, fallback=None),
+            "test-map": Stage(lambda: "<div>", 0.5),
+        })
+        assert results == {"test-elevation": None, "test-map": "<div>"}
+        assert degraded == ["test-elevation"]
+    finally:
+        release.set()
+
+
+def test_queued_stages_are_cancelled_at_their_deadline():
+    release, ran = threading.Event(), []
+    try:
+        for _ in range(stages.STAGE_WORKERS):
+            run_stages({"test-queue": Stage(release.wait, 0.01)})
+        run_stages({"test-queue": Stage(lambda: ran.append(1), 0.01)})
+    finally:
+        release.set()
+    time.sleep(0.1)
+    assert ran == []
+
+
+@pytest.fixture(autouse=True)
+def _quiet_logs(caplog):
+    caplog.set_level("CRITICAL", logger="nzpi.stages")
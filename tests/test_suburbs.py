@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from nzpi.census import ASCII_NAME_COL, CODE_COL, NAME_COL
+from nzpi.suburbs import SuburbIndex, base_name, place_key
+
+SA2 = {
+    100: "Ara Hill", 101: "College Hill", 102: "Forrest Hill North", 103: "Forrest Hill West",
+    104: "Bastia-Durie Hill", 105: "Whitby", 106: "Karori North", 107: "Karori South", 108: "Karori Park",
+    109: "Avondale Central (Auckland)", 110: "Avondale (Christchurch City)", 111: "Ōtaki",
+    112: "Auckland Airport", 113: "Auckland-University", 114: "Te Aroha East", 115: "Te Aroha West",
+    116: "Mount Eden North", 117: "Mount Eden South", 118: "Mount Albert Central",
+    119: "Saint Heliers North", 120: "Saint Heliers South", 121: "St Heliers West", 122: "Karoro",
+    123: "Te Atatu South",
+}
+
+
+@pytest.fixture(scope="module")
+def index():
+    frame = pd.DataFrame({CODE_COL: list(SA2), NAME_COL: list(SA2.values()),
+                          ASCII_NAME_COL: [name.replace("Ō", "O") for name in SA2.values()]})
+    return SuburbIndex(SimpleNamespace(pop=frame, income=frame, individuals=frame))
+
+
+def test_place_key_spells_out_abbreviations():
+    assert place_key("Mt. Eden") == "mount eden"
+    assert place_key("St Heliers") == place_key("Saint Heliers") == "saint heliers"
+    assert place_key("Ōtaki") == "otaki"
+
+
+def test_base_name_drops_qualifiers_and_districts():
+    assert base_name("Forrest Hill North") == base_name("Forrest Hill") == "forrest hill"
+    assert base_name("Avondale Central (Auckland)") == base_name("Avondale South (Auckland)") == "avondale auckland"
+    assert base_name("Central") == "central"
+
+
+@pytest.mark.parametrize("query, codes", [
+    ("Whitby", (105,)),
+    ("karori", (106, 107)),  # the Karori base only, not Karori Park
+    ("Karori Park", (108,)),
+    ("forrest", (102, 103)),
+    ("durie", (104,)),
+    ("whitb", (105,)),
+    ("forrest hil", (102, 103)),
+    ("Otaki", (111,)),
+    ("Whitbey", (105,)),
+    ("Karori Nroth", (106,)),
+    ("Mt Eden", (116, 117)),
+    ("St Heliers", (119, 120, 121)),
+    ("saint heliers west", (121,)),
+    ("Te Aroha", (114, 115)),
+])
+def test_resolves_one_place(index, query, codes):
+    assert index.resolve(query) == codes
+
+
+@pytest.mark.parametrize("query", [
+    "hill", "hil",  # a word shared by unrelated places
+    "Auckland", "Mount",  # leading words shared by unrelated places
+    "avondale",  # the Auckland and the Christchurch one
+    "Te Aro",  # a complete name, not partial input for Te Aroha
+    "mt ed",  # "mount" alone does not pin down a place for the partial word to narrow
+    "Karory",  # one edit from both Karori and Karoro
+])
+def test_ambiguous_or_unknown_is_no_match(index, query):
+    assert index.resolve(query) == ()
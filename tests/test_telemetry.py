@@ -0,0 +1,96 @@
+import re
+import threading
+import time
+
+import pytest
+
+from nzpi import telemetry
+from nzpi.telemetry import count, counters, prometheus_text, span, trace
+
+# One sample line of the text exposition format: name, optional escaped labels, value
+SAMPLE_RE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_]\w*="(?:[^"\\\n]|\\[\\"n])*"'
+                       r'(,[a-zA-Z_]\w*="(?:[^"\\\n]|\\[\\"n])*")*\})? -?[0-9.e+-]+$')
+
+
+def samples(text, metric):
+    return [line for line in text.splitlines() if line.startswith(metric)]
+
+
+def test_spans_nest_in_the_request_trace():
+    with trace("test-request") as t:
+        with span("test-outer"):
+            time.sleep(0.02)
+        with pytest.raises(ValueError):
+            with span("test-failing"):
+                raise ValueError("boom")
+    spans = {s["span"]: s for s in t.waterfall()}
+    assert set(spans) == {"test-request", "test-outer", "test-failing"}
+    assert spans["test-outer"]["duration_ms"] >= 20 and spans["test-outer"]["ok"] is True
+    assert spans["test-failing"]["ok"] is False
+    assert spans["test-failing"]["start_ms"] >= spans["test-outer"]["start_ms"] + 20
+
+
+def test_spans_outside_a_trace_only_feed_the_histogram():
+    with span("test-untraced"):
+        pass
+    assert samples(prometheus_text(), 'nzpi_span_duration_seconds_count{span="test-untraced"}') == [
+        'nzpi_span_duration_seconds_count{span="test-untraced"} 1']
+
+
+def test_counters_are_per_label_set_and_thread_safe():
+    def hit():
+        for _ in range(1000):
+            count("test_hits", cache="a", result="hit")
+
+    threads = [threading.Thread(target=hit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    count("test_hits", 5, result="miss", cache="a")
+    totals = counters()
+    assert totals[("test_hits", (("cache", "a"), ("result", "hit")))] == 4000
+    assert totals[("test_hits", (("cache", "a"), ("result", "miss")))] == 5
+
+
+def test_exposition_format_parses():
+    count("external_calls", provider='we"ird\\name\nwith newline')
+    with span("test-exposition"):
+        pass
+    text = prometheus_text()
+    assert text.endswith("\n")
+    for line in text.splitlines():
+        if line.startswith("#"):
+            assert re.match(r"^# (HELP|TYPE) nzpi_\w+ \S", line), line
+        else:
+            assert SAMPLE_RE.match(line), line
+    # One HELP and TYPE per metric family, before its samples
+    assert text.count("# TYPE nzpi_external_calls_total counter") == 1
+    assert text.count("# TYPE nzpi_span_duration_seconds histogram") == 1
+    assert 'provider="we\\"ird\\\\name\\nwith newline"' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    for seconds in (0.0005, 0.02, 0.3, 20.0):
+        telemetry._observe("test-buckets", seconds)
+    text = prometheus_text()
+    buckets = [line for line in samples(text, "nzpi_span_duration_seconds_bucket") if 'span="test-buckets"' in line]
+    values = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert values == sorted(values) and len(values) == len(telemetry.BUCKETS) + 1
+    assert buckets[0] == 'nzpi_span_duration_seconds_bucket{span="test-buckets",le="0.001"} 1'
+    assert buckets[-1] == 'nzpi_span_duration_seconds_bucket{span="test-buckets",le="+Inf"} 4'
+    assert values[-2] == 3  # 20 s is above the largest finite bound
+    assert samples(text, 'nzpi_span_duration_seconds_sum{span="test-buckets"}') == [
+        'nzpi_span_duration_seconds_sum{span="test-buckets"} 20.320500']
+
+
+def test_prometheus_client_can_parse_it():
+    parser = pytest.importorskip("prometheus_client.parser")
+    count("cache_requests", cache="test", result="hit")
+    with span("test-parse"):
+        pass
+    families = {family.name: family for family in parser.text_string_to_metric_families(prometheus_text())}
+    assert families["nzpi_cache_requests"].type == "counter"
+    histogram = families["nzpi_span_duration_seconds"]
+    assert histogram.type == "histogram"
+    assert any(s.labels.get("span") == "test-parse" and s.name.endswith("_count") for s in histogram.samples)
@@ -0,0 +1,99 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nzpi.outbound import Provider
+from nzpi.tiles import TileProxy, TileStore, make_app, tiles_in_bbox, tile_xy
+
+TILE = b"\x89PNG" + bytes(96)  # 100 bytes
+
+
+def tile_response(delay=0.0):
+    return lambda path, query: (200, TILE, delay)
+
+
+def make_proxy(server, directory, max_bytes=1 << 20):
+    return TileProxy({"osm": server.url + "/{z}/{x}/{y}.png"}, TileStore(directory, max_bytes), retries=0,
+                     providers={"osm": Provider("test-tiles")})
+
+
+def get(app, path):
+    status = {}
+    body = b"".join(app({"REQUEST_METHOD": "GET", "PATH_INFO": path, "wsgi.input": io.BytesIO()},
+                        lambda s, headers: status.update(code=int(s.split()[0]), headers=dict(headers))))
+    return status["code"], status["headers"], body
+
+
+def test_miss_fetches_once_then_hits_disk(stub_server, tmp_path):
+    stub_server.default = tile_response()
+    proxy = make_proxy(stub_server, tmp_path)
+    assert proxy.tile("osm", 14, 16150, 10250) == TILE
+    assert proxy.tile("osm", 14, 16150, 10250) == TILE
+    assert [path for path, _ in stub_server.requests] == ["/14/16150/10250.png"]
+    assert (tmp_path / "osm" / "14" / "16150" / "10250.png").read_bytes() == TILE
+    # A restarted proxy serves the stored tile without going upstream
+    assert make_proxy(stub_server, tmp_path).tile("osm", 14, 16150, 10250) == TILE
+    assert len(stub_server.requests) == 1
+
+
+def test_store_evicts_least_recently_served(stub_server, tmp_path):
+    stub_server.default = tile_response()
+    proxy = make_proxy(stub_server, tmp_path, max_bytes=3 * len(TILE))
+    for y in range(3):
+        proxy.tile("osm", 10, 1, y)
+    proxy.tile("osm", 10, 1, 0)  # touch: now the most recently served
+    proxy.tile("osm", 10, 1, 3)
+    assert proxy.store.stats() == {"tiles": 3, "bytes": 3 * len(TILE), "max_bytes": 3 * len(TILE)}
+    assert not proxy.store.path("osm", 10, 1, 1).exists()
+    assert all(proxy.store.path("osm", 10, 1, y).exists() for y in (0, 2, 3))
+    # Recency survives a restart (file mtimes)
+    assert list(TileStore(tmp_path, 3 * len(TILE))._entries)[-1] == proxy.store.path("osm", 10, 1, 3)
+
+
+def test_concurrent_requests_share_one_upstream_fetch(stub_server, tmp_path):
+    stub_server.default = tile_response(delay=0.3)
+    proxy = make_proxy(stub_server, tmp_path)
+    with ThreadPoolExecutor(20) as pool:
+        results = list(pool.map(lambda _: proxy.tile("osm", 12, 4030, 2560), range(20)))
+    assert results == [TILE] * 20
+    assert len(stub_server.requests) == 1
+
+
+@pytest.mark.parametrize("status, body", [(404, b""), (204, b""), (200, b"")])
+def test_missing_tiles_are_remembered(stub_server, tmp_path, status, body):
+    stub_server.default = lambda path, query: (status, body, 0.0)
+    proxy = make_proxy(stub_server, tmp_path)
+    app = make_app(proxy)
+    assert get(app, "/osm/18/1/2.png")[0] == 404
+    assert get(app, "/osm/18/1/2.png")[0] == 404
+    assert proxy.tile("osm", 18, 1, 2) is None
+    assert len(stub_server.requests) == 1
+
+
+def test_upstream_errors_are_not_remembered(stub_server, tmp_path):
+    stub_server.default = lambda path, query: (500, b"", 0.0)
+    proxy = make_proxy(stub_server, tmp_path)
+    app = make_app(proxy)
+    assert get(app, "/osm/5/1/1.png")[0] == 502
+    stub_server.default = tile_response()
+    code, headers, body = get(app, "/osm/5/1/1.png")
+    assert (code, body, headers["Content-Type"]) == (200, TILE, "image/png")
+    assert len(stub_server.requests) == 2
+
+
+def test_unknown_layers_and_out_of_range_tiles_are_404(stub_server, tmp_path):
+    proxy = make_proxy(stub_server, tmp_path)
+    app = make_app(proxy)
+    assert get(app, "/linz/5/1/1.png")[0] == 404
+    assert get(app, "/osm/5/32/1.png")[0] == 404
+    assert get(app, "/osm/5/1/1.jpg")[0] == 404
+    assert stub_server.requests == []
+
+
+def test_bbox_covers_the_tiles_of_its_corners():
+    tiles = list(tiles_in_bbox(-41.32, 174.70, -41.20, 174.90, [14]))
+    x0, y0 = tile_xy(-41.20, 174.70, 14)
+    x1, y1 = tile_xy(-41.32, 174.90, 14)
+    assert (14, x0, y0) in tiles and (14, x1, y1) in tiles
+    assert len(tiles) == (x1 - x0 + 1) * (y1 - y0 + 1)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nzpi import trends
+from nzpi.census import CODE_COL, NAME_COL, CensusData
+from nzpi.schema import SchemaIndex
+from nzpi.trends import TrendCube, get_trend_cube
+
+POP = "Subject pop: Census usually resident population, Year: {year}, Measure: Count, Var1: Census usually resident population count (Total)"
+INCOME = ("Subject pop: Households in occupied private dwellings, Year: {year}, Measure: Median, "
+          "Var1: Total household income (Median ($))")
+ONLY_2023 = "Subject pop: Census usually resident population, Year: 2023, Measure: Count, Var1: Languages spoken (English)"
+
+
+def frame(template, rows):
+    data = {CODE_COL: [1, 2, 3], NAME_COL: ["Ara", "Bay", "Cove"]}
+    for k, year in enumerate(trends.YEARS):
+        data[template.format(year=year)] = [row[k] for row in rows]
+    return pd.DataFrame(data)
+
+
+def make_census(data_dir=None, version="v1"):
+    pop = frame(POP, [(100, 110, 121), (0, 50, 60), (-999, 20, 30)])
+    pop[ONLY_2023] = [1, 2, 3]
+    income = frame(INCOME, [(50000, 60000, 66000), (40000, 40000, 50000), (30000, 33000, 36300)])
+    individuals = pd.DataFrame({CODE_COL: [1, 2, 3], NAME_COL: ["Ara", "Bay", "Cove"]})
+    frames = {"pop": pop, "income": income, "individuals": individuals}
+    return CensusData(pop, income, individuals, version=version,
+                      schemas={name: SchemaIndex(f.columns) for name, f in frames.items()}, data_dir=data_dir)
+
+
+@pytest.fixture
+def cube():
+    return TrendCube.build(make_census())
+
+
+def test_only_variables_with_every_year(cube):
+    assert cube.variables["label"].tolist() == ["Census usually resident population count",
+                                                "Total household income (Median ($))"]
+    assert cube.cube.shape == (3, 2, 3)
+
+
+def test_single_sa2_changes(cube):
+    result = cube.trends([1]).set_index("table")
+    assert result.loc["pop", ["2013", "2018", "2023"]].tolist() == [100, 110, 121]
+    assert result.loc["pop", "change 2013-2018"] == 10
+    assert result.loc["pop", "change 2018-2023 %"] == pytest.approx(10.0)
+    assert result.loc["income", "change 2013-2023 %"] == pytest.approx(32.0)
+
+
+def test_suppressed_values_and_zero_bases_are_nan(cube):
+    pop = cube.trends([3]).set_index("table").loc["pop"]
+    assert np.isnan(pop["2013"]) and np.isnan(pop["change 2013-2018"])
+    assert pop["change 2018-2023"] == 10
+    assert np.isnan(cube.trends([2]).set_index("table").loc["pop", "change 2013-2018 %"])
+
+
+def test_several_sa2s_sum_counts_and_average_medians(cube):
+    result = cube.trends([1, 3]).set_index("table")
+    assert result.loc["pop", ["2013", "2018", "2023"]].tolist() == [100, 130, 151]  # suppressed 2013 skipped
+    assert result.loc["pop", "change 2018-2023"] == 21
+    assert result.loc["income", "2023"] == pytest.approx((66000 + 36300) / 2)
+    assert result.loc["income", "change 2013-2023"] == pytest.approx((66000 + 36300) / 2 - 40000)
+
+
+def test_unknown_codes_are_nan(cube):
+    assert np.isnan(cube.values([99])).all()
+
+
+def test_snapshot_round_trip(cube, tmp_path):
+    cube.save(tmp_path, "v1")
+    loaded = TrendCube.load(tmp_path, "v1")
+    assert isinstance(loaded.cube, np.memmap)
+    pd.testing.assert_frame_equal(loaded.trends([1, 2]), cube.trends([1, 2]))
+    assert TrendCube.load(tmp_path, "v2") is None
+    (tmp_path / "manifest.json").write_text("{not json")
+    assert TrendCube.load(tmp_path, "v1") is None
+
+
+def test_get_trend_cube_builds_once_then_maps_the_snapshot(tmp_path, monkeypatch):
+    census = make_census(tmp_path, version="test-trends")
+    monkeypatch.setattr(trends, "load_all_households", lambda data_dir: (census.income, "sha"))
+    first = get_trend_cube(census)
+    assert (tmp_path / ".snapshot" / "trends" / "cube.npy").exists()
+
+    def fail(data_dir):
+        raise AssertionError("the full households table was loaded again")
+
+    monkeypatch.setattr(trends, "load_all_households", fail)
+    trends._built.pop(census.version)
+    second = get_trend_cube(census)
+    assert isinstance(second.cube, np.memmap)
+    pd.testing.assert_frame_equal(second.trends([2]), first.trends([2]))
+    trends._built.pop(census.version)